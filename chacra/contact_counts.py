@@ -0,0 +1,262 @@
+"""
+Exact cumulative contact counts across runs.
+
+The cumulative contact data of a project are stored as integer counts, per
+(state, residue pair), of the frames in which the pair is in contact, plus
+the number of frames per state.  The counts are kept sparse (CSR, states ×
+pairs) in ``analysis_output/run_N/contact_counts.npz``.  Adding a run
+appends its new pairs as columns and adds its counts: only the new run's
+contact files are read, the stored matrix is never densified, no float
+re-weighting is involved, and frequencies are derived on read as
+``counts / n_frames``.
+
+Per-run counts come from the per-frame contact files (through the parsed
+``.cache/*.npz`` store of chacra.convergence), so pair names follow the
+store's lexically ordered ``res1-res2`` convention.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from chacra.convergence import (
+    _find_contact_files,
+    _load_state_contacts_from_file,
+    _recorded_n_frames,
+)
+
+COUNTS_FILE = "contact_counts.npz"
+
+
+def _count_worker(args: tuple) -> tuple[list[str], np.ndarray, int]:
+    """(pair names, contact counts, n_frames) of one per-frame contact file."""
+    path, fmt = args
+    frames, pair_frames = _load_state_contacts_from_file(path, fmt)
+    # frames without any contact only show up in the recorded frame count
+    # (getcontacts' header, the chacra engine's parquet metadata)
+    n_frames = _recorded_n_frames(path, fmt) or len(frames)
+    counts = np.fromiter(
+        (len(f) for f in pair_frames.values()), dtype=np.int64, count=len(pair_frames)
+    )
+    return list(pair_frames), counts, n_frames
+
+
+@dataclass
+class ContactCounts:
+    """
+    Sparse integer contact counts of every state.
+
+    Attributes
+    ----------
+    pair_names : list[str]
+        Residue pair of each column.
+    counts : scipy.sparse.csr_matrix
+        int64 (n_states x n_pairs) frames in contact.
+    n_frames : np.ndarray
+        int64 (n_states,) frames per state.
+    """
+
+    pair_names: list[str]
+    counts: sparse.csr_matrix
+    n_frames: np.ndarray
+
+    @property
+    def n_states(self) -> int:
+        return len(self.n_frames)
+
+    @classmethod
+    def empty(cls, n_states: int) -> "ContactCounts":
+        return cls(
+            [],
+            sparse.csr_matrix((n_states, 0), dtype=np.int64),
+            np.zeros(n_states, dtype=np.int64),
+        )
+
+    @classmethod
+    def from_contact_files(
+        cls, files: list[tuple[str, str]], n_jobs: int = 1
+    ) -> "ContactCounts":
+        """
+        Counts of one run from its per-frame contact files.
+
+        Parameters
+        ----------
+        files : list[tuple[str, str]]
+            ``(path, format)`` of each state's contact file, in state order.
+        n_jobs : int
+            Number of parallel workers (one file per worker).
+        """
+        if n_jobs is None or n_jobs <= 0:
+            n_jobs = os.cpu_count() or 1
+        if n_jobs == 1 or len(files) <= 1:
+            results = [_count_worker(f) for f in files]
+        else:
+            with Pool(min(n_jobs, len(files))) as pool:
+                results = pool.map(_count_worker, files)
+
+        index: dict[str, int] = {}
+        rows, cols, data = [], [], []
+        for state_idx, (names, counts, _) in enumerate(results):
+            rows.append(np.full(len(names), state_idx, dtype=np.int64))
+            cols.append(
+                np.array([index.setdefault(n, len(index)) for n in names], dtype=np.int64)
+            )
+            data.append(counts)
+        matrix = sparse.csr_matrix(
+            (
+                np.concatenate(data) if data else np.array([], dtype=np.int64),
+                (
+                    np.concatenate(rows) if rows else np.array([], dtype=np.int64),
+                    np.concatenate(cols) if cols else np.array([], dtype=np.int64),
+                ),
+            ),
+            shape=(len(files), len(index)),
+            dtype=np.int64,
+        )
+        n_frames = np.array([r[2] for r in results], dtype=np.int64)
+        return cls(list(index), matrix, n_frames)
+
+    def __add__(self, other: "ContactCounts") -> "ContactCounts":
+        """
+        Sum of two count sets over the same states.  Pairs new to *self*
+        are appended as columns; only *other*'s entries are remapped.
+        """
+        if other.n_states != self.n_states:
+            raise ValueError(
+                f"Cannot add counts of {other.n_states} states to {self.n_states} states."
+            )
+        index = {name: i for i, name in enumerate(self.pair_names)}
+        new = [name for name in other.pair_names if name not in index]
+        for name in new:
+            index[name] = len(index)
+        remap = np.array([index[name] for name in other.pair_names], dtype=np.int64)
+
+        other_coo = other.counts.tocoo()
+        shape = (self.n_states, len(index))
+        mine = self.counts.copy()
+        mine.resize(shape)
+        theirs = sparse.csr_matrix(
+            (other_coo.data, (other_coo.row, remap[other_coo.col])),
+            shape=shape,
+            dtype=np.int64,
+        )
+        return ContactCounts(
+            self.pair_names + new, mine + theirs, self.n_frames + other.n_frames
+        )
+
+    def frequencies(self, columns: list[str] | None = None) -> pd.DataFrame:
+        """
+        Dense (states x pairs) contact frequencies, ``counts / n_frames``.
+        *columns* selects and orders the pairs (absent pairs are 0).
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scale = np.where(self.n_frames > 0, 1.0 / self.n_frames, 0.0)
+        dense = sparse.diags(scale) @ self.counts.astype(np.float64)
+        df = pd.DataFrame(
+            dense.toarray(), columns=self.pair_names, index=range(self.n_states)
+        )
+        if columns is not None:
+            df = df.reindex(columns=columns, fill_value=0.0)
+        return df
+
+    def digest(self) -> str:
+        """
+        SHA-256 of the pair names, counts and frame totals; equal digests
+        mean identical frequency matrices.
+        """
+        counts = self.counts.copy()
+        counts.sum_duplicates()
+        digest = hashlib.sha256()
+        digest.update("\n".join(self.pair_names).encode())
+        for array in (counts.data, counts.indices, counts.indptr, self.n_frames):
+            digest.update(np.ascontiguousarray(array, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Write the counts as npz (atomically)."""
+        path = str(path)
+        tmp = f"{path}.tmp.npz"
+        np.savez(
+            tmp,
+            pair_names=np.array(self.pair_names, dtype=str),
+            data=self.counts.data,
+            indices=self.counts.indices,
+            indptr=self.counts.indptr,
+            n_frames=self.n_frames,
+        )
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str | os.PathLike) -> "ContactCounts":
+        with np.load(str(path)) as f:
+            names = f["pair_names"].tolist()
+            n_frames = f["n_frames"]
+            counts = sparse.csr_matrix(
+                (f["data"], f["indices"], f["indptr"]),
+                shape=(len(n_frames), len(names)),
+                dtype=np.int64,
+            )
+        return cls(names, counts, n_frames)
+
+
+def run_contact_files(
+    run: int, n_states: int, contact_base: str = "./contact_output"
+) -> list[tuple[str, str]] | None:
+    """
+    ``(path, format)`` of every state's contact file of *run*, or None if
+    any state's file is missing.
+    """
+    files = []
+    for state_idx in range(n_states):
+        found = _find_contact_files(
+            state_idx, contact_base, f"run_{run}/contacts/cont_state_{{state}}.*"
+        )
+        found = [f for f in found if f[0].endswith((".parquet", ".tsv"))]
+        if not found:
+            return None
+        # prefer parquet, as the default layout does
+        files.append(sorted(found, key=lambda f: f[1] != "parquet")[0])
+    return files
+
+
+def cumulative_counts(
+    run: int,
+    n_states: int,
+    analysis_base: str = "./analysis_output",
+    contact_base: str = "./contact_output",
+    n_jobs: int = 1,
+) -> ContactCounts:
+    """
+    Cumulative counts of runs 1..*run*: the previous run's stored counts
+    plus this run's contact files.
+
+    Runs processed before counts were stored are rebuilt from their contact
+    files; runs whose contact files are gone are skipped with a warning.
+    """
+    current_files = run_contact_files(run, n_states, contact_base)
+    if current_files is None:
+        raise FileNotFoundError(f"Contact files of run {run} are incomplete.")
+    current = ContactCounts.from_contact_files(current_files, n_jobs=n_jobs)
+
+    prior_path = os.path.join(analysis_base, f"run_{run - 1}", COUNTS_FILE)
+    if run == 1:
+        return current
+    if os.path.exists(prior_path):
+        return ContactCounts.load(prior_path) + current
+
+    total = ContactCounts.empty(n_states)
+    for prior_run in range(1, run):
+        files = run_contact_files(prior_run, n_states, contact_base)
+        if files is None:
+            print(
+                f"  [WARN] No counts or contact files for run {prior_run}; "
+                "it is left out of the cumulative contacts."
+            )
+            continue
+        total = total + ContactCounts.from_contact_files(files, n_jobs=n_jobs)
+    return total + current
@@ -0,0 +1,690 @@
+"""
+Native contact detection with MDAnalysis cell lists.
+
+A third contact engine next to getcontacts (CPU, slow) and ultracontacts
+(GPU) that needs nothing beyond NumPy and MDAnalysis.  Heavy-atom pairs
+within the largest interaction cutoff are found per frame with
+``self_capped_distance`` (a cell list, so the cost scales with the number of
+close pairs rather than n_atoms²) and classified with vectorised geometry:
+
+- ``sb``: salt bridges, anionic O and cationic N within 4.0 Å
+- ``hbbb``/``hbsb``/``hbss``: hydrogen bonds, donor–acceptor within 3.5 Å
+  and D–H···A angle ≥ 110° (distance only when the topology has no
+  hydrogens), labelled by backbone / side-chain participation
+- ``pc``: pi-cation, LYS NZ / ARG CZ within 6.0 Å of an aromatic ring
+  centroid and within 60° of the ring normal
+- ``ps``/``ts``: parallel and T-shaped stacking between ring centroids
+- ``hp``: hydrophobic, side-chain C/S of hydrophobic residues within the
+  sum of vdW radii + 0.5 Å
+- ``vdw``: heavy atoms within the sum of vdW radii + 0.5 Å
+
+Residues adjacent in sequence are excluded from ``hp`` and ``vdw``.
+Cutoffs follow getcontacts' defaults.  The analysis only uses residue-pair
+frequencies, so one interaction of any class makes a residue pair "in
+contact" in a frame.
+
+Frames are processed in chunks by a process pool.  The output is an
+ultracontacts-style per-frame parquet (``frame, interaction_type, atom1,
+atom2``).  The parsed per-frame contact store (the ``.cache/*.npz`` read by
+chacra.convergence) is written from the same arrays, so the file is never
+re-parsed, and :func:`contact_frequencies` condenses the store into the
+one-row frequency parquet read by make_contact_dataframe.
+
+:func:`candidate_residue_pairs` is a cheap pre-pass for any engine: over
+strided frames of every state it keeps the residue pairs whose closest CA or
+side-chain centroid ever comes within a generous cutoff, so the atomistic
+search only evaluates pairs that can interact.
+"""
+
+import os
+from dataclasses import dataclass
+from multiprocessing import Pool
+
+import MDAnalysis as mda
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from MDAnalysis.lib.distances import (
+    capped_distance,
+    minimize_vectors,
+    self_capped_distance,
+)
+
+from chacra.convergence import (
+    _FRAME_BITS,
+    _load_state_contacts_from_file,
+    _split_pair_keys,
+    _write_contact_cache,
+)
+
+ITYPES = ("sb", "hbbb", "hbsb", "hbss", "pc", "ps", "ts", "hp", "vdw")
+
+SALT_BRIDGE_CUTOFF = 4.0
+HBOND_CUTOFF = 3.5
+HBOND_MIN_ANGLE = 110.0
+PI_CATION_CUTOFF = 6.0
+PI_CATION_ANGLE = 60.0
+PI_STACK_CUTOFF = 7.0
+PI_STACK_ANGLE = 30.0
+T_STACK_CUTOFF = 5.0
+T_STACK_ANGLE = 30.0
+STACK_PSI_ANGLE = 45.0
+VDW_EPSILON = 0.5
+
+_VDW_RADII = {"C": 1.7, "N": 1.55, "O": 1.52, "S": 1.8}
+_MAX_CUTOFF = max(
+    2 * max(_VDW_RADII.values()) + VDW_EPSILON, SALT_BRIDGE_CUTOFF, HBOND_CUTOFF
+)
+_BACKBONE = {"N", "CA", "C", "O", "OXT", "OT1", "OT2"}
+_HIS = {"HIS", "HID", "HIE", "HIP", "HSD", "HSE", "HSP", "HSH"}
+_HIS_PROTONATED = {"HIP", "HSP", "HSH"}
+_ANIONS = {"ASP": {"OD1", "OD2"}, "GLU": {"OE1", "OE2"}}
+_CATIONS = {"LYS": {"NZ"}, "ARG": {"NE", "NH1", "NH2"}}
+_PI_CATIONS = {"LYS": "NZ", "ARG": "CZ"}
+_HYDROPHOBIC = {"ALA", "CYS", "ILE", "LEU", "MET", "PHE", "PRO", "TRP", "TYR", "VAL"}
+# ring atoms in ring order; atoms 0, 2 and 4 span the ring plane
+_RINGS = {
+    "PHE": ("CG", "CD1", "CE1", "CZ", "CE2", "CD2"),
+    "TYR": ("CG", "CD1", "CE1", "CZ", "CE2", "CD2"),
+    "TRP": ("CD2", "CE2", "CZ2", "CH2", "CZ3", "CE3"),
+    "HIS": ("CG", "ND1", "CE1", "NE2", "CD2"),
+}
+_PARQUET_ROW_GROUP = 1 << 20
+
+# CA / side-chain centroid distance under which a residue pair is kept by the
+# prefilter: the longest side chains (Arg, Lys) reach ~4 Å past their
+# centroid, and ring interactions are scored up to 7 Å between centroids
+PREFILTER_CUTOFF = 12.0
+PREFILTER_STRIDE = 10
+
+
+def _element(name: str) -> str:
+    # PDB atom names start with the element for every protein heavy atom
+    return name.lstrip("0123456789")[:1].upper()
+
+
+@dataclass
+class _ContactTopology:
+    """Per-atom flags and index tables of one selection, built once."""
+
+    heavy: np.ndarray
+    residue: np.ndarray
+    chain: np.ndarray
+    radius: np.ndarray
+    backbone: np.ndarray
+    anion: np.ndarray
+    cation: np.ndarray
+    donor: np.ndarray
+    acceptor: np.ndarray
+    hydrophobic: np.ndarray
+    donor_h: np.ndarray
+    has_hydrogens: bool
+    rings: np.ndarray
+    ring_size: np.ndarray
+    ring_residue: np.ndarray
+    pi_cations: np.ndarray
+    n_residues: int
+    # sorted lo * n_residues + hi codes of the residue pairs to evaluate
+    residue_pairs: np.ndarray | None = None
+
+
+def _residue_labels(atoms: mda.AtomGroup) -> np.ndarray:
+    """``chain:resname:resid`` for every residue of the selection."""
+    residues = atoms.residues
+    chains = None
+    if hasattr(residues.atoms, "chainIDs"):
+        chains = np.array([r.atoms.chainIDs[0] for r in residues])
+    if chains is None or not all(chains):
+        chains = residues.segids
+    return np.array(
+        [f"{c}:{n}:{i}" for c, n, i in zip(chains, residues.resnames, residues.resids)]
+    )
+
+
+def _atom_labels(atoms: mda.AtomGroup) -> np.ndarray:
+    """``chain:resname:resid:name`` for every atom of the selection."""
+    res_labels = _residue_labels(atoms)
+    residue = np.searchsorted(atoms.residues.resindices, atoms.resindices)
+    return np.array([f"{res_labels[r]}:{n}" for r, n in zip(residue, atoms.names)])
+
+
+def _prepare(atoms: mda.AtomGroup, residue_pairs=None) -> _ContactTopology:
+    n = atoms.n_atoms
+    names = atoms.names
+    resnames = np.array([str(r) for r in atoms.resnames])
+    element = np.array([_element(name) for name in names])
+    residue = np.searchsorted(atoms.residues.resindices, atoms.resindices)
+    chain = np.searchsorted(
+        np.unique(atoms.segindices), atoms.segindices
+    )
+    hydrogen = element == "H"
+    heavy = np.flatnonzero(~hydrogen)
+
+    # hydrogens belong to the nearest heavy atom of their residue (bonds are
+    # often missing from PDB topologies); at most 3 per donor
+    donor_h = np.full((n, 3), -1, dtype=np.int64)
+    h_idx = np.flatnonzero(hydrogen)
+    if len(h_idx) and len(heavy):
+        pairs, dist = capped_distance(
+            atoms.positions[h_idx], atoms.positions[heavy], max_cutoff=1.3,
+            return_distances=True,
+        )
+        same = residue[h_idx[pairs[:, 0]]] == residue[heavy[pairs[:, 1]]]
+        pairs, dist = pairs[same], dist[same]
+        # nearest parent per hydrogen: first row per H after sorting by distance
+        pairs = pairs[np.lexsort((dist, pairs[:, 0]))]
+        first = np.r_[True, pairs[1:, 0] != pairs[:-1, 0]] if len(pairs) else []
+        for h, p in pairs[first]:
+            parent = heavy[p]
+            slot = np.flatnonzero(donor_h[parent] < 0)
+            if len(slot):
+                donor_h[parent, slot[0]] = h_idx[h]
+    has_h = (donor_h >= 0).any(axis=1)
+
+    base = np.array([("HIS" if r in _HIS else r) for r in resnames])
+    backbone = np.isin(names, list(_BACKBONE))
+    anion = np.array(
+        [name in _ANIONS.get(r, ()) for r, name in zip(base, names)]
+    )
+    # histidine is cationic when named so or when both ring N carry an H
+    his_charged = np.zeros(n, dtype=bool)
+    for r in np.unique(residue[base == "HIS"]):
+        ring_n = np.flatnonzero((residue == r) & np.isin(names, ["ND1", "NE2"]))
+        if len(ring_n) and (
+            resnames[ring_n[0]] in _HIS_PROTONATED
+            or (len(ring_n) == 2 and has_h[ring_n].all())
+        ):
+            his_charged[ring_n] = True
+    cation = his_charged | np.array(
+        [name in _CATIONS.get(r, ()) for r, name in zip(base, names)]
+    )
+    if hydrogen.any():
+        donor = np.isin(element, ["N", "O"]) & has_h
+        acceptor = (element == "O") | ((base == "HIS") & (element == "N") & ~has_h)
+    else:
+        # heavy-atom topologies: every N/O may donate, every O may accept
+        donor = np.isin(element, ["N", "O"])
+        acceptor = element == "O"
+    hydrophobic = (
+        np.isin(base, list(_HYDROPHOBIC)) & np.isin(element, ["C", "S"]) & ~backbone
+    )
+    radius = np.array([_VDW_RADII.get(e, 1.7) for e in element])
+
+    rings, ring_size, ring_residue = [], [], []
+    for r in np.unique(residue):
+        members = np.flatnonzero(residue == r)
+        ring_names = _RINGS.get(base[members[0]])
+        if ring_names is None:
+            continue
+        lookup = dict(zip(names[members], members))
+        if not all(a in lookup for a in ring_names):
+            continue
+        idx = [lookup[a] for a in ring_names]
+        rings.append(idx + [idx[0]] * (6 - len(idx)))
+        ring_size.append(len(idx))
+        ring_residue.append(r)
+    pi_cations = np.array(
+        [i for i, (r, name) in enumerate(zip(base, names)) if _PI_CATIONS.get(r) == name],
+        dtype=np.int64,
+    )
+
+    n_residues = int(residue.max(initial=-1)) + 1
+    if residue_pairs is not None:
+        residue_pairs = np.asarray(residue_pairs, dtype=np.int64).reshape(-1, 2)
+        lo, hi = residue_pairs.min(axis=1), residue_pairs.max(axis=1)
+        residue_pairs = np.unique(lo * n_residues + hi)
+
+    return _ContactTopology(
+        heavy=heavy,
+        residue=residue,
+        chain=chain,
+        radius=radius,
+        backbone=backbone,
+        anion=anion,
+        cation=cation,
+        donor=donor,
+        acceptor=acceptor,
+        hydrophobic=hydrophobic,
+        donor_h=donor_h,
+        has_hydrogens=bool(hydrogen.any()),
+        rings=np.array(rings, dtype=np.int64).reshape(-1, 6),
+        ring_size=np.array(ring_size, dtype=np.int64),
+        ring_residue=np.array(ring_residue, dtype=np.int64),
+        pi_cations=pi_cations,
+        n_residues=n_residues,
+        residue_pairs=residue_pairs,
+    )
+
+
+def _vectors(a: np.ndarray, b: np.ndarray, box) -> np.ndarray:
+    """Minimum-image vectors b - a."""
+    v = (b - a).astype(np.float32)
+    if box is not None and len(v):
+        v = minimize_vectors(v, box)
+    return v
+
+
+def _angle(u: np.ndarray, v: np.ndarray, absolute: bool = False) -> np.ndarray:
+    """Angle in degrees between rows of u and v (folded to 0–90 if absolute)."""
+    cos = np.einsum("ij,ij->i", u, v) / (
+        np.linalg.norm(u, axis=1) * np.linalg.norm(v, axis=1) + 1e-12
+    )
+    if absolute:
+        cos = np.abs(cos)
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def _frame_contacts(
+    topo: _ContactTopology, pos: np.ndarray, box
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Contacts in one frame as (itype code, atom a, atom b) arrays of
+    selection atom indices.
+    """
+    codes, first, second = [], [], []
+
+    def add(itype, a, b):
+        if len(a):
+            codes.append(np.full(len(a), ITYPES.index(itype), dtype=np.int8))
+            first.append(a)
+            second.append(b)
+
+    pairs, d = self_capped_distance(
+        pos[topo.heavy], max_cutoff=_MAX_CUTOFF, box=box, return_distances=True
+    )
+    i, j = topo.heavy[pairs[:, 0]], topo.heavy[pairs[:, 1]]
+    res_i, res_j = topo.residue[i], topo.residue[j]
+    keep = res_i != res_j
+    if topo.residue_pairs is not None:
+        lo, hi = np.minimum(res_i, res_j), np.maximum(res_i, res_j)
+        keep &= np.isin(lo * topo.n_residues + hi, topo.residue_pairs)
+    i, j, d = i[keep], j[keep], d[keep]
+    adjacent = (topo.chain[i] == topo.chain[j]) & (
+        np.abs(topo.residue[i] - topo.residue[j]) <= 1
+    )
+
+    m = (
+        (topo.anion[i] & topo.cation[j]) | (topo.cation[i] & topo.anion[j])
+    ) & (d <= SALT_BRIDGE_CUTOFF)
+    add("sb", i[m], j[m])
+
+    hbond = np.zeros(len(i), dtype=bool)
+    for donor, acceptor in ((i, j), (j, i)):
+        m = topo.donor[donor] & topo.acceptor[acceptor] & (d <= HBOND_CUTOFF)
+        if topo.has_hydrogens and m.any():
+            cand = np.flatnonzero(m)
+            hs = topo.donor_h[donor[cand]]
+            ok = np.zeros(len(cand), dtype=bool)
+            for k in range(hs.shape[1]):
+                valid = hs[:, k] >= 0
+                if not valid.any():
+                    continue
+                h = hs[valid, k]
+                angle = _angle(
+                    _vectors(pos[h], pos[donor[cand[valid]]], box),
+                    _vectors(pos[h], pos[acceptor[cand[valid]]], box),
+                )
+                ok[valid] |= angle >= HBOND_MIN_ANGLE
+            m = np.zeros(len(i), dtype=bool)
+            m[cand[ok]] = True
+        hbond |= m
+    n_backbone = topo.backbone[i].astype(int) + topo.backbone[j]
+    for itype, count in (("hbbb", 2), ("hbsb", 1), ("hbss", 0)):
+        m = hbond & (n_backbone == count)
+        add(itype, i[m], j[m])
+
+    vdw = (d <= topo.radius[i] + topo.radius[j] + VDW_EPSILON) & ~adjacent
+    m = vdw & topo.hydrophobic[i] & topo.hydrophobic[j]
+    add("hp", i[m], j[m])
+    add("vdw", i[vdw], j[vdw])
+
+    if len(topo.rings):
+        ring_pos = pos[topo.rings]
+        rel = _vectors(
+            np.repeat(ring_pos[:, :1], 6, axis=1).reshape(-1, 3),
+            ring_pos.reshape(-1, 3),
+            box,
+        ).reshape(-1, 6, 3)
+        # padding repeats atom 0, whose offset is zero
+        centroid = ring_pos[:, 0] + rel.sum(axis=1) / topo.ring_size[:, None]
+        normal = np.cross(rel[:, 2], rel[:, 4])
+        normal /= np.linalg.norm(normal, axis=1, keepdims=True) + 1e-12
+        anchor = topo.rings[:, 0]
+
+        if len(topo.rings) > 1:
+            rp, rd = self_capped_distance(
+                centroid, max_cutoff=PI_STACK_CUTOFF, box=box, return_distances=True
+            )
+            p, q = rp[:, 0], rp[:, 1]
+            other = topo.ring_residue[p] != topo.ring_residue[q]
+            p, q, rd = p[other], q[other], rd[other]
+            if len(p):
+                theta = _angle(normal[p], normal[q], absolute=True)
+                psi = _angle(
+                    normal[p], _vectors(centroid[p], centroid[q], box), absolute=True
+                )
+                m = (theta <= PI_STACK_ANGLE) & (psi <= STACK_PSI_ANGLE)
+                add("ps", anchor[p[m]], anchor[q[m]])
+                m = (
+                    (rd <= T_STACK_CUTOFF)
+                    & (np.abs(90.0 - theta) <= T_STACK_ANGLE)
+                    & (psi <= STACK_PSI_ANGLE)
+                )
+                add("ts", anchor[p[m]], anchor[q[m]])
+
+        if len(topo.pi_cations):
+            cp = capped_distance(
+                pos[topo.pi_cations], centroid, max_cutoff=PI_CATION_CUTOFF, box=box,
+                return_distances=False,
+            )
+            c, r = topo.pi_cations[cp[:, 0]], cp[:, 1]
+            other = topo.residue[c] != topo.ring_residue[r]
+            c, r = c[other], r[other]
+            if len(c):
+                angle = _angle(normal[r], _vectors(centroid[r], pos[c], box), absolute=True)
+                m = angle <= PI_CATION_ANGLE
+                add("pc", anchor[r[m]], c[m])
+
+    if not codes:
+        empty = np.array([], dtype=np.int64)
+        return np.array([], dtype=np.int8), empty, empty
+    return np.concatenate(codes), np.concatenate(first), np.concatenate(second)
+
+
+def _residue_points(atoms: mda.AtomGroup) -> tuple[list[np.ndarray], np.ndarray]:
+    """
+    Atom groups whose centroids represent each residue (CA and the heavy
+    side-chain atoms; all heavy atoms for residues with neither) and the
+    residue index of each group.
+    """
+    names = atoms.names
+    element = np.array([_element(name) for name in names])
+    residue = np.searchsorted(atoms.residues.resindices, atoms.resindices)
+    backbone = np.isin(names, list(_BACKBONE))
+    groups, owner = [], []
+    for r in range(len(atoms.residues)):
+        heavy = (residue == r) & (element != "H")
+        ca = np.flatnonzero(heavy & (names == "CA"))
+        side = np.flatnonzero(heavy & ~backbone)
+        found = [g for g in (ca, side) if len(g)] or [np.flatnonzero(heavy)]
+        for g in found:
+            if len(g):
+                groups.append(g)
+                owner.append(r)
+    return groups, np.array(owner, dtype=np.int64)
+
+
+def _prefilter_worker(args: tuple) -> np.ndarray:
+    """Sorted unique lo * n_residues + hi codes of close residue pairs."""
+    topology, trajectory, selection, cutoff, stride = args
+    u = mda.Universe(topology, trajectory)
+    atoms = u.select_atoms(selection)
+    groups, owner = _residue_points(atoms)
+    n_residues = len(atoms.residues)
+    flat = np.concatenate(groups)
+    sizes = np.array([len(g) for g in groups])
+    starts = np.r_[0, np.cumsum(sizes)[:-1]]
+    codes = []
+    for ts in u.trajectory[::stride]:
+        box = ts.dimensions
+        if box is not None and not np.all(box[:3] > 0):
+            box = None
+        # unwrapped centroids: residues are assumed whole, as in the
+        # demultiplexed state trajectories
+        points = np.add.reduceat(atoms.positions[flat], starts) / sizes[:, None]
+        pairs = self_capped_distance(
+            points, max_cutoff=cutoff, box=box, return_distances=False,
+        )
+        a, b = owner[pairs[:, 0]], owner[pairs[:, 1]]
+        other = a != b
+        lo, hi = np.minimum(a[other], b[other]), np.maximum(a[other], b[other])
+        codes.append(np.unique(lo * n_residues + hi))
+    return np.unique(np.concatenate(codes)) if codes else np.array([], dtype=np.int64)
+
+
+def candidate_residue_pairs(
+    topology: str | os.PathLike,
+    trajectories: list[str | os.PathLike],
+    selection: str = "protein",
+    cutoff: float = PREFILTER_CUTOFF,
+    stride: int = PREFILTER_STRIDE,
+    n_jobs: int | None = None,
+) -> np.ndarray:
+    """
+    Residue pairs that can be in contact in any of *trajectories*.
+
+    A pair is a candidate when, in any of the strided frames of any
+    trajectory, its closest CA or side-chain centroid lies within *cutoff*.
+
+    Parameters
+    ----------
+    topology : str
+        Structure file matching the trajectory atoms.
+    trajectories : list[str]
+        Trajectory files, e.g. one per thermodynamic state.
+    selection : str, optional
+        MDAnalysis selection of the atoms to consider. Default is 'protein'.
+    cutoff : float, optional
+        Centroid distance cutoff in Å. Default is PREFILTER_CUTOFF.
+    stride : int, optional
+        Use every stride-th frame. Default is PREFILTER_STRIDE.
+    n_jobs : int, optional
+        Worker processes (one trajectory each). Default is all cores.
+
+    Returns
+    -------
+    np.ndarray
+        n x 2 residue indices (positions in the selection's residues),
+        lower index first, sorted. Pass to compute_contacts as
+        ``residue_pairs``.
+    """
+    u = mda.Universe(topology)
+    n_residues = len(u.select_atoms(selection).residues)
+    jobs = [(str(topology), str(t), selection, cutoff, stride) for t in trajectories]
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, len(jobs) or 1))
+    if n_jobs == 1:
+        results = [_prefilter_worker(job) for job in jobs]
+    else:
+        with Pool(n_jobs) as pool:
+            results = pool.map(_prefilter_worker, jobs)
+    codes = np.unique(np.concatenate(results)) if results else np.array([], dtype=np.int64)
+    return np.stack([codes // n_residues, codes % n_residues], axis=1)
+
+
+def vmd_residue_selection(
+    residue_pairs: np.ndarray,
+    topology: str | os.PathLike,
+    selection: str = "protein",
+) -> str:
+    """
+    VMD selection of the residues in *residue_pairs*, for getcontacts.
+
+    The prefilter numbers residues by their position in *selection* of
+    *topology*; VMD's ``residue`` is the 0-based residue index of the whole
+    structure.  The positions are mapped through the topology, so ligands,
+    ions or waters written alongside the protein do not shift them.
+
+    Raises
+    ------
+    ValueError
+        If a residue index lies outside *selection* (pairs computed on
+        another topology or selection).
+    """
+    residues = np.unique(np.asarray(residue_pairs, dtype=np.int64))
+    if len(residues) == 0:
+        return "none"
+    resindices = mda.Universe(str(topology)).select_atoms(selection).residues.resindices
+    if residues[0] < 0 or residues[-1] >= len(resindices):
+        raise ValueError(
+            f"Residue index {residues[-1]} is outside the {len(resindices)} "
+            f"residues of {selection!r} in {topology}; the candidate pairs "
+            "were computed for a different topology or selection."
+        )
+    residues = np.asarray(resindices, dtype=np.int64)[residues]
+    breaks = np.flatnonzero(np.diff(residues) != 1)
+    starts = residues[np.r_[0, breaks + 1]]
+    ends = residues[np.r_[breaks, len(residues) - 1]]
+    ranges = [str(a) if a == b else f"{a} to {b}" for a, b in zip(starts, ends)]
+    # the indices pin the residues; MDAnalysis selection syntax is not VMD's
+    return "residue " + " ".join(ranges)
+
+
+def _chunk_worker(args: tuple) -> tuple[np.ndarray, ...]:
+    """
+    Contacts of the source frames of one chunk → (frame, code, a, b) arrays,
+    with frames numbered by the given output indices.
+    """
+    topology, trajectory, selection, source, out_indices, residue_pairs = args
+    u = mda.Universe(topology, trajectory)
+    atoms = u.select_atoms(selection)
+    topo = _prepare(atoms, residue_pairs)
+    out_frames, out_codes, out_a, out_b = [], [], [], []
+    for out_index, ts in zip(out_indices, u.trajectory[list(source)]):
+        box = ts.dimensions
+        if box is not None and not np.all(box[:3] > 0):
+            box = None
+        codes, a, b = _frame_contacts(topo, atoms.positions, box)
+        out_frames.append(np.full(len(codes), out_index, dtype=np.int32))
+        out_codes.append(codes)
+        out_a.append(a.astype(np.int32))
+        out_b.append(b.astype(np.int32))
+    if not out_frames:
+        return tuple(np.array([], dtype=t) for t in (np.int32, np.int8, np.int32, np.int32))
+    return (
+        np.concatenate(out_frames),
+        np.concatenate(out_codes),
+        np.concatenate(out_a),
+        np.concatenate(out_b),
+    )
+
+
+def _write_contact_store(
+    output: str,
+    labels: np.ndarray,
+    residue: np.ndarray,
+    res_labels: np.ndarray,
+    frames: np.ndarray,
+    a: np.ndarray,
+    b: np.ndarray,
+) -> None:
+    """Write the parsed per-frame residue-pair store for *output*."""
+    # order residue pairs lexically, as the contact file parsers do
+    rank = np.empty(len(res_labels), dtype=np.int64)
+    rank[np.argsort(res_labels)] = np.arange(len(res_labels))
+    ra, rb = residue[a], residue[b]
+    swap = rank[rb] < rank[ra]
+    lo, hi = np.where(swap, rb, ra), np.where(swap, ra, rb)
+    pair_codes, pair_ids = np.unique(lo * len(res_labels) + hi, return_inverse=True)
+    names = [
+        f"{res_labels[c // len(res_labels)]}-{res_labels[c % len(res_labels)]}"
+        for c in pair_codes
+    ]
+    keys = np.unique((pair_ids.astype(np.int64) << _FRAME_BITS) | frames.astype(np.int64))
+    _write_contact_cache(output, *_split_pair_keys(keys, names, 0))
+
+
+def compute_contacts(
+    topology: str | os.PathLike,
+    trajectory: str | os.PathLike,
+    output: str | os.PathLike,
+    selection: str = "protein",
+    n_jobs: int | None = None,
+    stride: int = 1,
+    residue_pairs: np.ndarray | None = None,
+) -> dict:
+    """
+    Per-frame contacts of a trajectory, written as parquet.
+
+    Parameters
+    ----------
+    topology : str
+        Structure file matching the trajectory atoms.
+    trajectory : str
+        Trajectory file.
+    output : str
+        Output parquet path. The parsed per-frame store is written to
+        ``<output dir>/.cache/<name>.npz``.
+    selection : str, optional
+        MDAnalysis selection of the atoms to consider. Default is 'protein'.
+    n_jobs : int, optional
+        Worker processes over frame chunks. Default is all cores.
+    stride : int, optional
+        Use every stride-th frame. Frames are numbered 0.. in the output.
+    residue_pairs : np.ndarray, optional
+        n x 2 residue indices (positions in the selection's residues) of
+        the only residue pairs to evaluate, e.g. from a distance prefilter.
+
+    Returns
+    -------
+    dict with ``n_frames`` and ``n_contacts``.
+    """
+    output = str(output)
+    u = mda.Universe(topology, trajectory)
+    atoms = u.select_atoms(selection)
+    source = np.arange(0, len(u.trajectory), stride)
+    n_frames = len(source)
+    n_jobs = max(1, min(n_jobs or os.cpu_count() or 1, n_frames or 1))
+
+    # several chunks per worker balance uneven frames
+    jobs = [
+        (str(topology), str(trajectory), selection, chunk, out, residue_pairs)
+        for chunk, out in zip(
+            np.array_split(source, max(1, min(n_frames, 4 * n_jobs))),
+            np.array_split(np.arange(n_frames), max(1, min(n_frames, 4 * n_jobs))),
+        )
+        if len(chunk)
+    ]
+    if n_jobs == 1:
+        results = [_chunk_worker(job) for job in jobs]
+    else:
+        with Pool(n_jobs) as pool:
+            results = pool.map(_chunk_worker, jobs)
+
+    frames, codes, a, b = (
+        np.concatenate([r[k] for r in results]) if results
+        else np.array([], dtype=np.int32)
+        for k in range(4)
+    )
+    labels = _atom_labels(atoms)
+    res_labels = _residue_labels(atoms)
+    residue = np.searchsorted(atoms.residues.resindices, atoms.resindices)
+
+    label_dict = pa.array(labels, type=pa.string())
+    table = pa.table({
+        "frame": pa.array(frames, type=pa.int32()),
+        "interaction_type": pa.DictionaryArray.from_arrays(
+            pa.array(codes.astype(np.int32)), pa.array(ITYPES, type=pa.string())
+        ),
+        "atom1": pa.DictionaryArray.from_arrays(pa.array(a, type=pa.int32()), label_dict),
+        "atom2": pa.DictionaryArray.from_arrays(pa.array(b, type=pa.int32()), label_dict),
+    }).replace_schema_metadata({"n_frames": str(n_frames), "engine": "chacra"})
+
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    tmp = f"{output}.tmp"
+    pq.write_table(table, tmp, row_group_size=_PARQUET_ROW_GROUP)
+    os.replace(tmp, output)
+    _write_contact_store(output, labels, residue, res_labels, frames, a, b)
+    return {"n_frames": n_frames, "n_contacts": len(frames)}
+
+
+def contact_frequencies(contact_file: str | os.PathLike, output: str | os.PathLike) -> pd.DataFrame:
+    """
+    Condensed residue-pair frequencies of a per-frame contact parquet.
+
+    The pairs are read from the per-frame contact store (parsed once by
+    compute_contacts). The result is a one-row DataFrame with one column
+    per residue pair, written to *output* as parquet.
+    """
+    contact_file = str(contact_file)
+    _, pair_frames = _load_state_contacts_from_file(contact_file, "parquet")
+    metadata = pq.read_schema(contact_file).metadata or {}
+    if b"n_frames" in metadata:
+        n_frames = int(metadata[b"n_frames"])
+    else:
+        n_frames = int(pq.read_table(contact_file, columns=["frame"])["frame"].to_numpy().max()) + 1
+    freqs = pd.DataFrame(
+        [{pair: len(arr) / n_frames for pair, arr in pair_frames.items()}]
+    )
+    freqs.to_parquet(str(output))
+    return freqs
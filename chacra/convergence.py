@@ -21,14 +21,24 @@ Metrics
   probability vectors of consecutive runs.
 - **Bootstrap loading stability**: resamples frames to quantify how
   consistently each contact ranks in the top-*k* loadings.
+- **Effective sample size**: FFT autocorrelation of each contact's
+  per-frame presence series gives its statistical inefficiency, the
+  number of effectively independent frames and a decorrelation stride.
+- **Convergence curve**: split-half, accumulated-vs-final and k-fold
+  RMSIP / correlation at evenly spaced checkpoints, from one load of
+  block-binned contact counts.
 - **Exchange diagnostics**: detects bottlenecks in the replica-exchange
-  swap probability matrix.
+  swap probability matrix, alongside measured round trips and ladder
+  flow when a mixing summary is available.
 """
 
 from __future__ import annotations
 
 import json
+import math
 import os
+import re
+import zipfile
 from collections import defaultdict
 from dataclasses import dataclass, field
 from multiprocessing import Pool, cpu_count
@@ -39,6 +49,8 @@ import numpy as np
 import pandas as pd
 from sklearn.decomposition import PCA
 
+from chacra.windowed_frequencies import _max_frame_tsv
+
 
 # ───────────────────────────────────────────────────────────────────────────── #
 # Per-frame contact data loading                                               #
@@ -59,7 +71,8 @@ class _StateContacts:
     state_idx : int
         The thermodynamic state index.
     frames : np.ndarray
-        Sorted int32 array of unique (globally offset) frame indices.
+        Sorted int32 array of every recorded (globally offset) frame index,
+        including frames without any contact (see :func:`_recorded_n_frames`).
     pair_frames : dict[str, np.ndarray]
         Mapping from "res1-res2" → sorted int32 array of frame indices
         where the pair appears.
@@ -142,8 +155,8 @@ def _find_contact_files(
 
 
 def _load_state_contacts_from_file(
-    path: str, fmt: str, frame_offset: int = 0,
-) -> tuple[np.ndarray, dict[str, set[int]]]:
+    path: str, fmt: str, frame_offset: int = 0, use_cache: bool = True,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
     """
     Read one per-frame contact file and return (frames, pair_frames).
 
@@ -155,115 +168,313 @@ def _load_state_contacts_from_file(
         ``'parquet'`` or ``'tsv'``.
     frame_offset : int
         Offset added to frame indices (for combining files across runs).
+    use_cache : bool
+        Reuse (or create) the parsed ``.npz`` cache stored beside the
+        contact file.  See :func:`_read_contact_cache`.
 
     Returns
     -------
     frames : np.ndarray
         Sorted unique (offset) frame indices.
-    pair_frames : dict[str, set[int]]
-        Mapping from "res1-res2" → set of (offset) frame indices.
+    pair_frames : dict[str, np.ndarray]
+        Mapping from "res1-res2" → sorted int32 array of (offset) frame
+        indices.
     """
+    if not use_cache:
+        return _parse_contact_file(path, fmt, frame_offset)
+
+    cached = _read_contact_cache(path)
+    if cached is None:
+        cached = _parse_contact_file(path, fmt, 0)
+        _write_contact_cache(path, *cached)
+    return _offset_contacts(*cached, frame_offset)
+
+
+def _parse_contact_file(
+    path: str, fmt: str, frame_offset: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Dispatch to the parquet or TSV parser."""
     if fmt == "parquet":
         return _load_parquet_contacts(path, frame_offset)
     else:
         return _load_tsv_contacts(path, frame_offset)
 
 
-def _load_parquet_contacts(
-    path: str, frame_offset: int,
-) -> tuple[np.ndarray, dict[str, np.ndarray]]:
-    """Stream a parquet contact file via Polars and return sorted int32 arrays."""
-    import polars as pl
-
-    df = (
-        pl.scan_parquet(path)
-        .with_columns([
-            pl.col("atom1").str.split(":").list.slice(0, 3).list.join(":").alias("res1_raw"),
-            pl.col("atom2").str.split(":").list.slice(0, 3).list.join(":").alias("res2_raw"),
-        ])
-        .with_columns([
-            pl.when(pl.col("res2_raw") < pl.col("res1_raw"))
-              .then(pl.col("res2_raw")).otherwise(pl.col("res1_raw")).alias("res1"),
-            pl.when(pl.col("res2_raw") < pl.col("res1_raw"))
-              .then(pl.col("res1_raw")).otherwise(pl.col("res2_raw")).alias("res2"),
-        ])
-        .unique(subset=["frame", "res1", "res2"])
-        .select(["frame", "res1", "res2"])
-        .collect(streaming=True)
+# Vectorised getcontacts TSV parsing.  Lines are read as a single string
+# column so the variable column count of getcontacts output (bridges,
+# --distout) never trips the CSV parser; the regex both rejects comment
+# lines (no match → null) and trims atoms to their "chain:resname:resid".
+_TSV_LINE_PATTERN = (
+    r"^(?P<frame>\d+)\t[^\t]*\t"
+    r"(?P<res1>[^:\t]*:[^:\t]*:[^:\t]*)[^\t]*\t"
+    r"(?P<res2>[^:\t]*:[^:\t]*:[^:\t]*)"
+)
+_RESIDUE_PATTERN = r"^(?P<res>[^:]*:[^:]*:[^:]*)"
+_TSV_BLOCK_SIZE = 64 << 20  # bytes per streamed chunk
+_PARQUET_BATCH_ROWS = 1 << 20
+
+# (frame, pair) rows are deduplicated as single int64 keys:
+# ``pair_id << 32 | frame``.  Sorting the keys groups rows by pair with
+# frames ascending inside each group.
+_FRAME_BITS = 32
+_FRAME_MASK = (1 << _FRAME_BITS) - 1
+
+
+def _iter_tsv_batches(path: str):
+    """Yield (frame, res1, res2) Arrow arrays from a getcontacts TSV."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv
+
+    reader = csv.open_csv(
+        path,
+        read_options=csv.ReadOptions(
+            column_names=["line"], block_size=_TSV_BLOCK_SIZE,
+        ),
+        parse_options=csv.ParseOptions(
+            delimiter="\x1f", quote_char=False, escape_char=False,
+        ),
+        convert_options=csv.ConvertOptions(column_types={"line": pa.string()}),
     )
+    for batch in reader:
+        fields = pc.extract_regex(batch.column(0), _TSV_LINE_PATTERN)
+        fields = fields.filter(pc.is_valid(fields))
+        if len(fields) == 0:
+            continue
+        yield (
+            pc.cast(pc.struct_field(fields, "frame"), pa.int64()),
+            pc.struct_field(fields, "res1"),
+            pc.struct_field(fields, "res2"),
+        )
+
 
-    frames_raw = df["frame"].to_numpy() + frame_offset
-    res1_arr = df["res1"].to_list()
-    res2_arr = df["res2"].to_list()
+def _iter_parquet_batches(path: str):
+    """Yield (frame, res1, res2) Arrow arrays from an ultracontacts parquet."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    for batch in pf.iter_batches(
+        batch_size=_PARQUET_BATCH_ROWS, columns=["frame", "atom1", "atom2"],
+    ):
+        res1, res2 = (
+            pc.struct_field(
+                pc.extract_regex(pc.cast(batch.column(col), pa.string()), _RESIDUE_PATTERN),
+                "res",
+            )
+            for col in ("atom1", "atom2")
+        )
+        yield pc.cast(batch.column("frame"), pa.int64()), res1, res2
+
+
+def _iter_contact_chunks(path: str, fmt: str, pair_index: dict[str, int]):
+    """
+    Stream a per-frame contact file as integer arrays.
+
+    Yields ``(pair_ids, frames)`` int64 arrays, one pair per contact row
+    (not yet deduplicated).  Residue pairs are ordered lexically, joined
+    as "res1-res2" and mapped to ids through *pair_index*, which grows as
+    new pairs are seen and so doubles as the id → name vocabulary.
+    """
+    import pyarrow.compute as pc
+
+    batches = _iter_parquet_batches(path) if fmt == "parquet" else _iter_tsv_batches(path)
+    for frame, res1, res2 in batches:
+        swap = pc.less(res2, res1)
+        pair = pc.binary_join_element_wise(
+            pc.if_else(swap, res2, res1), pc.if_else(swap, res1, res2), "-",
+        ).dictionary_encode()
+
+        # Chunk-local dictionary codes → global pair ids
+        lut = np.array(
+            [pair_index.setdefault(p, len(pair_index))
+             for p in pair.dictionary.to_pylist()],
+            dtype=np.int64,
+        )
+        yield (
+            lut[pair.indices.to_numpy(zero_copy_only=False)],
+            frame.to_numpy(zero_copy_only=False),
+        )
+
+
+def _split_pair_keys(
+    keys: np.ndarray,
+    pair_names: list[str],
+    frame_offset: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Turn sorted unique ``pair_id << 32 | frame`` keys into the
+    ``(frames, pair_frames)`` representation used by ``_StateContacts``.
 
-    unique_frames = np.unique(frames_raw).astype(np.int32)
+    The per-pair arrays are views into one shared int32 buffer.
+    """
+    if len(keys) == 0:
+        return np.array([], dtype=np.int32), {}
 
-    # Accumulate as lists then convert to sorted int32 arrays (7× less RAM than sets)
-    pair_lists: dict[str, list] = defaultdict(list)
-    for frame, r1, r2 in zip(frames_raw, res1_arr, res2_arr):
-        pair_lists[f"{r1}-{r2}"].append(int(frame))
+    pair_ids = keys >> _FRAME_BITS
+    frames = (keys & _FRAME_MASK).astype(np.int32) + np.int32(frame_offset)
+    starts = np.flatnonzero(np.r_[True, pair_ids[1:] != pair_ids[:-1]])
 
-    pair_frames: dict[str, np.ndarray] = {
-        pair: np.array(sorted(set(lst)), dtype=np.int32)
-        for pair, lst in pair_lists.items()
+    pair_frames = {
+        pair_names[pid]: arr
+        for pid, arr in zip(pair_ids[starts], np.split(frames, starts[1:]))
     }
-    return unique_frames, pair_frames
+    return np.unique(frames), pair_frames
+
+
+def _load_contact_keys(
+    path: str, fmt: str, frame_offset: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """
+    Read a contact file chunk by chunk and return sorted int32 arrays
+    per pair.
+
+    Each chunk is reduced to unique int64 ``(pair, frame)`` keys, so no
+    per-row Python work is done and duplicates never reach a ``set``.
+    """
+    pair_index: dict[str, int] = {}
+    chunk_keys = [
+        np.unique((pair_ids << _FRAME_BITS) | frames)
+        for pair_ids, frames in _iter_contact_chunks(path, fmt, pair_index)
+    ]
+    if not chunk_keys:
+        return np.array([], dtype=np.int32), {}
+
+    # Rows for one frame can straddle a chunk boundary — dedupe globally
+    keys = np.unique(np.concatenate(chunk_keys))
+    return _split_pair_keys(keys, list(pair_index), frame_offset)
+
+
+def _load_parquet_contacts(
+    path: str, frame_offset: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Stream an ultracontacts parquet file and return sorted int32 arrays per pair."""
+    return _load_contact_keys(path, "parquet", frame_offset)
 
 
 def _load_tsv_contacts(
     path: str, frame_offset: int,
 ) -> tuple[np.ndarray, dict[str, np.ndarray]]:
-    """Stream a getcontacts TSV file and return sorted int32 arrays per pair."""
-    # Accumulate as lists (cheaper per-append than sets for large data)
-    pair_lists: dict[str, list] = defaultdict(list)
-    seen_frames: set[int] = set()
-    seen_frame_pairs: set[tuple[int, str]] = set()
-
-    with open(path) as fh:
-        for line in fh:
-            if line.startswith("#"):
-                continue
-            parts = line.rstrip().split("\t")
-            if len(parts) < 4:
-                continue
+    """
+    Stream a getcontacts TSV file and return sorted int32 arrays per pair.
+
+    The file is read in ``_TSV_BLOCK_SIZE`` chunks with pyarrow's CSV
+    reader and parsed with Arrow string kernels.
+    """
+    return _load_contact_keys(path, "tsv", frame_offset)
+
+
+# ───────────────────────────────────────────────────────────────────────────── #
+# Parsed contact cache                                                         #
+# ───────────────────────────────────────────────────────────────────────────── #
 
-            frame = int(parts[0]) + frame_offset
-            seen_frames.add(frame)
+# Parsed files are cached as ``<contact dir>/.cache/<file name>.npz`` holding
+# the un-offset frames plus a CSR layout of the per-pair frame arrays.  A
+# cache entry is valid only while the source path, size and mtime match.
+_CACHE_DIRNAME = ".cache"
+_CACHE_VERSION = 1
 
-            atom1_parts = parts[2].split(":")
-            atom2_parts = parts[3].split(":")
-            res1 = ":".join(atom1_parts[:3])
-            res2 = ":".join(atom2_parts[:3])
 
-            if res2 < res1:
-                res1, res2 = res2, res1
+def _cache_path(path: str) -> Path:
+    src = Path(path)
+    return src.parent / _CACHE_DIRNAME / f"{src.name}.npz"
 
-            pair = f"{res1}-{res2}"
-            key = (frame, pair)
-            if key not in seen_frame_pairs:
-                seen_frame_pairs.add(key)
-                pair_lists[pair].append(frame)
 
-    # Convert to sorted int32 arrays — ~7× less RAM than Python sets
-    pair_frames: dict[str, np.ndarray] = {
-        pair: np.array(lst, dtype=np.int32)   # already unique via seen_frame_pairs
-        for pair, lst in pair_lists.items()
-    }
-    # Sort each array (insertion order from the TSV is frame-sorted, but be safe)
-    for arr in pair_frames.values():
-        arr.sort()
+def _file_fingerprint(path: str) -> str:
+    st = os.stat(path)
+    return json.dumps({
+        "path": str(Path(path).resolve()),
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "version": _CACHE_VERSION,
+    }, sort_keys=True)
 
-    return np.array(sorted(seen_frames), dtype=np.int32), pair_frames
+
+def _read_contact_cache(
+    path: str,
+) -> tuple[np.ndarray, dict[str, np.ndarray]] | None:
+    """
+    Return the cached (frames, pair_frames) for *path* with no frame
+    offset applied, or None when the cache is missing or stale.
+    """
+    cache = _cache_path(path)
+    if not cache.exists():
+        return None
+    try:
+        with np.load(cache, allow_pickle=False) as npz:
+            if str(npz["fingerprint"]) != _file_fingerprint(path):
+                return None
+            frames = npz["frames"]
+            pair_names = npz["pair_names"].tolist()
+            pair_offsets = npz["pair_offsets"]
+            pair_data = npz["pair_data"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    pair_frames = dict(zip(pair_names, np.split(pair_data, pair_offsets[1:-1])))
+    return frames, pair_frames
+
+
+def _write_contact_cache(
+    path: str,
+    frames: np.ndarray,
+    pair_frames: dict[str, np.ndarray],
+) -> None:
+    """Write the un-offset parse of *path* to its cache file."""
+    cache = _cache_path(path)
+    lengths = np.fromiter((len(a) for a in pair_frames.values()), dtype=np.int64,
+                          count=len(pair_frames))
+    pair_offsets = np.zeros(len(pair_frames) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=pair_offsets[1:])
+    pair_data = (
+        np.concatenate(list(pair_frames.values())) if pair_frames
+        else np.array([], dtype=np.int32)
+    )
+    try:
+        cache.parent.mkdir(exist_ok=True)
+        # Write to a temp name first so an interrupted write is never read
+        tmp = cache.with_name(f"{cache.stem}.tmp.npz")
+        np.savez(
+            tmp,
+            fingerprint=np.array(_file_fingerprint(path)),
+            frames=frames,
+            pair_names=np.array(list(pair_frames), dtype=str),
+            pair_offsets=pair_offsets,
+            pair_data=pair_data,
+        )
+        os.replace(tmp, cache)
+    except OSError as e:
+        print(f"  [warning] Could not write contact cache {cache}: {e}")
+
+
+def _offset_contacts(
+    frames: np.ndarray,
+    pair_frames: dict[str, np.ndarray],
+    frame_offset: int,
+) -> tuple[np.ndarray, dict[str, np.ndarray]]:
+    """Shift un-offset cached frame indices by *frame_offset*."""
+    if frame_offset == 0:
+        return frames, pair_frames
+    shift = np.int32(frame_offset)
+    return frames + shift, {pair: arr + shift for pair, arr in pair_frames.items()}
 
 
 def _load_state_contacts(
     state_idx: int,
     contact_base: str = "./contact_output",
     file_pattern: str | None = None,
+    use_cache: bool = True,
 ) -> _StateContacts:
     """
     Load all per-frame contacts for a thermodynamic state, combining
     data from all runs with frame offsets to avoid index collisions.
+
+    Each file spans its recorded frame count, so frames without contacts
+    are part of ``frames`` and count towards every frequency denominator.
+
+    With ``use_cache`` only files that are new or changed since their
+    last parse are read; unchanged runs come from their ``.npz`` cache.
     """
     files = _find_contact_files(state_idx, contact_base, file_pattern)
     if not files:
@@ -278,31 +489,38 @@ def _load_state_contacts(
         )
 
     all_frames = []
-    all_pair_frames: dict[str, set[int]] = defaultdict(set)
+    all_pair_frames: dict[str, list[np.ndarray]] = defaultdict(list)
     offset = 0
 
     for path, fmt in files:
-        frames, pair_frames = _load_state_contacts_from_file(path, fmt, offset)
-        all_frames.append(frames)
+        frames, pair_frames = _load_state_contacts_from_file(
+            path, fmt, offset, use_cache=use_cache,
+        )
+        # the frame count the streaming block counts use, too
+        size = _n_frames_in_file(path, fmt)
+        all_frames.append(np.arange(offset, offset + size, dtype=np.int32))
 
-        for pair, fset in pair_frames.items():
-            all_pair_frames[pair].update(fset)
+        for pair, arr in pair_frames.items():
+            all_pair_frames[pair].append(arr)
 
-        # Next run's frames start after this run's max frame + 1
-        if len(frames) > 0:
-            offset = int(frames.max()) + 1
+        # Next run's frames start after this run's last recorded frame
+        offset += size
 
+    # Offsets keep runs disjoint and increasing, so concatenation stays sorted
     return _StateContacts(
         state_idx=state_idx,
-        frames=np.concatenate(all_frames) if all_frames else np.array([], dtype=int),
-        pair_frames=dict(all_pair_frames),
+        frames=np.concatenate(all_frames) if all_frames else np.array([], dtype=np.int32),
+        pair_frames={
+            pair: arrs[0] if len(arrs) == 1 else np.concatenate(arrs)
+            for pair, arrs in all_pair_frames.items()
+        },
     )
 
 
 def _load_state_worker(args: tuple) -> _StateContacts:
     """Multiprocessing wrapper for _load_state_contacts."""
-    state_idx, contact_base, file_pattern = args
-    return _load_state_contacts(state_idx, contact_base, file_pattern)
+    state_idx, contact_base, file_pattern, use_cache = args
+    return _load_state_contacts(state_idx, contact_base, file_pattern, use_cache)
 
 
 def _load_all_states(
@@ -310,6 +528,7 @@ def _load_all_states(
     contact_base: str,
     file_pattern: str | None,
     n_jobs: int,
+    use_cache: bool = True,
 ) -> list[_StateContacts]:
     """
     Load contact data for all states, with automatic fallback.
@@ -318,7 +537,7 @@ def _load_all_states(
     _StateContacts objects are too large to pickle through the pipe
     (BrokenPipeError), falls back to sequential loading automatically.
     """
-    args = [(i, contact_base, file_pattern) for i in range(n_states)]
+    args = [(i, contact_base, file_pattern, use_cache) for i in range(n_states)]
 
     if n_jobs == 1:
         print(f"  Loading {n_states} states sequentially...")
@@ -371,6 +590,311 @@ def _build_freq_matrix(
     return df
 
 
+@dataclass
+class _StateBlockCounts:
+    """
+    Per-pair contact counts for one state, binned into contiguous blocks
+    of (near-)equal frame count.
+
+    Attributes
+    ----------
+    state_idx : int
+        The thermodynamic state index.
+    pairs : list[str]
+        Contact names, one per column of ``counts``.
+    counts : np.ndarray
+        int32 array (n_blocks, n_pairs) — frames in each block where the
+        pair is present.
+    block_frames : np.ndarray
+        int64 array (n_blocks,) — number of frames in each block.
+    """
+    state_idx: int
+    pairs: list[str]
+    counts: np.ndarray
+    block_frames: np.ndarray
+
+
+def _state_block_counts(sc: _StateContacts, n_blocks: int) -> _StateBlockCounts:
+    """
+    Bin the per-pair frame arrays of *sc* into *n_blocks* chronological
+    blocks.  One bincount over all (pair, frame) entries — no per-pair loop.
+    """
+    n_frames = len(sc.frames)
+    if n_frames < n_blocks:
+        raise ValueError(
+            f"State {sc.state_idx} has {n_frames} frames; need at least "
+            f"{n_blocks} to form {n_blocks} blocks."
+        )
+    bounds = np.linspace(0, n_frames, n_blocks + 1).astype(np.int64)
+    # First frame value of blocks 1..n-1; searchsorted(right) → block id
+    edges = sc.frames[bounds[1:-1]]
+
+    pairs = list(sc.pair_frames)
+    n_pairs = len(pairs)
+    lengths = np.fromiter(
+        (len(a) for a in sc.pair_frames.values()), dtype=np.int64, count=n_pairs,
+    )
+    if n_pairs == 0:
+        counts = np.zeros((n_blocks, 0), dtype=np.int32)
+    else:
+        entries = np.concatenate(list(sc.pair_frames.values()))
+        pair_ids = np.repeat(np.arange(n_pairs, dtype=np.int64), lengths)
+        block_ids = np.searchsorted(edges, entries, side="right")
+        counts = np.bincount(
+            block_ids * n_pairs + pair_ids, minlength=n_blocks * n_pairs,
+        ).reshape(n_blocks, n_pairs).astype(np.int32)
+
+    return _StateBlockCounts(
+        state_idx=sc.state_idx,
+        pairs=pairs,
+        counts=counts,
+        block_frames=np.diff(bounds),
+    )
+
+
+def _block_count_worker(args: tuple) -> _StateBlockCounts:
+    """Load one state and reduce it to block counts (small to pickle)."""
+    state_idx, contact_base, file_pattern, use_cache, n_blocks = args
+    sc = _load_state_contacts(state_idx, contact_base, file_pattern, use_cache)
+    return _state_block_counts(sc, n_blocks)
+
+
+def _recorded_n_frames(path: str, fmt: str) -> int | None:
+    """
+    Frame count recorded in a per-frame contact file (the chacra engine's
+    parquet metadata, getcontacts' ``total_frames:`` header), or None.
+    Unlike the frame indices it counts frames without any contact.
+    """
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        metadata = pq.read_schema(path).metadata or {}
+        if b"n_frames" in metadata:
+            return int(metadata[b"n_frames"])
+        return None
+    with open(path) as f:
+        match = re.search(r"total_frames:(\d+)", f.readline())
+    return int(match.group(1)) if match else None
+
+
+def _n_frames_in_file(path: str, fmt: str) -> int:
+    """
+    Frame count of a per-frame contact file: the recorded count, or
+    max frame + 1 when none is recorded (or the indices run past it).
+    """
+    recorded = _recorded_n_frames(path, fmt) or 0
+    if fmt == "tsv":
+        return max(recorded, _max_frame_tsv(path) + 1)
+
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    pf = pq.ParquetFile(path)
+    col = pf.schema_arrow.get_field_index("frame")
+    maxes = []
+    for rg in range(pf.metadata.num_row_groups):
+        stats = pf.metadata.row_group(rg).column(col).statistics
+        if stats is None or not stats.has_min_max:
+            # No row-group statistics — fall back to reading the column
+            frame_max = pc.max(pq.read_table(path, columns=["frame"])["frame"]).as_py()
+            return max(recorded, 0 if frame_max is None else int(frame_max) + 1)
+        maxes.append(int(stats.max))
+    return max(recorded, max(maxes) + 1 if maxes else 0)
+
+
+def _cached_contact_chunks(path: str, pair_index: dict[str, int]):
+    """
+    The valid ``.cache/`` parse of *path* as ``(pair_ids, frames)`` chunks
+    in the layout of :func:`_iter_contact_chunks`, or None when there is
+    no valid cache.
+
+    Only the pair names and offsets are loaded up front; the per-pair
+    frame data is read from the npz member ``_TSV_BLOCK_SIZE`` bytes at a
+    time, so memory stays bounded by the pairs plus one chunk.
+    """
+    cache = _cache_path(path)
+    if not cache.exists():
+        return None
+    try:
+        with np.load(cache, allow_pickle=False) as npz:
+            if str(npz["fingerprint"]) != _file_fingerprint(path):
+                return None
+            pair_names = npz["pair_names"].tolist()
+            pair_offsets = npz["pair_offsets"]
+    except (OSError, ValueError, KeyError):
+        return None
+    return _iter_cached_chunks(cache, pair_names, pair_offsets, pair_index)
+
+
+def _iter_cached_chunks(
+    cache: Path,
+    pair_names: list[str],
+    pair_offsets: np.ndarray,
+    pair_index: dict[str, int],
+):
+    lut = np.array(
+        [pair_index.setdefault(p, len(pair_index)) for p in pair_names],
+        dtype=np.int64,
+    )
+    with zipfile.ZipFile(cache) as zf, zf.open("pair_data.npy") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        n_entries = shape[0]
+        step = max(1, _TSV_BLOCK_SIZE // dtype.itemsize)
+        for start in range(0, n_entries, step):
+            n = min(step, n_entries - start)
+            frames = np.frombuffer(f.read(n * dtype.itemsize), dtype=dtype)
+            # entry i belongs to the pair whose offset range holds it
+            owner = np.searchsorted(
+                pair_offsets, np.arange(start, start + n), side="right",
+            ) - 1
+            yield lut[owner], frames.astype(np.int64)
+
+
+def _stream_state_block_counts(
+    state_idx: int,
+    n_blocks: int,
+    contact_base: str = "./contact_output",
+    file_pattern: str | None = None,
+    use_cache: bool = True,
+) -> _StateBlockCounts:
+    """
+    Block counts for one state computed while streaming its contact files.
+
+    Unlike :func:`_state_block_counts` the per-frame data is never held in
+    memory: each chunk is reduced to per-block, per-pair counts and
+    discarded, so peak memory is O(n_blocks × n_pairs) plus one chunk.
+    With ``use_cache`` a file whose ``.cache/`` parse is valid is read
+    from it, chunk by chunk, instead of being re-parsed (no cache is
+    written).
+    Blocks are cut on frame indices, using each file's recorded frame
+    count (see :func:`_n_frames_in_file`) so that frames without contacts
+    still count towards their block.
+
+    Contact files are assumed frame-sorted, as getcontacts and
+    ultracontacts write them: a (pair, frame) row repeated across a chunk
+    boundary is dropped by remembering each pair's last counted frame.
+    """
+    files = _find_contact_files(state_idx, contact_base, file_pattern)
+    if not files:
+        raise FileNotFoundError(
+            f"No per-frame contact files found for state {state_idx} "
+            f"under {contact_base}/"
+        )
+    sizes = [_n_frames_in_file(path, fmt) for path, fmt in files]
+    total = int(sum(sizes))
+    if total < n_blocks:
+        raise ValueError(
+            f"State {state_idx} has {total} frames; need at least "
+            f"{n_blocks} to form {n_blocks} blocks."
+        )
+    bounds = np.linspace(0, total, n_blocks + 1).astype(np.int64)
+    edges = bounds[1:-1]
+
+    pair_index: dict[str, int] = {}
+    counts = np.zeros((n_blocks, 1024), dtype=np.int64)
+    last_frame = np.full(1024, -1, dtype=np.int64)
+
+    offset = 0
+    for (path, fmt), size in zip(files, sizes):
+        chunks = _cached_contact_chunks(path, pair_index) if use_cache else None
+        if chunks is None:
+            chunks = _iter_contact_chunks(path, fmt, pair_index)
+        for pair_ids, frames in chunks:
+            n_pairs = len(pair_index)
+            if n_pairs > counts.shape[1]:
+                cap = max(2 * counts.shape[1], n_pairs)
+                counts = np.pad(counts, ((0, 0), (0, cap - counts.shape[1])))
+                last_frame = np.pad(
+                    last_frame, (0, cap - len(last_frame)), constant_values=-1,
+                )
+
+            keys = np.unique((pair_ids << _FRAME_BITS) | (frames + offset))
+            pid, fr = keys >> _FRAME_BITS, keys & _FRAME_MASK
+            fresh = fr != last_frame[pid]
+            pid, fr = pid[fresh], fr[fresh]
+            if len(pid) == 0:
+                continue
+            # Keys are sorted by (pair, frame): each group's last entry is its max
+            ends = np.flatnonzero(np.r_[pid[1:] != pid[:-1], True])
+            last_frame[pid[ends]] = np.maximum(last_frame[pid[ends]], fr[ends])
+
+            block = np.searchsorted(edges, fr, side="right")
+            counts[:, :n_pairs] += np.bincount(
+                block * n_pairs + pid, minlength=n_blocks * n_pairs,
+            ).reshape(n_blocks, n_pairs)
+        offset += size
+
+    return _StateBlockCounts(
+        state_idx=state_idx,
+        pairs=list(pair_index),
+        counts=counts[:, :len(pair_index)].astype(np.int32),
+        block_frames=np.diff(bounds),
+    )
+
+
+def _stream_block_count_worker(args: tuple) -> _StateBlockCounts:
+    """Multiprocessing wrapper for _stream_state_block_counts."""
+    state_idx, contact_base, file_pattern, use_cache, n_blocks = args
+    return _stream_state_block_counts(
+        state_idx, n_blocks, contact_base, file_pattern, use_cache,
+    )
+
+
+def _load_block_counts(
+    n_states: int,
+    n_blocks: int,
+    contact_base: str,
+    file_pattern: str | None,
+    n_jobs: int,
+    use_cache: bool = True,
+    streaming: bool = False,
+) -> tuple[list[str], np.ndarray, np.ndarray]:
+    """
+    Stream every state through :func:`_state_block_counts` and stack the
+    results on a shared contact vocabulary.
+
+    Only one state's per-frame data is alive per worker, and only the
+    (n_blocks × n_pairs) counts are returned, so this parallelises
+    without the pickling limits of :func:`_load_all_states`.  With
+    ``streaming`` each state's files are reduced chunk by chunk through
+    :func:`_stream_state_block_counts` and never loaded in full.
+
+    Returns
+    -------
+    pairs : list[str]
+        Sorted contact names.
+    counts : np.ndarray
+        int32 array (n_states, n_blocks, n_pairs).
+    block_frames : np.ndarray
+        int64 array (n_states, n_blocks).
+    """
+    args = [
+        (i, contact_base, file_pattern, use_cache, n_blocks)
+        for i in range(n_states)
+    ]
+    worker = _stream_block_count_worker if streaming else _block_count_worker
+    if n_jobs == 1:
+        results = [worker(a) for a in args]
+    else:
+        with Pool(min(n_jobs, n_states)) as pool:
+            results = pool.map(worker, args)
+    results.sort(key=lambda bc: bc.state_idx)
+
+    pairs = sorted(set().union(*(bc.pairs for bc in results)))
+    pair_index = {p: j for j, p in enumerate(pairs)}
+    counts = np.zeros((n_states, n_blocks, len(pairs)), dtype=np.int32)
+    for i, bc in enumerate(results):
+        cols = np.fromiter((pair_index[p] for p in bc.pairs), dtype=np.int64,
+                           count=len(bc.pairs))
+        counts[i][:, cols] = bc.counts
+    block_frames = np.vstack([bc.block_frames for bc in results])
+    return pairs, counts, block_frames
+
+
 # ───────────────────────────────────────────────────────────────────────────── #
 # RMSIP                                                                        #
 # ───────────────────────────────────────────────────────────────────────────── #
@@ -421,6 +945,8 @@ def split_half_rmsip(
     file_pattern: str | None = None,
     max_frames_per_state: int | None = None,
     n_jobs: int = 1,
+    use_cache: bool = True,
+    streaming: bool = False,
 ) -> float:
     """
     Split-half RMSIP computed from per-frame contact records.
@@ -444,6 +970,13 @@ def split_half_rmsip(
         Root path to contact output (contains ``run_*/contacts/``).
     n_jobs : int
         Number of parallel workers for loading contact data.
+    use_cache : bool
+        Reuse parsed ``.npz`` caches of unchanged contact files.
+    streaming : bool
+        Count contacts per half while streaming each state's files once,
+        so peak memory scales with the number of contact pairs rather
+        than frames.  Halves are cut on frame indices;
+        ``max_frames_per_state`` and ``use_cache`` are ignored.
 
     Returns
     -------
@@ -453,8 +986,21 @@ def split_half_rmsip(
     if n_jobs is None or n_jobs <= 0:
         n_jobs = cpu_count()
 
+    if streaming:
+        pairs, counts, half_frames = _load_block_counts(
+            n_states, 2, contact_base, file_pattern, n_jobs, streaming=True,
+        )
+        if half_frames.sum(axis=1).min() < 4:
+            return float("nan")
+        freqs = counts / half_frames[:, :, None]
+        df_a = pd.DataFrame(freqs[:, 0], columns=pairs)
+        df_b = pd.DataFrame(freqs[:, 1], columns=pairs)
+        return _split_half_from_matrices(df_a, df_b, k)
+
     # Phase 1: Load per-frame data for all states.
-    state_data = _load_all_states(n_states, contact_base, file_pattern, n_jobs)
+    state_data = _load_all_states(
+        n_states, contact_base, file_pattern, n_jobs, use_cache,
+    )
 
     # Phase 2: Split frames and build frequency matrices.
     # Use searchsorted on sorted int32 arrays — no set copies needed.
@@ -494,7 +1040,12 @@ def split_half_rmsip(
     df_a = df_a.reindex(columns=all_cols, fill_value=0.0)
     df_b = df_b.reindex(columns=all_cols, fill_value=0.0)
 
-    # Phase 3: PCA + RMSIP
+    return _split_half_from_matrices(df_a, df_b, k)
+
+
+def _split_half_from_matrices(df_a: pd.DataFrame, df_b: pd.DataFrame, k: int) -> float:
+    """PCA on each half's (aligned) frequency matrix and return their RMSIP."""
+    all_cols = df_a.columns
     loadings_a = _fit_pca_loadings(df_a)
     loadings_b = _fit_pca_loadings(df_b)
 
@@ -508,6 +1059,109 @@ def split_half_rmsip(
     return rmsip(loadings_a, loadings_b, k_eff)
 
 
+# Per-run PCA artefacts: the leading components, explained variance, column
+# means and column vocabulary of each run's cumulative matrix, written by
+# stage 5 so cross-run metrics never refit PCA or reread total_contacts.
+PCA_ARTEFACT_FILE = "pca_model.npz"
+_PCA_ARTEFACT_COMPONENTS = 10
+
+
+def save_pca_artefacts(
+    pca: PCA,
+    columns,
+    output_dir: str | os.PathLike,
+    n_components: int = _PCA_ARTEFACT_COMPONENTS,
+) -> str:
+    """
+    Persist a fitted PCA of a run's cumulative contact matrix.
+
+    Parameters
+    ----------
+    pca : sklearn.decomposition.PCA
+        PCA fitted on the (states × contacts) frequency matrix, e.g.
+        ``ContactFrequencies.cpca.pca``.
+    columns : sequence of str
+        Contact names, in the column order the PCA was fitted on.
+    output_dir : str or os.PathLike
+        Run analysis directory (``analysis_output/run_N``).
+    n_components : int
+        Number of leading components to keep.
+
+    Returns
+    -------
+    str
+        Path of the written ``pca_model.npz``.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, PCA_ARTEFACT_FILE)
+    n = min(n_components, pca.components_.shape[0])
+    np.savez(
+        path,
+        columns=np.asarray(columns, dtype=str),
+        components=pca.components_[:n].astype(np.float32),
+        explained_variance=pca.explained_variance_,
+        explained_variance_ratio=pca.explained_variance_ratio_,
+        mean=pca.mean_,
+        n_states=np.int64(pca.n_samples_),
+    )
+    return path
+
+
+def load_pca_artefacts(
+    run: int,
+    analysis_dir: str = "./analysis_output",
+    k: int = 0,
+) -> dict | None:
+    """
+    Load the PCA artefacts for *run*.
+
+    Runs processed before artefacts existed (or whose artefact holds fewer
+    than *k* components) are fitted once from ``total_contacts.parquet``
+    and the artefact is written for subsequent calls.
+
+    Returns
+    -------
+    dict or None
+        Keys ``columns``, ``components`` (n_components × n_contacts),
+        ``explained_variance``, ``explained_variance_ratio``, ``mean`` and
+        ``n_states``; None when the run has no analysis output.
+    """
+    run_dir = Path(analysis_dir) / f"run_{run}"
+    path = run_dir / PCA_ARTEFACT_FILE
+    if path.exists():
+        artefacts = _read_pca_artefacts(path)
+        # A fit has at most min(n_states, n_contacts) components
+        n_max = min(int(artefacts["n_states"]), len(artefacts["columns"]))
+        if artefacts["components"].shape[0] >= min(k, n_max):
+            return artefacts
+
+    parquet = run_dir / "total_contacts.parquet"
+    if not parquet.exists():
+        return None
+    df = pd.read_parquet(parquet)
+    pca = PCA().fit(df)
+    path = save_pca_artefacts(
+        pca, df.columns, run_dir, n_components=max(k, _PCA_ARTEFACT_COMPONENTS),
+    )
+    return _read_pca_artefacts(path)
+
+
+def _read_pca_artefacts(path: str | os.PathLike) -> dict:
+    with np.load(path, allow_pickle=False) as npz:
+        return {key: npz[key] for key in npz.files}
+
+
+def _align_to_columns(
+    values: np.ndarray,
+    columns: np.ndarray,
+    all_cols: pd.Index,
+) -> np.ndarray:
+    """Scatter the trailing contact axis of *values* onto *all_cols* (zero-fill)."""
+    out = np.zeros(values.shape[:-1] + (len(all_cols),), dtype=np.float64)
+    out[..., all_cols.get_indexer(columns)] = values
+    return out
+
+
 def cross_run_rmsip(
     run: int,
     k: int = 3,
@@ -516,8 +1170,10 @@ def cross_run_rmsip(
     """
     Compare PCA subspaces between cumulative data at run N-1 and run N.
 
-    Uses the pre-computed ``total_contacts.parquet`` from each run's
-    analysis output (these are the weighted cumulative frequency matrices).
+    Uses the persisted PCA artefacts of each run (see
+    :func:`save_pca_artefacts`), so only the top-*k* loadings are read.
+    Contacts missing from one run get zero loadings, which is what a fit
+    on the zero-filled column union produces.
 
     Parameters
     ----------
@@ -536,23 +1192,20 @@ def cross_run_rmsip(
     if run < 2:
         return None
 
-    prior = Path(analysis_dir) / f"run_{run - 1}" / "total_contacts.parquet"
-    current = Path(analysis_dir) / f"run_{run}" / "total_contacts.parquet"
-
-    if not prior.exists() or not current.exists():
+    prior = load_pca_artefacts(run - 1, analysis_dir, k)
+    current = load_pca_artefacts(run, analysis_dir, k)
+    if prior is None or current is None:
         return None
 
-    df_prior = pd.read_parquet(prior)
-    df_current = pd.read_parquet(current)
-
-    all_cols = df_prior.columns.union(df_current.columns)
-    df_prior = df_prior.reindex(columns=all_cols, fill_value=0.0)
-    df_current = df_current.reindex(columns=all_cols, fill_value=0.0)
-
-    loadings_a = _fit_pca_loadings(df_prior)
-    loadings_b = _fit_pca_loadings(df_current)
-
-    k = min(k, df_prior.shape[0], df_current.shape[0], len(all_cols))
+    all_cols = pd.Index(prior["columns"]).union(pd.Index(current["columns"]))
+    k = min(
+        k,
+        prior["components"].shape[0],
+        current["components"].shape[0],
+        len(all_cols),
+    )
+    loadings_a = _align_to_columns(prior["components"][:k], prior["columns"], all_cols).T
+    loadings_b = _align_to_columns(current["components"][:k], current["columns"], all_cols).T
     return rmsip(loadings_a, loadings_b, k)
 
 
@@ -594,21 +1247,24 @@ def cross_run_contact_correlation(
 ) -> float | None:
     """
     Pearson correlation of mean contact vectors between run N-1 and run N.
-    Uses pre-computed total_contacts.parquet from each run.
+    Uses the column means stored in each run's PCA artefacts.
     """
     if run < 2:
         return None
 
-    prior = Path(analysis_dir) / f"run_{run - 1}" / "total_contacts.parquet"
-    current = Path(analysis_dir) / f"run_{run}" / "total_contacts.parquet"
-
-    if not prior.exists() or not current.exists():
+    prior = load_pca_artefacts(run - 1, analysis_dir)
+    current = load_pca_artefacts(run, analysis_dir)
+    if prior is None or current is None:
         return None
 
-    return contact_matrix_correlation(
-        pd.read_parquet(prior),
-        pd.read_parquet(current),
-    )
+    all_cols = pd.Index(prior["columns"]).union(pd.Index(current["columns"]))
+    mean_a = _align_to_columns(prior["mean"], prior["columns"], all_cols)
+    mean_b = _align_to_columns(current["mean"], current["columns"], all_cols)
+
+    if mean_a.std() == 0 or mean_b.std() == 0:
+        return float("nan")
+
+    return float(np.corrcoef(mean_a, mean_b)[0, 1])
 
 
 # ───────────────────────────────────────────────────────────────────────────── #
@@ -658,6 +1314,142 @@ def _bootstrap_iteration(args: tuple) -> dict[str, list[str]]:
     return result
 
 
+# Moving-block bootstrap: default block length ~ N^(1/3) frames (the usual
+# moving-block rate), but never fewer frames than needed for at most this
+# many blocks per resample.
+_MAX_BOOTSTRAP_BLOCKS = 500
+# Block start positions are resolved on this many equal frame units at most,
+# which bounds the (starts × pairs) count matrix of each state.
+_MAX_BOOTSTRAP_UNITS = 2000
+
+
+@dataclass
+class _MovingBlockCounts:
+    """
+    Per-pair contact counts of every overlapping block of one state.
+
+    Attributes
+    ----------
+    state_idx : int
+        The thermodynamic state index.
+    pairs : list[str]
+        Contact names, one per column of ``counts``.
+    counts : np.ndarray
+        (n_starts, n_pairs) — frames in contact within the block starting
+        at each unit.
+    block_frames : np.ndarray
+        int64 (n_starts,) — frames in each block.
+    n_draws : int
+        Blocks drawn per resample, so that a resample spans the state.
+    """
+    state_idx: int
+    pairs: list[str]
+    counts: np.ndarray
+    block_frames: np.ndarray
+    n_draws: int
+
+
+def _bootstrap_block_length(n_frames: int, block_length: int | None) -> int:
+    if block_length is not None:
+        return max(1, min(int(block_length), n_frames))
+    return max(
+        int(np.ceil(n_frames ** (1 / 3))),
+        int(np.ceil(n_frames / _MAX_BOOTSTRAP_BLOCKS)),
+        1,
+    )
+
+
+def _bootstrap_block_worker(args: tuple) -> _MovingBlockCounts:
+    """
+    Load one state and reduce it to the counts of every moving block.
+
+    Frames are binned into at most ``_MAX_BOOTSTRAP_UNITS`` contiguous
+    units; the count of the block spanning units ``[i, i + L)`` is the
+    difference of the per-pair cumulative unit counts, ``P[i + L] - P[i]``.
+    With one frame per unit (up to ``_MAX_BOOTSTRAP_UNITS`` frames) the
+    blocks start at every frame.
+    """
+    state_idx, contact_base, file_pattern, use_cache, block_length = args
+    sc = _load_state_contacts(state_idx, contact_base, file_pattern, use_cache)
+    n_frames = len(sc.frames)
+    length = _bootstrap_block_length(n_frames, block_length)
+    units = _state_block_counts(sc, max(1, min(n_frames, _MAX_BOOTSTRAP_UNITS)))
+    n_units = len(units.block_frames)
+    span = min(n_units, max(1, int(round(length * n_units / n_frames))))
+
+    prefix = np.zeros((n_units + 1, len(units.pairs)), dtype=np.int64)
+    np.cumsum(units.counts, axis=0, out=prefix[1:])
+    frame_prefix = np.zeros(n_units + 1, dtype=np.int64)
+    np.cumsum(units.block_frames, out=frame_prefix[1:])
+
+    block_frames = frame_prefix[span:] - frame_prefix[:-span]
+    counts = prefix[span:] - prefix[:-span]
+    del prefix
+    # Per-block counts never exceed the block length
+    dtype = np.uint16 if block_frames.max() <= np.iinfo(np.uint16).max else np.int32
+    return _MovingBlockCounts(
+        state_idx=state_idx,
+        pairs=units.pairs,
+        counts=counts.astype(dtype),
+        block_frames=block_frames,
+        n_draws=int(np.ceil(n_units / span)),
+    )
+
+
+def _block_bootstrap_samples(
+    n_states: int,
+    n_bootstrap: int,
+    block_length: int | None,
+    contact_base: str,
+    file_pattern: str | None,
+    n_jobs: int,
+    use_cache: bool,
+    rng: np.random.Generator,
+):
+    """
+    Contact names plus a generator of moving-block bootstrap frequency
+    matrices.
+
+    Per-pair counts of every overlapping block are computed once per state
+    from cumulative sums.  A resample draws ``n_draws`` block starts with
+    replacement and sums their count rows: O(draws × pairs) per state
+    instead of O(frames × pairs).
+    """
+    args = [
+        (i, contact_base, file_pattern, use_cache, block_length)
+        for i in range(n_states)
+    ]
+    if n_jobs == 1:
+        blocks = [_bootstrap_block_worker(a) for a in args]
+    else:
+        with Pool(min(n_jobs, n_states)) as pool:
+            blocks = pool.map(_bootstrap_block_worker, args)
+    blocks.sort(key=lambda bc: bc.state_idx)
+
+    contacts = sorted(set().union(*(bc.pairs for bc in blocks)))
+    pair_index = {p: j for j, p in enumerate(contacts)}
+    cols = [
+        np.fromiter((pair_index[p] for p in bc.pairs), dtype=np.int64,
+                    count=len(bc.pairs))
+        for bc in blocks
+    ]
+    lengths = ", ".join(
+        sorted({str(int(np.median(bc.block_frames))) for bc in blocks})
+    )
+    print(f"  [bootstrap] Moving-block bootstrap with ~{lengths}-frame blocks.")
+
+    def samples():
+        for _ in range(n_bootstrap):
+            freqs = np.zeros((n_states, len(contacts)))
+            for i, bc in enumerate(blocks):
+                starts = rng.integers(0, len(bc.block_frames), size=bc.n_draws)
+                frames = bc.block_frames[starts].sum()
+                freqs[i, cols[i]] = bc.counts[starts].sum(axis=0, dtype=np.int64) / frames
+            yield freqs
+
+    return contacts, samples()
+
+
 def bootstrap_loadings(
     n_states: int,
     k: int = 3,
@@ -667,6 +1459,9 @@ def bootstrap_loadings(
     file_pattern: str | None = None,
     max_frames_per_state: int | None = None,
     n_jobs: int = 1,
+    use_cache: bool = True,
+    method: str = "frame",
+    block_length: int | None = None,
 ) -> pd.DataFrame:
     """
     Assess loading stability by bootstrap resampling of per-frame contacts.
@@ -677,6 +1472,12 @@ def bootstrap_loadings(
     how frequently each contact appears in the top-*n_top* loadings for
     each PC across bootstrap samples.
 
+    With ``method="block"`` a moving-block bootstrap is used: overlapping
+    blocks of contiguous frames are resampled instead of single frames.
+    This keeps the time correlation of the contact series inside each
+    block, and each iteration only sums precomputed per-block counts, so
+    large ``n_bootstrap`` is cheap.
+
     Parameters
     ----------
     n_states : int
@@ -691,6 +1492,16 @@ def bootstrap_loadings(
         Root path to contact output.
     n_jobs : int
         Number of parallel workers.
+    use_cache : bool
+        Reuse parsed ``.npz`` caches of unchanged contact files.
+    method : str
+        ``'frame'`` (i.i.d. frame resampling) or ``'block'`` (moving-block
+        bootstrap).  ``max_frames_per_state`` applies to ``'frame'`` only.
+    block_length : int or None
+        Frames per block for ``method="block"``.  Defaults to
+        ``ceil(n_frames ** (1/3))``, raised if needed to keep at most
+        500 blocks per state.  A decorrelation stride from
+        :func:`effective_sample_size` is a good explicit choice.
 
     Returns
     -------
@@ -702,45 +1513,42 @@ def bootstrap_loadings(
     """
     if n_jobs is None or n_jobs <= 0:
         n_jobs = cpu_count()
+    if method not in ("frame", "block"):
+        raise ValueError(f"method must be 'frame' or 'block', got {method!r}")
+
+    rng = np.random.default_rng(42)
 
     # Phase 1: Load all contact data
     print("  [bootstrap] Loading per-frame contact data...")
-    state_data = _load_all_states(n_states, contact_base, file_pattern, n_jobs)
-
-    # Collect all contact names
-    all_contacts = set()
-    for sc in state_data:
-        all_contacts.update(sc.pair_frames.keys())
-    contacts = sorted(all_contacts)
+    if method == "block":
+        contacts, samples = _block_bootstrap_samples(
+            n_states, n_bootstrap, block_length, contact_base, file_pattern,
+            n_jobs, use_cache, rng,
+        )
+    else:
+        state_data = _load_all_states(
+            n_states, contact_base, file_pattern, n_jobs, use_cache,
+        )
+        # Collect all contact names
+        all_contacts = set()
+        for sc in state_data:
+            all_contacts.update(sc.pair_frames.keys())
+        contacts = sorted(all_contacts)
+        samples = _frame_bootstrap_samples(
+            state_data, n_bootstrap, max_frames_per_state, rng,
+        )
 
     print(f"  [bootstrap] Loaded {len(contacts)} contact pairs across {n_states} states.")
     print(f"  [bootstrap] Running {n_bootstrap} bootstrap iterations...")
 
     # Phase 2: Bootstrap iterations
-    # NOTE: We can't easily pickle _StateContacts for multiprocessing
-    # because the pair_frames dicts are large.  Run iterations sequentially
-    # but each iteration is fast since data is in memory.
     counts = {
         f"PC{pc}_rank_freq": pd.Series(0.0, index=contacts)
         for pc in range(1, k + 1)
     }
 
-    rng = np.random.default_rng(42)
-    for b in range(n_bootstrap):
-        # Resample frame indices WITH replacement and preserve duplicates.
-        # np.isin in freq_for_frames counts them correctly, giving proper
-        # bootstrap frequency estimates (a frame appearing twice in the
-        # resample contributes twice to the contact count).
-        frame_arrays = []
-        for sc in state_data:
-            frames = sc.frames
-            if max_frames_per_state and len(frames) > max_frames_per_state:
-                idx = np.linspace(0, len(frames) - 1, max_frames_per_state, dtype=int)
-                frames = frames[idx]
-            resampled = rng.choice(frames, size=len(frames), replace=True)
-            frame_arrays.append(resampled)
-
-        df = _build_freq_matrix(state_data, frame_arrays)
+    for sample in samples:
+        df = pd.DataFrame(sample, columns=contacts) if method == "block" else sample
         if df.shape[1] < k:
             continue
 
@@ -765,6 +1573,340 @@ def bootstrap_loadings(
     return result
 
 
+def _frame_bootstrap_samples(
+    state_data: list[_StateContacts],
+    n_bootstrap: int,
+    max_frames_per_state: int | None,
+    rng: np.random.Generator,
+):
+    """Generator of i.i.d. frame-bootstrap frequency matrices."""
+    # NOTE: We can't easily pickle _StateContacts for multiprocessing
+    # because the pair_frames dicts are large.  Run iterations sequentially
+    # but each iteration is fast since data is in memory.
+    for _ in range(n_bootstrap):
+        # Resample frame indices WITH replacement and preserve duplicates.
+        # np.isin in freq_for_frames counts them correctly, giving proper
+        # bootstrap frequency estimates (a frame appearing twice in the
+        # resample contributes twice to the contact count).
+        frame_arrays = []
+        for sc in state_data:
+            frames = sc.frames
+            if max_frames_per_state and len(frames) > max_frames_per_state:
+                idx = np.linspace(0, len(frames) - 1, max_frames_per_state, dtype=int)
+                frames = frames[idx]
+            resampled = rng.choice(frames, size=len(frames), replace=True)
+            frame_arrays.append(resampled)
+
+        yield _build_freq_matrix(state_data, frame_arrays)
+
+
+# ───────────────────────────────────────────────────────────────────────────── #
+# Convergence curve                                                            #
+# ───────────────────────────────────────────────────────────────────────────── #
+
+def _compare_freq_matrices(
+    freqs_a: np.ndarray,
+    freqs_b: np.ndarray,
+    k: int,
+) -> tuple[float, float]:
+    """RMSIP and mean-contact Pearson *r* between two (states × contacts) arrays."""
+    k_eff = min(k, freqs_a.shape[0], freqs_a.shape[1])
+    if k_eff < 1:
+        return float("nan"), float("nan")
+    r = rmsip(_fit_pca_loadings(freqs_a), _fit_pca_loadings(freqs_b), k_eff)
+
+    mean_a, mean_b = freqs_a.mean(axis=0), freqs_b.mean(axis=0)
+    if mean_a.std() == 0 or mean_b.std() == 0:
+        return r, float("nan")
+    return r, float(np.corrcoef(mean_a, mean_b)[0, 1])
+
+
+def convergence_curve(
+    n_states: int,
+    k: int = 3,
+    n_checkpoints: int = 10,
+    n_folds: int = 5,
+    contact_base: str = "./contact_output",
+    file_pattern: str | None = None,
+    n_jobs: int = 1,
+    use_cache: bool = True,
+) -> pd.DataFrame:
+    """
+    RMSIP and contact correlation as a function of accumulated frames.
+
+    Each state's frames are binned once into chronological blocks of
+    per-pair contact counts.  Every comparison below is then a difference
+    of block prefix sums, so all checkpoints come from a single load of
+    the per-frame data instead of repeated split-half runs.
+
+    Three comparison modes are reported:
+
+    - ``split_half``: at checkpoint *j* the first ``j / n_checkpoints`` of
+      each state's frames are split into two chronological halves.
+    - ``vs_final``: the accumulated frames at checkpoint *j* against all
+      frames.
+    - ``kfold``: each of ``n_folds`` contiguous blocks against the
+      remaining frames.
+
+    Parameters
+    ----------
+    n_states : int
+        Number of thermodynamic states.
+    k : int
+        Number of leading PCs to compare in RMSIP.
+    n_checkpoints : int
+        Number of evenly spaced accumulation checkpoints.
+    n_folds : int
+        Number of contiguous blocks for the k-fold comparison.
+    contact_base : str
+        Root path to contact output.
+    file_pattern : str or None
+        See :func:`_find_contact_files`.
+    n_jobs : int
+        Number of parallel workers for loading contact data.
+    use_cache : bool
+        Reuse parsed ``.npz`` caches of unchanged contact files.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per comparison with columns ``mode``, ``checkpoint``,
+        ``fraction`` (fraction of frames covered; fold midpoint for
+        ``kfold``), ``frames_per_state`` (mean frames per state in the
+        compared data), ``rmsip`` and ``correlation``.
+    """
+    if n_jobs is None or n_jobs <= 0:
+        n_jobs = cpu_count()
+
+    # Finest block resolution that both checkpoint halves and folds align to
+    n_blocks = math.lcm(2 * n_checkpoints, n_folds)
+    _, counts, block_frames = _load_block_counts(
+        n_states, n_blocks, contact_base, file_pattern, n_jobs, use_cache,
+    )
+
+    # Prefix sums with a leading zero block: window [a, b) = P[b] - P[a]
+    P = np.zeros((n_states, n_blocks + 1, counts.shape[2]), dtype=np.int64)
+    np.cumsum(counts, axis=1, out=P[:, 1:])
+    F = np.zeros((n_states, n_blocks + 1), dtype=np.int64)
+    np.cumsum(block_frames, axis=1, out=F[:, 1:])
+    del counts
+
+    def window(a: int, b: int) -> tuple[np.ndarray, np.ndarray]:
+        frames = F[:, b] - F[:, a]
+        return (P[:, b] - P[:, a]) / frames[:, None], frames
+
+    full, full_frames = window(0, n_blocks)
+    rows = []
+
+    step = n_blocks // n_checkpoints
+    for j in range(1, n_checkpoints + 1):
+        end = j * step  # step is even, so the halves align to blocks
+        acc, acc_frames = window(0, end)
+        first, _ = window(0, end // 2)
+        second, _ = window(end // 2, end)
+        r, c = _compare_freq_matrices(first, second, k)
+        rows.append(("split_half", j, end / n_blocks, acc_frames.mean(), r, c))
+
+        r, c = _compare_freq_matrices(acc, full, k)
+        rows.append(("vs_final", j, end / n_blocks, acc_frames.mean(), r, c))
+
+    fold = n_blocks // n_folds
+    for f in range(n_folds):
+        a, b = f * fold, (f + 1) * fold
+        block, block_n = window(a, b)
+        rest_frames = full_frames - block_n
+        rest = (P[:, n_blocks] - P[:, b] + P[:, a]) / rest_frames[:, None]
+        r, c = _compare_freq_matrices(block, rest, k)
+        rows.append(("kfold", f + 1, (a + b) / 2 / n_blocks, block_n.mean(), r, c))
+
+    return pd.DataFrame(
+        rows,
+        columns=["mode", "checkpoint", "fraction", "frames_per_state",
+                 "rmsip", "correlation"],
+    )
+
+
+# ───────────────────────────────────────────────────────────────────────────── #
+# Autocorrelation and effective sample size                                    #
+# ───────────────────────────────────────────────────────────────────────────── #
+
+# Elements (frames × pairs) per FFT batch; bounds the float64 series
+# block plus its complex spectrum to a few hundred MB.
+_ACF_BATCH_ELEMENTS = 1 << 23
+
+
+def statistical_inefficiency(series: np.ndarray, mintime: int = 3) -> np.ndarray:
+    """
+    Statistical inefficiency *g* of each column of a (frames × series)
+    array, from an FFT autocorrelation.
+
+    ``g = 1 + 2 Σ_t (1 - t/N) C(t)`` over ``1 ≤ t < N - 1``, summed until
+    the normalised autocorrelation ``C(t)`` drops to zero or below at some
+    ``t > mintime``; the first *mintime* lags are always summed.  Computed
+    in float64, this is the estimator of pymbar's
+    ``timeseries.statisticalInefficiency`` (``fast=False``).  The number of
+    effectively independent samples is ``N / g``.
+
+    Parameters
+    ----------
+    series : np.ndarray
+        Array of shape (n_frames, n_series); each column is one time series.
+    mintime : int, optional
+        Lags always included before the sum may stop (pymbar's default 3).
+
+    Returns
+    -------
+    np.ndarray
+        float64 array (n_series,).  Constant columns carry no information
+        about correlation and get NaN.
+    """
+    from scipy.fft import irfft, next_fast_len, rfft
+
+    x = np.asarray(series, dtype=np.float64)
+    n = x.shape[0]
+    if n < 2:
+        return np.full(x.shape[1], np.nan)
+    x = x - x.mean(axis=0, keepdims=True)
+    var = (x * x).mean(axis=0)
+
+    # Zero-padded to ≥ 2N so the circular correlation equals the linear one
+    nfft = next_fast_len(2 * n)
+    spec = rfft(x, n=nfft, axis=0)
+    acov = irfft(spec.real ** 2 + spec.imag ** 2, n=nfft, axis=0)[:n]
+    del spec
+
+    lags = np.arange(n, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = acov / (n - lags) / var
+    lags, corr = lags[1:n - 1], corr[1:n - 1]
+
+    # Truncate each column at its first non-positive autocorrelation past
+    # mintime
+    stop = (corr <= 0) & (lags > mintime)
+    cutoff = np.where(stop.any(axis=0), stop.argmax(axis=0), n - 2)
+    keep = np.arange(n - 2)[:, None] < cutoff
+    g = 1.0 + 2.0 * ((1.0 - lags / n) * corr * keep).sum(axis=0)
+
+    g = np.maximum(g, 1.0)
+    g[var == 0] = np.nan
+    return g
+
+
+def _state_inefficiency(sc: _StateContacts) -> np.ndarray:
+    """
+    Statistical inefficiency of every contact's presence indicator in
+    *sc*, over the state's recorded frames, in ``sc.pair_frames`` order.
+    """
+    n = len(sc.frames)
+    pairs = list(sc.pair_frames.values())
+    g = np.full(len(pairs), np.nan)
+    batch = max(1, _ACF_BATCH_ELEMENTS // max(n, 1))
+    for start in range(0, len(pairs), batch):
+        chunk = pairs[start:start + batch]
+        indicator = np.zeros((n, len(chunk)), dtype=np.float32)
+        for j, arr in enumerate(chunk):
+            indicator[np.searchsorted(sc.frames, arr), j] = 1.0
+        g[start:start + len(chunk)] = statistical_inefficiency(indicator)
+    return g
+
+
+def _inefficiency_worker(args: tuple) -> tuple[int, list[str], np.ndarray, int]:
+    """Load one state and reduce it to per-contact statistical inefficiency."""
+    state_idx, contact_base, file_pattern, use_cache = args
+    sc = _load_state_contacts(state_idx, contact_base, file_pattern, use_cache)
+    return state_idx, list(sc.pair_frames), _state_inefficiency(sc), len(sc.frames)
+
+
+def effective_sample_size(
+    n_states: int,
+    contact_base: str = "./contact_output",
+    file_pattern: str | None = None,
+    n_jobs: int = 1,
+    use_cache: bool = True,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Effective sample size of every contact in every state.
+
+    Each contact's per-frame presence series is autocorrelated with a
+    batched FFT (see :func:`statistical_inefficiency`).  Frames from
+    consecutive runs are concatenated, as in the other per-frame metrics.
+
+    Parameters
+    ----------
+    n_states : int
+        Number of thermodynamic states.
+    contact_base : str
+        Root path to contact output.
+    file_pattern : str or None
+        See :func:`_find_contact_files`.
+    n_jobs : int
+        Number of parallel workers (one state per worker).
+    use_cache : bool
+        Reuse parsed ``.npz`` caches of unchanged contact files.
+
+    Returns
+    -------
+    per_state : pd.DataFrame
+        Index = state.  Columns ``n_frames``, ``g_median`` and ``g_p90``
+        (median / 90th percentile inefficiency over contacts that change
+        state), ``ess`` (``n_frames / g_median``) and ``stride``
+        (``ceil(g_median)``, frames between effectively independent samples).
+    per_contact : pd.DataFrame
+        Rows = states, columns = contacts, values = effective sample size
+        (NaN where the contact never changes within the state).
+    """
+    if n_jobs is None or n_jobs <= 0:
+        n_jobs = cpu_count()
+
+    args = [(i, contact_base, file_pattern, use_cache) for i in range(n_states)]
+    if n_jobs == 1:
+        results = [_inefficiency_worker(a) for a in args]
+    else:
+        with Pool(min(n_jobs, n_states)) as pool:
+            results = pool.map(_inefficiency_worker, args)
+    results.sort(key=lambda r: r[0])
+
+    rows, summary = [], []
+    for state_idx, pairs, g, n_frames in results:
+        rows.append(pd.Series(n_frames / g, index=pairs))
+        finite = g[np.isfinite(g)]
+        g_med = float(np.median(finite)) if len(finite) else float("nan")
+        g_p90 = float(np.percentile(finite, 90)) if len(finite) else float("nan")
+        summary.append({
+            "state": state_idx,
+            "n_frames": n_frames,
+            "g_median": g_med,
+            "g_p90": g_p90,
+            "ess": n_frames / g_med if np.isfinite(g_med) else float("nan"),
+            "stride": int(np.ceil(g_med)) if np.isfinite(g_med) else 1,
+        })
+
+    per_contact = pd.DataFrame(rows)
+    per_contact.index = [r[0] for r in results]
+    per_state = pd.DataFrame(summary).set_index("state")
+    return per_state, per_contact
+
+
+def recommended_stride(per_state: pd.DataFrame) -> int:
+    """
+    Frame stride that decorrelates contact sampling in every state: the
+    largest per-state ``stride`` from :func:`effective_sample_size`.
+    """
+    if len(per_state) == 0:
+        return 1
+    return int(max(1, per_state["stride"].max()))
+
+
+def decorrelation_stride(series: np.ndarray) -> tuple[float, int]:
+    """
+    Statistical inefficiency *g* of one time series and the frame stride
+    ``ceil(g)`` between effectively independent samples (1 for a constant
+    or too-short series).
+    """
+    g = float(statistical_inefficiency(np.asarray(series).reshape(-1, 1))[0])
+    return g, int(np.ceil(g)) if np.isfinite(g) else 1
+
+
 # ───────────────────────────────────────────────────────────────────────────── #
 # Exchange diagnostics                                                         #
 # ───────────────────────────────────────────────────────────────────────────── #
@@ -903,6 +2045,9 @@ def convergence_report(
     analysis_dir: str = "./analysis_output",
     max_frames_per_state: int | None = None,
     n_jobs: int = 1,
+    use_cache: bool = True,
+    streaming: bool = False,
+    mixing: dict | None = None,
 ) -> dict:
     """
     Compute all convergence metrics and return a structured report.
@@ -927,6 +2072,14 @@ def convergence_report(
         Path to analysis_output root.
     n_jobs : int
         Number of parallel workers for loading contact data.
+    use_cache : bool
+        Reuse parsed ``.npz`` caches of unchanged contact files.
+    streaming : bool
+        Use the memory-bounded streaming split-half RMSIP
+        (see :func:`split_half_rmsip`).
+    mixing : dict or None
+        Measured replica mixing summary
+        (:func:`chacra.trajectories.mixing.mixing_summary`).
 
     Returns
     -------
@@ -942,6 +2095,8 @@ def convergence_report(
             file_pattern=file_pattern,
             max_frames_per_state=max_frames_per_state,
             n_jobs=n_jobs,
+            use_cache=use_cache,
+            streaming=streaming,
         )
         report["split_half_rmsip"] = round(sh, 4) if not np.isnan(sh) else None
     except (FileNotFoundError, ValueError) as e:
@@ -972,7 +2127,15 @@ def convergence_report(
         report["exchange_bottlenecks"] = []
         report["estimated_round_trip_cycles"] = None
 
-    # 5. Verdict
+    # 5. Measured replica mixing
+    mixing = mixing or {}
+    report["measured_round_trip_cycles"] = mixing.get("mean_round_trip_cycles")
+    report["n_round_trips"] = mixing.get("n_round_trips")
+    report["ladder_spectral_gap"] = mixing.get("spectral_gap")
+    report["ladder_relaxation_cycles"] = mixing.get("relaxation_cycles")
+    report["flow_bottleneck"] = mixing.get("flow_bottleneck")
+
+    # 6. Verdict
     report["verdict"] = _determine_verdict(report)
 
     return report
@@ -1023,6 +2186,20 @@ def print_convergence_report(report: dict) -> None:
         if rt is not None:
             print(f"    Est. round-trip cycles:   ~{rt:.0f}")
 
+    n_trips = report.get("n_round_trips")
+    if n_trips is not None:
+        mrt = report.get("measured_round_trip_cycles")
+        mrt_str = f"{mrt:.0f}" if mrt is not None else "n/a"
+        print(f"    Measured round trips:     {n_trips} (mean {mrt_str} cycles)")
+        gap = report.get("ladder_spectral_gap")
+        relax = report.get("ladder_relaxation_cycles")
+        if gap is not None:
+            relax_str = f"{relax:.0f}" if relax is not None else "inf"
+            print(f"    Ladder spectral gap:      {gap:.4f} (relaxation ~{relax_str} cycles)")
+        fb = report.get("flow_bottleneck")
+        if fb is not None:
+            print(f"    Flow bottleneck:          {fb[0]}↔{fb[1]}")
+
     verdict = report.get("verdict", "unknown")
     verdicts_display = {
         "converged": "✓ CONVERGED",
@@ -1053,10 +2230,15 @@ def save_convergence_report(
 def plot_convergence_history(
     analysis_dir: str = "./analysis_output",
     filename: str | os.PathLike | None = None,
+    k: int = 3,
 ) -> plt.Figure | None:
     """
-    Plot RMSIP and contact correlation across all runs that have
-    a ``convergence.json``.
+    Plot RMSIP and contact correlation across all runs that have a
+    ``convergence.json`` or persisted PCA artefacts.
+
+    Cross-run values missing from a ``convergence.json`` are filled in
+    from the PCA artefacts of consecutive runs, which is cheap because
+    no PCA is refitted.
     """
     runs, sh_vals, cr_vals, cc_vals = [], [], [], []
 
@@ -1064,17 +2246,30 @@ def plot_convergence_history(
     if not analysis_path.exists():
         print("[convergence] Analysis directory not found.")
         return None
-    for d in sorted(analysis_path.iterdir()):
-        if not d.is_dir():
-            continue
+    run_dirs = [
+        d for d in analysis_path.glob("run_*")
+        if d.is_dir() and not d.is_symlink() and d.name[4:].isdigit()
+    ]
+    for d in sorted(run_dirs, key=lambda d: int(d.name[4:])):
         conv = d / "convergence.json"
         if conv.exists():
             with open(conv) as f:
                 data = json.load(f)
-            runs.append(data["run"])
-            sh_vals.append(data.get("split_half_rmsip"))
-            cr_vals.append(data.get("cross_run_rmsip"))
-            cc_vals.append(data.get("contact_correlation"))
+        elif (d / PCA_ARTEFACT_FILE).exists():
+            data = {"run": int(d.name[4:])}
+        else:
+            continue
+        run = data["run"]
+        cr = data.get("cross_run_rmsip")
+        cc = data.get("contact_correlation")
+        if run >= 2 and cr is None:
+            cr = cross_run_rmsip(run, k=data.get("k", k), analysis_dir=analysis_dir)
+        if run >= 2 and cc is None:
+            cc = cross_run_contact_correlation(run, analysis_dir=analysis_dir)
+        runs.append(run)
+        sh_vals.append(data.get("split_half_rmsip"))
+        cr_vals.append(cr)
+        cc_vals.append(cc)
 
     if len(runs) < 1:
         print("[convergence] No convergence.json files found.")
@@ -1119,6 +2314,49 @@ def plot_convergence_history(
     return fig
 
 
+def plot_convergence_curve(
+    curve: pd.DataFrame,
+    filename: str | os.PathLike | None = None,
+) -> plt.Figure:
+    """
+    Plot the output of :func:`convergence_curve`: RMSIP and contact
+    correlation against the fraction of accumulated frames, with the
+    k-fold block comparisons as points.
+    """
+    styles = {
+        "split_half": ("o-", "#2196F3", "Split-half"),
+        "vs_final": ("s-", "#FF9800", "Accumulated vs. final"),
+        "kfold": ("D", "#9C27B0", "Block vs. rest (k-fold)"),
+    }
+
+    fig, axes = plt.subplots(1, 2, figsize=(12, 4.5), constrained_layout=True)
+    for ax, metric, ylabel in (
+        (axes[0], "rmsip", "RMSIP"),
+        (axes[1], "correlation", "Pearson r"),
+    ):
+        for mode, (fmt, color, label) in styles.items():
+            sub = curve[curve["mode"] == mode]
+            if len(sub) > 0:
+                ax.plot(sub["fraction"], sub[metric], fmt, color=color, label=label)
+        ax.set_xlabel("Fraction of accumulated frames")
+        ax.set_ylabel(ylabel)
+        ax.set_xlim(0, 1.02)
+        ax.legend(fontsize=8)
+
+    axes[0].axhline(0.85, color="green", linestyle="--", alpha=0.5)
+    axes[0].axhline(0.70, color="orange", linestyle="--", alpha=0.5)
+    axes[0].set_ylim(0, 1.05)
+    axes[0].set_title("PCA Subspace Convergence")
+    axes[1].axhline(0.99, color="green", linestyle="--", alpha=0.5)
+    axes[1].axhline(0.98, color="orange", linestyle="--", alpha=0.5)
+    axes[1].set_title("Contact Matrix Stability")
+
+    if filename is not None:
+        fig.savefig(filename, dpi=150)
+
+    return fig
+
+
 def plot_exchange_diagnostics(
     exchange_probs: np.ndarray,
     filename: str | os.PathLike | None = None,
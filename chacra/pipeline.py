@@ -0,0 +1,614 @@
+"""
+Fingerprinted DAG execution for the process-output stages.
+
+Each stage is split into nodes (one per thermodynamic state where the work
+is per-state) that declare their input files, output files and parameters.
+A node re-executes only when it is stale:
+
+- it has no record in the state database (and its outputs are missing or an
+  upstream node re-ran in this invocation),
+- an output is missing or was modified since it was written,
+- an input's fingerprint (size + mtime, or SHA-256 with ``content_hash``)
+  changed,
+- its parameters changed.
+
+Completed nodes are recorded immediately, so an interrupted run resumes at
+per-node (per-state) granularity.  With content hashing, a node whose
+upstream re-ran but produced identical bytes is not re-executed.  A stale
+node whose inputs are gone (e.g. archived replica trajectories) keeps its
+recorded outputs; one whose upstream failed is reported as blocked.
+
+In streaming mode (``Pipeline.run(stream=True)``) stages are not barriers:
+every node is released as soon as its upstream nodes have settled, each
+per-node stage runs in its own bounded thread pool, and the per-stage queue
+state (waiting / queued / running / ran / skipped / failed) is reported at a
+fixed interval.  A state's contacts can therefore be computed while other
+states are still being demultiplexed, and wall-clock time tends towards that
+of the slowest stage rather than the sum of all stages.
+
+Given a :class:`chacra.telemetry.Telemetry`, the pipeline reports the
+window of every stage and the wall time, dispatching-thread CPU time, peak
+RSS and input/output file sizes of every node it executes.
+
+Within a node, :class:`ResultCache` skips individual artefacts: each group
+of outputs is recorded under a key derived from exactly the data it was
+computed from, and is reused while the key matches and the outputs are
+untouched.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Hashable
+
+STATE_DB_VERSION = 1
+_HASH_CHUNK = 8 << 20
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path: str, content_hash: bool = False) -> dict | None:
+    """
+    Fingerprint of a file: size plus mtime, or size plus SHA-256.
+
+    Returns None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    if content_hash:
+        return {"size": stat.st_size, "sha256": _sha256(path)}
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def params_hash(params: dict) -> str:
+    """Stable hash of a JSON-serialisable parameter dict."""
+    blob = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+@dataclass
+class Node:
+    """
+    One unit of work in a stage.
+
+    Parameters
+    ----------
+    name : str
+        Unique node name, e.g. ``"contacts:3"``.
+    inputs : list[str]
+        Files read by the node.
+    outputs : list[str]
+        Files written by the node.
+    params : dict
+        Parameters that change the outputs.
+    deps : list[str]
+        Names of upstream nodes.
+    key : Hashable
+        Passed to the stage runner to identify the node (e.g. a state index).
+    optional_inputs : list[str]
+        Files read if present. They are fingerprinted but never block the
+        node.
+    """
+
+    name: str
+    inputs: list[str]
+    outputs: list[str]
+    params: dict = field(default_factory=dict)
+    deps: list[str] = field(default_factory=list)
+    key: Hashable = None
+    optional_inputs: list[str] = field(default_factory=list)
+
+
+@dataclass
+class Stage:
+    """
+    A group of nodes executed by one runner.
+
+    Either ``run(keys, done)`` executes the stale nodes identified by
+    ``keys`` as one batch and calls ``done(key)`` as soon as each one has
+    succeeded, or ``run_one(key)`` executes a single node and returns True
+    on success. ``run_one`` stages get their own pool of ``workers`` threads
+    and, in streaming mode, start each node as soon as its upstream nodes
+    have finished.
+    """
+
+    name: str
+    nodes: list[Node]
+    run: Callable[[list, Callable[[Hashable], None]], None] | None = None
+    run_one: Callable[[Hashable], bool] | None = None
+    workers: int = 1
+
+    def __post_init__(self):
+        if (self.run is None) == (self.run_one is None):
+            raise ValueError(f"Stage {self.name!r} needs exactly one of run or run_one.")
+
+
+class StateDB:
+    """JSON record of completed nodes, written atomically after each update."""
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = str(path)
+        self.nodes = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                data = {}
+            if data.get("version") == STATE_DB_VERSION:
+                self.nodes = data.get("nodes", {})
+
+    def get(self, name: str) -> dict | None:
+        return self.nodes.get(name)
+
+    def record(self, name: str, entry: dict) -> None:
+        self.nodes[name] = entry
+        self.save()
+
+    def forget(self, name: str) -> None:
+        if self.nodes.pop(name, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": STATE_DB_VERSION, "nodes": self.nodes}, f, indent=1)
+        os.replace(tmp, self.path)
+
+
+class ResultCache:
+    """
+    Keyed records of derived artefacts, for reuse within a single node.
+
+    Each entry holds the key the artefacts were computed from, the
+    fingerprints of their files and any extra values the caller wants back
+    on reuse (e.g. a scalar derived alongside the files).
+
+    Parameters
+    ----------
+    path : str|os.PathLike
+        Location of the cache (a :class:`StateDB` file).
+    content_hash : bool, optional
+        Fingerprint outputs by SHA-256 instead of mtime. Default is False.
+    """
+
+    def __init__(self, path: str | os.PathLike, content_hash: bool = False):
+        self.db = StateDB(path)
+        self.content_hash = content_hash
+
+    def get(self, name: str, key: str) -> dict | None:
+        """
+        Extras recorded for *name* if it was computed from *key* and its
+        outputs are unchanged, else None.
+        """
+        entry = self.db.get(name)
+        if entry is None or entry.get("key") != key:
+            return None
+        for path, fp in entry["outputs"].items():
+            if fp is None or file_fingerprint(path, self.content_hash) != fp:
+                return None
+        return entry.get("extra", {})
+
+    def record(self, name: str, key: str, outputs: list[str], **extra) -> None:
+        """Record that *outputs* were computed from *key*."""
+        self.db.record(
+            name,
+            {
+                "key": key,
+                "outputs": {
+                    str(p): file_fingerprint(str(p), self.content_hash) for p in outputs
+                },
+                "extra": extra,
+            },
+        )
+
+    def forget(self, name: str) -> None:
+        self.db.forget(name)
+
+
+class Pipeline:
+    """
+    Execute stages in order, re-running only stale nodes.
+
+    Parameters
+    ----------
+    stages : list[Stage]
+        Stages in dependency order.
+    db_path : str|os.PathLike
+        Location of the state database.
+    content_hash : bool, optional
+        Fingerprint files by SHA-256 instead of mtime. Slower, but immune to
+        touched-but-unchanged files. Default is False.
+    telemetry : chacra.telemetry.Telemetry, optional
+        Receives per-stage and per-node metrics.
+    """
+
+    def __init__(
+        self,
+        stages: list[Stage],
+        db_path: str | os.PathLike,
+        content_hash: bool = False,
+        telemetry=None,
+    ):
+        self.stages = stages
+        self.telemetry = telemetry
+        self.db = StateDB(db_path)
+        self.content_hash = content_hash
+        self.nodes = {n.name: n for stage in stages for n in stage.nodes}
+        self.executed = set()
+        self.failed = set()
+        self._fingerprints = {}
+
+    # ------------------------------------------------------------------ #
+
+    def _fingerprint(self, path: str) -> dict | None:
+        # memoised within an invocation; invalidated when a node writes it
+        if path not in self._fingerprints:
+            self._fingerprints[path] = file_fingerprint(path, self.content_hash)
+        return self._fingerprints[path]
+
+    def _signature(self, node: Node) -> dict:
+        return {
+            "inputs": {
+                p: self._fingerprint(p) for p in node.inputs + node.optional_inputs
+            },
+            "outputs": {p: self._fingerprint(p) for p in node.outputs},
+            "params": params_hash(node.params),
+        }
+
+    def stale_reason(self, node: Node) -> str | None:
+        """Why a node must run, or None if it is up to date."""
+        missing_outputs = [p for p in node.outputs if self._fingerprint(p) is None]
+        upstream_ran = any(d in self.executed for d in node.deps)
+        record = self.db.get(node.name)
+        if record is None:
+            if missing_outputs or upstream_ran or not node.outputs:
+                return "not run before"
+            # outputs from before the state database existed: adopt them
+            self.db.record(node.name, self._signature(node))
+            return None
+        if missing_outputs:
+            return f"missing output {missing_outputs[0]}"
+        if record.get("params") != params_hash(node.params):
+            return "parameters changed"
+        signature = self._signature(node)
+        for kind in ("inputs", "outputs"):
+            for path, fp in signature[kind].items():
+                if record.get(kind, {}).get(path) != fp:
+                    what = "input" if kind == "inputs" else "output"
+                    return f"{what} changed: {path}"
+        return None
+
+    def _blocked(self, node: Node) -> list[str]:
+        """Missing inputs and upstream nodes that failed in this invocation."""
+        return [f"failed upstream {d}" for d in node.deps if d in self.failed] + [
+            f"missing input {p}" for p in node.inputs if self._fingerprint(p) is None
+        ]
+
+    def _can_keep(self, node: Node) -> bool:
+        return (
+            not any(d in self.failed for d in node.deps)
+            and self.db.get(node.name) is not None
+            and all(self._fingerprint(p) is not None for p in node.outputs)
+        )
+
+    def _complete(self, node: Node) -> None:
+        for path in node.outputs:
+            self._fingerprints.pop(path, None)
+        if any(self._fingerprint(p) is None for p in node.outputs):
+            self.db.forget(node.name)
+            return
+        self.db.record(node.name, self._signature(node))
+        self.executed.add(node.name)
+
+    def _classify(self, node: Node, force: bool) -> tuple[str, str | None]:
+        """``("skip"|"run"|"keep"|"block", reason)`` for a node."""
+        reason = "forced" if force else self.stale_reason(node)
+        if reason is None:
+            return "skip", None
+        blockers = self._blocked(node)
+        if not blockers:
+            return "run", reason
+        if self._can_keep(node):
+            # cannot be recomputed (e.g. raw data archived), but the outputs
+            # are still there: keep them for downstream nodes
+            return "keep", blockers[0]
+        return "block", blockers[0]
+
+    def _settle(self, node: Node, ok: bool, summary: dict) -> None:
+        if ok:
+            self._complete(node)
+        if ok and node.name in self.executed:
+            summary["ran"].append(node.name)
+        else:
+            self.db.forget(node.name)
+            self.failed.add(node.name)
+            summary["failed"].append(node.name)
+
+    def _run_one(self, stage: Stage, node: Node) -> bool:
+        if self.telemetry is None:
+            return bool(stage.run_one(node.key))
+        with self.telemetry.job(stage.name, node.name, node.inputs, node.outputs) as result:
+            result["ok"] = bool(stage.run_one(node.key))
+        return result["ok"]
+
+    def _run_pool(self, stage: Stage, nodes: list[Node], done: Callable) -> None:
+        with ThreadPoolExecutor(max_workers=max(1, stage.workers)) as pool:
+            futures = {pool.submit(self._run_one, stage, node): node for node in nodes}
+            for future in as_completed(futures):
+                if future.result():
+                    done(futures[future].key)
+
+    def _batch_job(self, stage: Stage, node: Node, ok: bool, start: float) -> None:
+        # nodes of batch stages are timed from the start of the batch
+        if self.telemetry is not None:
+            self.telemetry.record_job(
+                stage.name, node.name, ok, time.monotonic() - start,
+                node.inputs, node.outputs,
+            )
+
+    # ------------------------------------------------------------------ #
+
+    def run(
+        self,
+        force: bool = False,
+        verbose: bool = True,
+        stream: bool = False,
+        report_interval: float = 30.0,
+    ) -> dict:
+        """
+        Run every stale node.
+
+        Parameters
+        ----------
+        force : bool, optional
+            Treat every node as stale.
+        verbose : bool, optional
+            Print a per-stage summary.
+        stream : bool, optional
+            Instead of running the stages one after another, start every
+            node as soon as its upstream nodes have finished, so the stages
+            overlap. Default is False.
+        report_interval : float, optional
+            Seconds between queue-state reports in streaming mode.
+
+        Returns
+        -------
+        dict
+            Node names per outcome: ``ran``, ``skipped``, ``failed`` and
+            ``blocked`` (inputs missing or an upstream node failed). In
+            streaming mode ``queue`` holds the periodic per-stage
+            ``(elapsed_seconds, {stage: {status: count}})`` snapshots.
+        """
+        if stream:
+            return self._run_streaming(force, verbose, report_interval)
+
+        summary = {"ran": [], "skipped": [], "failed": [], "blocked": []}
+        for stage in self.stages:
+            stale, blocked, kept = [], [], []
+            for node in stage.nodes:
+                action, reason = self._classify(node, force)
+                if action in ("skip", "keep"):
+                    summary["skipped"].append(node.name)
+                    if action == "keep":
+                        kept.append((node, reason))
+                elif action == "run":
+                    stale.append((node, reason))
+                else:
+                    blocked.append((node, reason))
+            summary["blocked"].extend(n.name for n, _ in blocked)
+            self.failed.update(n.name for n, _ in blocked)
+
+            if verbose:
+                n_skip = len(stage.nodes) - len(stale) - len(blocked)
+                print(
+                    f"  [{stage.name}] {len(stale)} to run, {n_skip} up to date"
+                    + (f", {len(blocked)} blocked" if blocked else "")
+                )
+                for node, reason in stale[:5]:
+                    print(f"    {node.name}: {reason}")
+                if len(stale) > 5:
+                    print(f"    ... and {len(stale) - 5} more")
+                for node, reason in blocked:
+                    print(f"    {node.name}: {reason}")
+                if kept:
+                    print(
+                        f"    {len(kept)} kept with missing inputs, "
+                        f"e.g. {kept[0][0].name}: {kept[0][1]}"
+                    )
+
+            if not stale:
+                continue
+            by_key = {node.key: node for node, _ in stale}
+            finished = set()
+            started = time.monotonic()
+
+            def done(key, stage=stage, by_key=by_key, finished=finished, started=started):
+                node = by_key[key]
+                self._complete(node)
+                finished.add(node.name)
+                if stage.run is not None:
+                    self._batch_job(stage, node, True, started)
+
+            if self.telemetry is not None:
+                self.telemetry.stage_begin(stage.name)
+            try:
+                if stage.run is not None:
+                    stage.run(list(by_key), done)
+                else:
+                    self._run_pool(stage, list(by_key.values()), done)
+            finally:
+                if self.telemetry is not None:
+                    self.telemetry.stage_end(stage.name)
+                for node, _ in stale:
+                    if node.name in finished and node.name in self.executed:
+                        summary["ran"].append(node.name)
+                    else:
+                        if stage.run is not None and node.name not in finished:
+                            self._batch_job(stage, node, False, started)
+                        self.db.forget(node.name)
+                        self.failed.add(node.name)
+                        summary["failed"].append(node.name)
+        return summary
+
+    # ------------------------------------------------------------------ #
+
+    def _run_streaming(self, force: bool, verbose: bool, report_interval: float) -> dict:
+        summary = {"ran": [], "skipped": [], "failed": [], "blocked": [], "queue": []}
+        status = {name: "waiting" for name in self.nodes}
+        settled = ("ran", "skipped", "failed", "blocked")
+        events = queue.Queue()
+        shown = {stage.name: 0 for stage in self.stages}
+        start = time.monotonic()
+        pools = {
+            stage.name: ThreadPoolExecutor(
+                max_workers=max(1, stage.workers), thread_name_prefix=stage.name
+            )
+            for stage in self.stages
+            if stage.run_one is not None
+        }
+        batches = [stage for stage in self.stages if stage.run is not None]
+        threads = []
+
+        # Workers only post events; the state database and fingerprints are
+        # touched from this thread alone.
+        def one(stage, node):
+            events.put(("start", node.name))
+            try:
+                ok = self._run_one(stage, node)
+            except Exception:
+                traceback.print_exc()
+                ok = False
+            events.put(("result", node.name, ok))
+
+        def batch(stage, nodes):
+            by_key = {node.key: node for node in nodes}
+            started = time.monotonic()
+            finished = set()
+
+            def done(key):
+                finished.add(key)
+                self._batch_job(stage, by_key[key], True, started)
+                events.put(("result", by_key[key].name, True))
+
+            if self.telemetry is not None:
+                self.telemetry.stage_begin(stage.name)
+            try:
+                stage.run(list(by_key), done)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                if self.telemetry is not None:
+                    self.telemetry.stage_end(stage.name)
+                for key in set(by_key) - finished:
+                    self._batch_job(stage, by_key[key], False, started)
+            events.put(("batch_end", [node.name for node in nodes]))
+
+        def report():
+            snapshot = {}
+            for stage in self.stages:
+                counts = {}
+                for node in stage.nodes:
+                    counts[status[node.name]] = counts.get(status[node.name], 0) + 1
+                snapshot[stage.name] = counts
+            elapsed = time.monotonic() - start
+            summary["queue"].append((round(elapsed, 1), snapshot))
+            if verbose:
+                print(f"  [queue {elapsed:7.1f}s]")
+                for name, counts in snapshot.items():
+                    parts = ", ".join(f"{n} {k}" for k, n in sorted(counts.items()))
+                    print(f"    {name}: {parts}")
+
+        def classify(stage, node):
+            action, reason = self._classify(node, force)
+            if action in ("skip", "keep"):
+                status[node.name] = "skipped"
+                summary["skipped"].append(node.name)
+            elif action == "block":
+                status[node.name] = "blocked"
+                self.failed.add(node.name)
+                summary["blocked"].append(node.name)
+                if verbose:
+                    print(f"  [{stage.name}] {node.name} blocked: {reason}")
+            else:
+                status[node.name] = "queued"
+                if verbose and shown[stage.name] < 5:
+                    print(f"  [{stage.name}] {node.name}: {reason}")
+                shown[stage.name] += 1
+            return action == "run"
+
+        def ready(node):
+            return all(status[d] in settled for d in node.deps)
+
+        def dispatch():
+            changed = True
+            while changed:
+                changed = False
+                for stage in self.stages:
+                    if stage.run_one is not None:
+                        for node in stage.nodes:
+                            if status[node.name] == "waiting" and ready(node):
+                                changed = True
+                                if classify(stage, node):
+                                    pools[stage.name].submit(one, stage, node)
+                    elif stage in batches and all(ready(n) for n in stage.nodes):
+                        batches.remove(stage)
+                        changed = True
+                        stale = [n for n in stage.nodes if classify(stage, n)]
+                        if stale:
+                            for node in stale:
+                                status[node.name] = "running"
+                            thread = threading.Thread(
+                                target=batch, args=(stage, stale), name=stage.name
+                            )
+                            thread.start()
+                            threads.append(thread)
+
+        try:
+            next_report = start + report_interval
+            while True:
+                dispatch()
+                if all(s in settled for s in status.values()):
+                    break
+                try:
+                    event = events.get(
+                        timeout=max(0.0, next_report - time.monotonic())
+                    )
+                except queue.Empty:
+                    report()
+                    next_report = time.monotonic() + report_interval
+                    continue
+                if event[0] == "start":
+                    status[event[1]] = "running"
+                elif event[0] == "result":
+                    _, name, ok = event
+                    if status[name] not in settled:
+                        self._settle(self.nodes[name], ok, summary)
+                        status[name] = "ran" if name in self.executed else "failed"
+                else:
+                    for name in event[1]:
+                        if status[name] not in settled:
+                            self._settle(self.nodes[name], False, summary)
+                            status[name] = "failed"
+        finally:
+            for pool in pools.values():
+                pool.shutdown(wait=True)
+            for thread in threads:
+                thread.join()
+        report()
+        return summary
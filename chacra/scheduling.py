@@ -0,0 +1,390 @@
+"""
+Memory-aware dispatch of pooled jobs.
+
+Worker pools used to be sized once from a static estimate (trajectory size
+from a fully loaded Universe).  Here per-job memory is estimated cheaply from
+DCD headers and selection sizes, and jobs are admitted one at a time against
+the *live* available memory reported by psutil, so a node stays saturated
+without being pushed into OOM kills.
+
+GPU-bound subprocesses are dispatched by :class:`DevicePool`: one job queue
+shared by all devices, where each device starts the next job as soon as it
+frees up, instead of chunks of ``n_gpus`` jobs that wait for their slowest
+member.  The same pool runs multi-threaded CPU jobs on "core slots": the
+core budget is split into K concurrent jobs of C cores each, with C chosen
+by :func:`calibrate_cores` and :func:`choose_core_split` from short timed
+runs, since tools like getcontacts stop scaling after a few cores.
+"""
+
+import json
+import os
+import queue
+import struct
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from typing import Callable, Hashable, Mapping, Sequence
+
+import psutil
+
+
+# Rough resident cost of an MDAnalysis Universe's topology per atom (names,
+# types, residues, segment tables, selection caches).
+UNIVERSE_BYTES_PER_ATOM = 400
+# Fraction of currently available memory never handed out to jobs.
+DEFAULT_RESERVE_FRACTION = 0.1
+
+
+def read_dcd_header(path: str | os.PathLike) -> dict:
+    """
+    Frame and atom counts from a DCD header without loading the trajectory.
+
+    The frame count is derived from the file size and the per-frame record
+    size, so it is correct even when the writer did not update NSET.
+
+    Parameters
+    ----------
+    path : str|os.PathLike
+        Path to the DCD file.
+
+    Returns
+    -------
+    dict with keys ``n_frames``, ``n_atoms``, ``frame_bytes`` and
+    ``has_unitcell``.
+    """
+    with open(path, "rb") as f:
+        head = f.read(92)
+        if len(head) < 92:
+            raise ValueError(f"{path} is too short to be a DCD file.")
+        for endian in ("<", ">"):
+            if struct.unpack(f"{endian}i", head[:4])[0] == 84:
+                break
+        else:
+            raise ValueError(f"{path} does not start with a DCD header record.")
+        if head[4:8] != b"CORD":
+            raise ValueError(f"{path} is not a DCD coordinate file.")
+        icntrl = struct.unpack(f"{endian}20i", head[8:88])
+        n_set, n_fixed = icntrl[0], icntrl[8]
+        has_unitcell = icntrl[19] != 0 and icntrl[10] != 0
+        has_4d = icntrl[19] != 0 and icntrl[11] != 0
+
+        (title_len,) = struct.unpack(f"{endian}i", f.read(4))
+        f.seek(title_len + 4, os.SEEK_CUR)
+        _, n_atoms, _ = struct.unpack(f"{endian}3i", f.read(12))
+        header_bytes = f.tell()
+
+    frame_bytes = (3 + has_4d) * (4 * n_atoms + 8) + has_unitcell * 56
+    size = os.path.getsize(path)
+    if n_fixed == 0 and frame_bytes > 0:
+        n_frames = (size - header_bytes) // frame_bytes
+    else:
+        # fixed atoms make the first frame larger; trust the header
+        n_frames = n_set
+    return {
+        "n_frames": int(n_frames),
+        "n_atoms": int(n_atoms),
+        "frame_bytes": int(frame_bytes),
+        "has_unitcell": bool(has_unitcell),
+    }
+
+
+def available_memory() -> int:
+    """Currently available system memory in bytes."""
+    return psutil.virtual_memory().available
+
+
+def _children_rss() -> int:
+    try:
+        children = psutil.Process().children(recursive=True)
+    except psutil.Error:
+        return 0
+    rss = 0
+    for child in children:
+        try:
+            rss += child.memory_info().rss
+        except psutil.Error:
+            continue
+    return rss
+
+
+def run_memory_aware(
+    func: Callable,
+    jobs: Sequence,
+    job_memory: Sequence[int],
+    max_workers: int | None = None,
+    reserve_fraction: float = DEFAULT_RESERVE_FRACTION,
+    poll_interval: float = 0.2,
+    callback: Callable[[int, object], None] | None = None,
+) -> list:
+    """
+    Run ``func(job)`` for every job in a process pool, admitting each job
+    only when its estimated memory fits in the live available memory.
+
+    Memory already promised to running jobs but not yet allocated by them
+    (estimate minus the pool's current RSS) is subtracted from what psutil
+    reports, so a burst of admissions cannot over-commit the node. A job is
+    always admitted when nothing else is running, so oversized jobs run
+    alone rather than never.
+
+    Parameters
+    ----------
+    func : Callable
+        Picklable function run in the worker processes.
+    jobs : Sequence
+        Arguments passed to func, one per job.
+    job_memory : Sequence[int]
+        Estimated peak bytes of each job.
+    max_workers : int | None, optional
+        Upper bound on concurrent jobs. Default is the number of CPUs.
+    reserve_fraction : float, optional
+        Fraction of available memory kept free. Default is 0.1.
+    poll_interval : float, optional
+        Seconds between admission checks while jobs run.
+    callback : Callable, optional
+        Called in the parent as ``callback(index, result)`` as soon as each
+        job finishes, so downstream work can start before the pool drains.
+
+    Returns
+    -------
+    list
+        Results in the order of jobs.
+    """
+    if len(jobs) != len(job_memory):
+        raise ValueError("jobs and job_memory must have the same length.")
+    max_workers = max(1, min(max_workers or os.cpu_count() or 1, len(jobs) or 1))
+    results = [None] * len(jobs)
+    pending = deque(range(len(jobs)))
+    running = {}
+
+    def fits(estimate: int) -> bool:
+        promised = sum(job_memory[i] for i in running.values())
+        outstanding = max(0, promised - _children_rss())
+        budget = available_memory() * (1 - reserve_fraction) - outstanding
+        return estimate <= budget
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            while pending and len(running) < max_workers:
+                i = pending[0]
+                if running and not fits(job_memory[i]):
+                    break
+                running[executor.submit(func, jobs[i])] = i
+                pending.popleft()
+            done, _ = wait(
+                list(running), timeout=poll_interval, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                i = running.pop(future)
+                results[i] = future.result()
+                if callback is not None:
+                    callback(i, results[i])
+    return results
+
+
+def calibrate_cores(
+    run_with_cores: Callable[[int], None], candidates: Sequence[int]
+) -> dict[int, float]:
+    """
+    Time ``run_with_cores(c)`` for every candidate core count.
+
+    ``run_with_cores`` should run a short, fixed piece of the real workload
+    (e.g. the first frames of one trajectory) with ``c`` cores.
+
+    Returns
+    -------
+    dict mapping core count to wall-clock seconds.
+    """
+    timings = {}
+    for cores in candidates:
+        start = time.perf_counter()
+        run_with_cores(cores)
+        timings[int(cores)] = time.perf_counter() - start
+    return timings
+
+
+def choose_core_split(
+    total_cores: int, n_jobs: int, timings: Mapping[int, float]
+) -> tuple[int, int]:
+    """
+    Split a core budget into K concurrent jobs with C cores each.
+
+    The split maximises the calibrated throughput ``K / seconds(C)`` with
+    ``K = min(n_jobs, total_cores // C)``; ties go to fewer cores per job.
+
+    Parameters
+    ----------
+    total_cores : int
+        Cores available to all jobs together.
+    n_jobs : int
+        Number of jobs waiting to run.
+    timings : Mapping[int, float]
+        Calibration seconds per core count, from calibrate_cores.
+
+    Returns
+    -------
+    tuple (K, C)
+    """
+    total_cores, n_jobs = max(1, total_cores), max(1, n_jobs)
+    best = (0.0, 1, 1)
+    for cores, seconds in sorted(timings.items()):
+        if cores > total_cores or seconds <= 0:
+            continue
+        k = min(n_jobs, total_cores // cores)
+        throughput = k / seconds
+        if throughput > best[0]:
+            best = (throughput, k, cores)
+    if best[0] == 0.0:
+        return min(n_jobs, total_cores), 1
+    return best[1], best[2]
+
+
+class DevicePool:
+    """
+    Run subprocesses on a pool of devices, one job per device at a time.
+
+    Jobs share one queue: :meth:`run` blocks until any device is free, runs
+    the command with ``env_var`` set to that device, and returns the device
+    as soon as the command exits. A failed job is retried on the next free
+    device. Every attempt is recorded in :attr:`timeline`.
+
+    The commands are arbitrary, so the pool can be exercised on a CPU-only
+    machine with a stand-in command that reads ``env_var``.
+
+    Parameters
+    ----------
+    devices : Sequence
+        Device identifiers, e.g. GPU indices.
+    retries : int, optional
+        Extra attempts after a failure. Default is 1.
+    env_var : str, optional
+        Environment variable that pins a job to its device. Default is
+        ``CUDA_VISIBLE_DEVICES``.
+    log_dir : str|os.PathLike, optional
+        If given, the output of every attempt is written to
+        ``{log_dir}/{key}.attempt{n}.log``; otherwise stderr is captured and
+        stdout discarded.
+    """
+
+    def __init__(
+        self,
+        devices: Sequence,
+        retries: int = 1,
+        env_var: str = "CUDA_VISIBLE_DEVICES",
+        log_dir: str | os.PathLike | None = None,
+    ):
+        self.devices = list(devices)
+        if not self.devices:
+            raise ValueError("DevicePool needs at least one device.")
+        self.retries = retries
+        self.env_var = env_var
+        self.log_dir = log_dir
+        if log_dir is not None:
+            os.makedirs(log_dir, exist_ok=True)
+        self.timeline = []
+        self._free = queue.Queue()
+        for device in self.devices:
+            self._free.put(device)
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def _launch(self, key, cmd, device, attempt, env) -> tuple[int, str]:
+        env = {**os.environ, **(env or {}), self.env_var: str(device)}
+        if self.log_dir is None:
+            proc = subprocess.run(
+                cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+            )
+            return proc.returncode, proc.stderr.decode(errors="replace")
+        log = os.path.join(self.log_dir, f"{key}.attempt{attempt}.log")
+        with open(log, "wb") as f:
+            proc = subprocess.run(cmd, env=env, stdout=f, stderr=subprocess.STDOUT)
+        with open(log, errors="replace") as f:
+            return proc.returncode, f.read()
+
+    def run(
+        self, key: Hashable, cmd: Sequence[str], env: Mapping[str, str] | None = None
+    ) -> bool:
+        """
+        Run ``cmd`` on the next free device, retrying on failure.
+
+        Returns True if an attempt exited with status 0.
+        """
+        for attempt in range(1, self.retries + 2):
+            device = self._free.get()
+            start = time.monotonic()
+            try:
+                returncode, stderr = self._launch(key, cmd, device, attempt, env)
+            except OSError as e:
+                returncode, stderr = -1, str(e)
+            finally:
+                end = time.monotonic()
+                self._free.put(device)
+            with self._lock:
+                self.timeline.append({
+                    "key": key,
+                    "device": device,
+                    "attempt": attempt,
+                    "start": round(start - self._start, 3),
+                    "end": round(end - self._start, 3),
+                    "returncode": returncode,
+                })
+            if returncode == 0:
+                return True
+            tail = stderr.strip().splitlines()[-1:] if stderr else []
+            print(
+                f"  [WARN] {key} failed on device {device} "
+                f"(attempt {attempt}/{self.retries + 1}, exit code {returncode}). "
+                + " ".join(tail)
+            )
+        return False
+
+    def map(self, jobs: Mapping[Hashable, Sequence[str]]) -> dict:
+        """Run every ``{key: cmd}`` job; returns ``{key: succeeded}``."""
+        with ThreadPoolExecutor(max_workers=len(self.devices)) as executor:
+            futures = {key: executor.submit(self.run, key, cmd) for key, cmd in jobs.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    def utilisation(self) -> dict:
+        """
+        Per-device busy time, job count and busy fraction of the span from
+        the first start to the last end of any attempt.
+        """
+        with self._lock:
+            timeline = list(self.timeline)
+        span = (
+            max(e["end"] for e in timeline) - min(e["start"] for e in timeline)
+            if timeline else 0.0
+        )
+        usage = {}
+        for device in self.devices:
+            entries = [e for e in timeline if e["device"] == device]
+            busy = sum(e["end"] - e["start"] for e in entries)
+            usage[str(device)] = {
+                "jobs": len(entries),
+                "failures": sum(e["returncode"] != 0 for e in entries),
+                "busy_seconds": round(busy, 3),
+                "busy_fraction": round(busy / span, 3) if span > 0 else None,
+            }
+        return usage
+
+    def save_timeline(self, path: str | os.PathLike) -> None:
+        """Write the per-device utilisation and every attempt to JSON."""
+        with self._lock:
+            timeline = list(self.timeline)
+        with open(path, "w") as f:
+            json.dump(
+                {
+                    "env_var": self.env_var,
+                    "utilisation": self.utilisation(),
+                    "attempts": timeline,
+                },
+                f,
+                indent=1,
+                default=str,
+            )
@@ -6,9 +6,12 @@ Usage::
     chacra check-convergence --run 3
     chacra check-convergence --run 3 --bootstrap
     chacra check-convergence --history
+    chacra check-convergence --curve --n_checkpoints 10 --n_folds 5
+    chacra check-convergence --run 3 --ess
 """
 
 import argparse
+import json
 import os
 import sys
 
@@ -16,10 +19,14 @@ import numpy as np
 
 from chacra.convergence import (
     bootstrap_loadings,
+    convergence_curve,
     convergence_report,
+    effective_sample_size,
+    plot_convergence_curve,
     plot_convergence_history,
     plot_exchange_diagnostics,
     print_convergence_report,
+    recommended_stride,
     save_convergence_report,
 )
 
@@ -89,6 +96,28 @@ def main():
         "--n_bootstrap", type=int, default=100,
         help="Number of bootstrap resamples (default: 100).",
     )
+    parser.add_argument(
+        "--bootstrap_method", choices=("frame", "block"), default="frame",
+        help=(
+            "Resample individual frames ('frame', default) or overlapping "
+            "blocks of contiguous frames ('block', a moving-block "
+            "bootstrap), which respects time correlation."
+        ),
+    )
+    parser.add_argument(
+        "--block_length", type=int, default=None,
+        help=(
+            "Frames per block for --bootstrap_method block.  Default: "
+            "n_frames**(1/3), at most 500 blocks per state."
+        ),
+    )
+    parser.add_argument(
+        "--ess", action="store_true", default=False,
+        help=(
+            "Estimate per-contact autocorrelation, effective sample size and a "
+            "recommended decorrelation stride for each state."
+        ),
+    )
     parser.add_argument(
         "--n_jobs", type=int, default=1,
         help=(
@@ -106,10 +135,33 @@ def main():
             "(e.g. --max_frames 20000 cuts RAM by ~5× for a 100k-frame run)."
         ),
     )
+    parser.add_argument(
+        "--no_cache", action="store_true", default=False,
+        help=(
+            "Re-parse every contact file instead of reusing the parsed "
+            "caches in each contacts directory's .cache/ folder."
+        ),
+    )
     parser.add_argument(
         "--history", action="store_true", default=False,
         help="Plot convergence history across all runs and exit.",
     )
+    parser.add_argument(
+        "--curve", action="store_true", default=False,
+        help=(
+            "Compute RMSIP and contact correlation as a function of "
+            "accumulated frames (split-half, accumulated-vs-final and k-fold "
+            "blocks) from one load of the contact data, then exit."
+        ),
+    )
+    parser.add_argument(
+        "--n_checkpoints", type=int, default=10,
+        help="Number of accumulation checkpoints for --curve (default: 10).",
+    )
+    parser.add_argument(
+        "--n_folds", type=int, default=5,
+        help="Number of contiguous blocks for the --curve k-fold comparison (default: 5).",
+    )
     parser.add_argument(
         "--contact_base", type=str, default="./contact_output",
         help="Path to contact output root.",
@@ -181,9 +233,40 @@ def main():
     if args.file_pattern:
         print(f"[check-convergence] File pattern: {args.contact_base}/{args.file_pattern}")
 
+    out_dir = os.path.join(args.analysis_dir, f"run_{run}")
+    os.makedirs(out_dir, exist_ok=True)
+
+    # --curve mode
+    if args.curve:
+        curve = convergence_curve(
+            n_states=n_states,
+            k=args.k,
+            n_checkpoints=args.n_checkpoints,
+            n_folds=args.n_folds,
+            contact_base=args.contact_base,
+            file_pattern=args.file_pattern,
+            n_jobs=args.n_jobs,
+            use_cache=not args.no_cache,
+        )
+        curve_path = os.path.join(out_dir, "convergence_curve.csv")
+        curve.to_csv(curve_path, index=False)
+        print(curve.to_string(index=False, float_format=lambda v: f"{v:.4f}"))
+        fig = plot_convergence_curve(
+            curve, filename=os.path.join(out_dir, "convergence_curve.png"),
+        )
+        fig.clf()
+        print(f"\n  Convergence curve saved to: {curve_path}")
+        print(f"  Convergence curve plot:     {out_dir}/convergence_curve.png")
+        return
+
     # Load exchange probabilities if available
     exch_path = os.path.join(args.analysis_dir, f"run_{run}", "exchange_probabilities.npy")
     exchange_probs = np.load(exch_path) if os.path.exists(exch_path) else None
+    mixing_path = os.path.join(args.analysis_dir, f"run_{run}", "replica_mixing.json")
+    mixing = None
+    if os.path.exists(mixing_path):
+        with open(mixing_path) as f:
+            mixing = json.load(f)
 
     # Compute report
     report = convergence_report(
@@ -196,11 +279,11 @@ def main():
         analysis_dir=args.analysis_dir,
         max_frames_per_state=args.max_frames,
         n_jobs=args.n_jobs,
+        use_cache=not args.no_cache,
+        mixing=mixing,
     )
 
     # Save and print
-    out_dir = os.path.join(args.analysis_dir, f"run_{run}")
-    os.makedirs(out_dir, exist_ok=True)
     save_convergence_report(report, out_dir)
     print_convergence_report(report)
 
@@ -222,6 +305,32 @@ def main():
         fig.clf()
         print(f"  Convergence history plot:  {args.analysis_dir}/convergence_history.png")
 
+    # Effective sample size (opt-in)
+    if args.ess:
+        print("\n  Estimating contact autocorrelation / effective sample size...")
+        per_state, per_contact = effective_sample_size(
+            n_states=n_states,
+            contact_base=args.contact_base,
+            file_pattern=args.file_pattern,
+            n_jobs=args.n_jobs,
+            use_cache=not args.no_cache,
+        )
+        per_state.to_csv(os.path.join(out_dir, "ess_per_state.csv"))
+        per_contact.to_parquet(os.path.join(out_dir, "ess_per_contact.parquet"))
+        stride = recommended_stride(per_state)
+        report["decorrelation_stride"] = stride
+        report["min_state_ess"] = round(float(per_state["ess"].min()), 1)
+        save_convergence_report(report, out_dir)
+
+        print(f"    {'state':>5} {'frames':>8} {'g (median)':>11} {'ESS':>9}")
+        for state, row in per_state.iterrows():
+            print(
+                f"    {state:>5} {row['n_frames']:>8.0f} "
+                f"{row['g_median']:>11.1f} {row['ess']:>9.0f}"
+            )
+        print(f"    Recommended decorrelation stride: {stride} frames")
+        print(f"  ESS results saved to: {out_dir}/ess_per_state.csv")
+
     # Bootstrap (opt-in)
     if args.bootstrap:
         print(f"\n  Running bootstrap loading stability ({args.n_bootstrap} resamples)...")
@@ -233,6 +342,9 @@ def main():
             contact_base=args.contact_base,
             file_pattern=args.file_pattern,
             n_jobs=args.n_jobs,
+            use_cache=not args.no_cache,
+            method=args.bootstrap_method,
+            block_length=args.block_length,
         )
         stability_path = os.path.join(out_dir, "bootstrap_loading_stability.csv")
         stability.to_csv(stability_path)
@@ -5,15 +5,61 @@ compute frequencies, and produce ChACRA analysis.
 Pipeline stages
 ───────────────
 1. State trajectories    → state_trajectories/run_N/state_*.xtc
-2. Exchange probabilities → analysis_output/run_N/exchange_probabilities.npy
+2. Exchange probabilities → analysis_output/run_N/exchange_probabilities.npy,
+                           replica_mixing.json
 3. Contact calculations  → contact_output/run_N/contacts/cont_state_*.{parquet,tsv}
 4. Frequency calculation → contact_output/run_N/freqs/freqs_state_*.*
-5. ChACRA analysis       → analysis_output/run_N/ (plots, .pml, total_contacts)
-
-Stages 1–4 are skipped when their outputs already exist.  Once a
-stage is identified as incomplete every downstream stage re-runs
-even if its own outputs look complete (cascade rule).  Stage 5
-always re-runs to guarantee fresh results.
+5. ChACRA analysis       → analysis_output/run_N/ (plots, .pml, contact_counts,
+                           total_contacts, convergence.json)
+
+The stages run as a DAG of per-state nodes (see chacra.pipeline).  Each
+node records the fingerprints of its inputs, outputs and parameters in
+``analysis_output/run_N/pipeline_state.json`` and is re-run only when one of
+them changed, so an interrupted run resumes at the first unfinished state and
+a change to one state's trajectory only recomputes that state's contacts and
+frequencies, plus the analysis.  ``--hash`` fingerprints files by content
+instead of mtime.  With ``--stream`` the stages overlap: each state moves
+on to contacts and frequencies as soon as its trajectory is written, every
+per-state stage has its own bounded worker pool, and the queue state is
+reported periodically.
+
+Contacts are computed by one of three engines (``--engine``): ultracontacts
+on the GPUs, getcontacts on the CPU, or ``chacra``, the built-in
+NumPy/MDAnalysis engine in chacra.contacts (CPU, multiprocess over frame
+chunks, no external tools).  By default ultracontacts is used when GPUs are
+available and getcontacts otherwise.  ``--prefilter`` first scans strided
+frames of every state for residue pairs whose CA / side-chain centroids come
+within a generous cutoff (contact_output/run_N/candidate_pairs.npy); the
+chacra engine then evaluates only those pairs and getcontacts only the
+residues involved.
+
+``--contact_stride auto`` computes contacts only on effectively independent
+frames: each state's stride is ``ceil(g)``, with *g* the statistical
+inefficiency of a cheap observable (CA RMSD of the state trajectory, or the
+state's reduced energy from samples.arrow with ``--stride_observable
+energy``).  The chosen strides are recorded in
+``contact_output/run_N/contact_stride.json``.
+
+The cumulative contacts of runs 1..N are kept as exact integer counts per
+(state, residue pair) plus frames per state
+(``analysis_output/run_N/contact_counts.npz``, see chacra.contact_counts);
+each run adds its own counts to the previous run's and the frequencies in
+total_contacts.parquet are derived from them.
+
+The analysis stage reuses its own outputs: each group of artefacts is
+recorded in ``analysis_output/run_N/analysis_cache.json`` under a key of
+the data it is derived from — the ChACRA PCA, plots and .pml under a hash
+of the cumulative count matrix and the temperatures, convergence.json under
+the fingerprints of the contact files, exchange data and PCA models it
+reads, the history plot under those of every run's convergence.json.  A
+re-run with an unchanged matrix only re-counts contacts and recomputes
+nothing else.
+
+Every invocation writes per-stage and per-job telemetry (wall and CPU time,
+peak RSS, input and output file sizes, subprocess exit codes and durations) to
+``analysis_output/run_N/pipeline_metrics.json``, prints a summary table and
+flags stages that regressed against the previous run's metrics (see
+chacra.telemetry).
 
 Use ``--force`` to ignore all skip checks and rerun everything.
 
@@ -24,10 +70,13 @@ so that repeated restarts do not require re-supplying ``--min_temp``,
 
 import argparse
 import gc
+import json
 import os
 import re
 import sys
 import subprocess
+import threading
+from dataclasses import dataclass, field
 from pathlib import Path
 
 import numpy as np
@@ -35,12 +84,13 @@ import pandas as pd
 
 from chacra.ContactFrequencies import make_contact_dataframe, ContactFrequencies
 from chacra.trajectories.process_hremd import (
-    load_femto_data,
     get_num_states,
     ReplicaHandler,
     get_exchange_probabilities,
     get_state_energies,
+    get_state_rmsd,
 )
+from chacra.trajectories.mixing import replica_mixing, mixing_summary
 import GPUtil
 from chacra.plot import plot_chacras, plot_difference_of_roots, plot_explained_variance
 from chacra.convergence import (
@@ -49,9 +99,32 @@ from chacra.convergence import (
     save_convergence_report,
     plot_convergence_history,
     plot_exchange_diagnostics,
+    save_pca_artefacts,
+    decorrelation_stride,
+    PCA_ARTEFACT_FILE,
+    _find_contact_files,
 )
 from chacra.visualize.pymol import to_pymol
 from chacra.utils import RunConfig
+from chacra.pipeline import (
+    Node,
+    Pipeline,
+    ResultCache,
+    Stage,
+    file_fingerprint,
+    params_hash,
+)
+from chacra.telemetry import METRICS_FILE, Telemetry, format_summary
+from chacra.scheduling import DevicePool, calibrate_cores, choose_core_split
+from chacra.contact_counts import COUNTS_FILE, cumulative_counts
+from chacra.contacts import (
+    PREFILTER_CUTOFF,
+    PREFILTER_STRIDE,
+    candidate_residue_pairs,
+    compute_contacts,
+    contact_frequencies,
+    vmd_residue_selection,
+)
 
 import MDAnalysis as mda
 
@@ -72,99 +145,831 @@ def _update_latest_symlink(analysis_dir: str, run: int) -> None:
     latest.symlink_to(target)
 
 
-def _sorted_contact_files(freq_dir: str) -> list[str]:
-    """Return contact files (.parquet or .tsv) sorted by state index."""
-    all_files = os.listdir(freq_dir)
-    parquet_files = [f for f in all_files if f.endswith(".parquet")]
-    target_files = parquet_files if parquet_files else [f for f in all_files if f.endswith(".tsv")]
+@dataclass
+class _RunContext:
+    """Everything the stage runners need about the run being processed."""
+
+    run: int
+    n_states: int
+    temps: np.ndarray
+    args: argparse.Namespace
+    structure_file: str
+    selection_file: str
+    openmm_sys: str | None
+    gpu_devices: list[str] = field(default_factory=list)
+    engine: str = "getcontacts"
+    stream: bool = False
+    device_pool: DevicePool | None = None
+    contact_cores: int = 1
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    telemetry: Telemetry = field(default_factory=Telemetry)
+    # separate from ``lock``: the contact pool is set up under ``lock`` and
+    # its calibration builds getcontacts commands from the candidate pairs
+    _pairs_lock: threading.Lock = field(default_factory=threading.Lock)
+    _residue_pairs: np.ndarray | None = None
+    _residue_selection: str | None = None
+    _state_energies: np.ndarray | None = None
+
+    def __post_init__(self):
+        if self.use_ultracontacts and self.device_pool is None:
+            self.device_pool = DevicePool(
+                self.gpu_devices,
+                retries=self.args.gpu_retries,
+                log_dir=f"./contact_output/run_{self.run}/logs",
+            )
+
+    @property
+    def n_gpus(self) -> int:
+        return len(self.gpu_devices)
+
+    @property
+    def use_ultracontacts(self) -> bool:
+        return self.engine == "ultracontacts"
+
+    @property
+    def use_prefilter(self) -> bool:
+        # ultracontacts takes no pair list, so it always scans every pair
+        return self.args.prefilter and not self.use_ultracontacts
+
+    @property
+    def total_cores(self) -> int:
+        return self.args.n_jobs if self.args.n_jobs > 0 else (os.cpu_count() or 1)
+
+    @property
+    def samples(self) -> str:
+        return f"./replica_trajectories/run_{self.run}/samples.arrow"
+
+    @property
+    def analysis_dir(self) -> str:
+        return f"./analysis_output/run_{self.run}"
+
+    def state_trajectory(self, state_idx: int) -> str:
+        return f"./state_trajectories/run_{self.run}/state_{state_idx}.xtc"
+
+    @property
+    def candidate_pairs_file(self) -> str:
+        return f"./contact_output/run_{self.run}/candidate_pairs.npy"
+
+    @property
+    def stride_manifest(self) -> str:
+        return f"./contact_output/run_{self.run}/contact_stride.json"
+
+    def state_energies(self) -> np.ndarray:
+        """Reduced energy at each state at the saved cycles."""
+        # only the saved cycles are read, outside the lock so that other
+        # stride jobs are not held up; a concurrent first call may read twice
+        if self._state_energies is None:
+            self._state_energies = get_state_energies(
+                self.samples, rows=slice(0, None, self.args.save_interval),
+            )
+        return self._state_energies
+
+    def residue_pairs(self) -> np.ndarray | None:
+        """Prefiltered residue pairs, or None to evaluate every pair."""
+        if not self.use_prefilter:
+            return None
+        with self._pairs_lock:
+            if self._residue_pairs is None:
+                self._residue_pairs = np.load(self.candidate_pairs_file)
+        return self._residue_pairs
+
+    def residue_selection(self) -> str | None:
+        """VMD selection of the prefiltered residues, or None for all."""
+        residue_pairs = self.residue_pairs()
+        if residue_pairs is None:
+            return None
+        with self._pairs_lock:
+            if self._residue_selection is None:
+                self._residue_selection = vmd_residue_selection(
+                    residue_pairs, self.selection_file,
+                )
+        return self._residue_selection
+
+    def contact_file(self, state_idx: int) -> str:
+        ext = "tsv" if self.engine == "getcontacts" else "parquet"
+        return f"./contact_output/run_{self.run}/contacts/cont_state_{state_idx}.{ext}"
 
-    return [
-        f"{freq_dir}/{f}"
-        for f in sorted(
-            target_files,
-            key=lambda x: int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 0,
-        )
-    ]
+    def freq_file(self, state_idx: int) -> str:
+        if self.engine != "getcontacts":
+            name = f"freqs_state_{state_idx}_condensed.parquet"
+        else:
+            name = f"freqs_state_{state_idx}.tsv"
+        return f"./contact_output/run_{self.run}/freqs/{name}"
 
 
-def _contact_exists(run: int, state_idx: int) -> bool:
-    """Check if a per-state contact file exists (parquet or tsv)."""
-    return (
-        os.path.exists(f"contact_output/run_{run}/contacts/cont_state_{state_idx}.parquet")
-        or os.path.exists(f"contact_output/run_{run}/contacts/cont_state_{state_idx}.tsv")
+# Stage names, also used to attribute subprocesses in the telemetry
+_CONTACT_STAGE = "3/5 contacts"
+_FREQ_STAGE = "4/5 frequencies"
+
+
+# --------------------------------------------------------------------------- #
+# Stage runners                                                                #
+# --------------------------------------------------------------------------- #
+# Batch runners receive the keys of their stale nodes (state indices, or
+# [None] for single-node stages) and call done(key) as soon as a node
+# succeeds; per-state runners handle one state and return True on success.
+
+def _run_state_trajectories(ctx: _RunContext, states: list[int], done) -> None:
+    replica_handler = ReplicaHandler(
+        structure=ctx.structure_file,
+        traj_dir=f"./replica_trajectories/run_{ctx.run}/trajectories",
+        hremd_data=ctx.samples,
+        save_interval=ctx.args.save_interval,
+        map_dir=f"./state_trajectories/run_{ctx.run}",
     )
+    n_jobs = replica_handler.resources["num_cores"]
+    if ctx.stream:
+        # Leave cores for the overlapping contact stage.  The states are not
+        # split into more groups than jobs: every group reads all replica
+        # trajectories, so waves of groups would multiply the DCD reads
+        n_jobs = max(1, n_jobs // 2)
+
+    def group_done(group):
+        for state_idx in group:
+            done(state_idx)
+
+    replica_handler.write_state_trajectories(
+        output_dir=f"./state_trajectories/run_{ctx.run}",
+        selection=ctx.args.output_selection,
+        ref=ctx.selection_file,
+        n_jobs=n_jobs,
+        states=states,
+        callback=group_done,
+    )
+    print(f"  [DONE] Wrote {len(states)} state trajectories.")
+    del replica_handler
+    gc.collect()
 
 
-def _freq_exists(run: int, state_idx: int) -> bool:
-    """Check if a per-state frequency file exists (parquet or tsv)."""
-    return (
-        os.path.exists(f"contact_output/run_{run}/freqs/freqs_state_{state_idx}_condensed.parquet")
-        or os.path.exists(f"contact_output/run_{run}/freqs/freqs_state_{state_idx}.tsv")
+def _run_exchange(ctx: _RunContext, keys: list, done) -> None:
+    # Energy plots (cheap, reads only u_kn/replica_to_state_idx)
+    from chacra.plot import plot_energies
+    plot_energies(
+        get_state_energies(ctx.samples),
+        filename=f"{ctx.analysis_dir}/state_energies.png",
+        n_bins=50,
+    )
+
+    # Only the final row of the swap counts is read
+    exchange_probs = get_exchange_probabilities(ctx.samples)
+    np.save(f"{ctx.analysis_dir}/exchange_probabilities", exchange_probs)
+    with open(f"{ctx.analysis_dir}/exchange_probabilities.txt", "w") as f:
+        for i, prob in enumerate(exchange_probs):
+            f.write(f"{i}\n\t{prob:.4f}\n")
+
+    # Measured mixing from the full replica_to_state_idx history
+    mixing = mixing_summary(replica_mixing(ctx.samples))
+    with open(f"{ctx.analysis_dir}/replica_mixing.json", "w") as f:
+        json.dump(mixing, f, indent=2)
+    done(None)
+    print(f"  [DONE] Exchange probabilities saved.")
+
+
+def _run_prefilter(ctx: _RunContext, keys: list, done) -> None:
+    pairs = candidate_residue_pairs(
+        ctx.selection_file,
+        [ctx.state_trajectory(i) for i in range(ctx.n_states)],
+        cutoff=ctx.args.prefilter_cutoff,
+        stride=ctx.args.prefilter_stride,
+        n_jobs=ctx.total_cores,
+    )
+    np.save(ctx.candidate_pairs_file, pairs)
+    n_res = len(mda.Universe(ctx.selection_file).residues)
+    print(
+        f"  [DONE] {len(pairs)} of {n_res * (n_res - 1) // 2} residue pairs "
+        f"within {ctx.args.prefilter_cutoff} Å."
+    )
+    done(None)
+
+
+def _contact_stride(ctx: _RunContext, state_idx: int) -> int:
+    """
+    Frame stride for one state's contacts: --contact_stride, or with
+    ``auto`` the decorrelation stride of the state, recorded in the stride
+    manifest.
+    """
+    if ctx.args.contact_stride != "auto":
+        return ctx.args.contact_stride
+
+    observable = ctx.args.stride_observable
+    if observable == "energy" and os.path.exists(ctx.samples):
+        series = ctx.state_energies()[:, state_idx]
+    else:
+        # the RMSD needs only the state trajectory
+        observable = "rmsd"
+        series = get_state_rmsd(ctx.selection_file, ctx.state_trajectory(state_idx))
+    g, stride = decorrelation_stride(series)
+
+    with ctx.lock:
+        manifest = {"states": {}}
+        if os.path.exists(ctx.stride_manifest):
+            with open(ctx.stride_manifest) as f:
+                manifest = json.load(f)
+        manifest["states"][str(state_idx)] = {
+            "observable": observable,
+            "n_frames": len(series),
+            "statistical_inefficiency": round(g, 3) if np.isfinite(g) else None,
+            "stride": stride,
+        }
+        with open(ctx.stride_manifest, "w") as f:
+            json.dump(manifest, f, indent=2)
+    print(f"  state {state_idx}: contact stride {stride} ({observable}, g = {g:.2f})")
+    return stride
+
+
+def _run_contacts(ctx: _RunContext, state_idx: int) -> bool:
+    """Contacts for one state. Returns True on success."""
+    stride = _contact_stride(ctx, state_idx)
+    if ctx.use_ultracontacts:
+        cmd = [
+            "ultracontacts", "contacts",
+            "--topology", ctx.selection_file,
+            "--trajectory", ctx.state_trajectory(state_idx),
+            "--output", ctx.contact_file(state_idx),
+            "--stride", str(stride),
+        ]
+        if ctx.openmm_sys and os.path.exists(ctx.openmm_sys):
+            cmd.extend(["--openmm-system", str(ctx.openmm_sys)])
+
+        # runs on whichever GPU frees up first; the stage pool has one
+        # worker per GPU, so the device queue never starves
+        return ctx.device_pool.run(f"cont_state_{state_idx}", cmd)
+
+    if ctx.engine == "chacra":
+        # one state at a time, every core on its frame chunks
+        try:
+            compute_contacts(
+                ctx.selection_file,
+                ctx.state_trajectory(state_idx),
+                ctx.contact_file(state_idx),
+                n_jobs=ctx.total_cores,
+                stride=stride,
+                residue_pairs=ctx.residue_pairs(),
+            )
+        except Exception as e:
+            print(f"  [WARN] contacts failed for state {state_idx} ({e}). Continuing.")
+            return False
+        return True
+
+    # K states at a time with C cores each, K and C calibrated on this state
+    pool = _cpu_contact_pool(ctx, state_idx)
+    return pool.run(
+        f"cont_state_{state_idx}",
+        _getcontacts_cmd(
+            ctx,
+            ctx.state_trajectory(state_idx),
+            ctx.contact_file(state_idx),
+            ctx.contact_cores,
+            stride=stride,
+        ),
     )
 
 
-def _accumulate_contacts(
-    run: int,
-    current_run_df: pd.DataFrame,
-    selection_file: str,
-) -> pd.DataFrame:
+# getcontacts is timed on the first frames of one state with each candidate
+# core count before the core budget is split
+_CALIBRATION_FRAMES = 20
+_CALIBRATION_CORES = (1, 2, 4, 8)
+
+
+def _getcontacts_cmd(
+    ctx: _RunContext,
+    trajectory: str,
+    output: str,
+    cores: int,
+    end: int | None = None,
+    stride: int = 1,
+) -> list[str]:
+    cmd = [
+        "get-dynamic-contacts",
+        "--topology", ctx.selection_file,
+        "--trajectory", trajectory,
+        "--output", output,
+        "--cores", str(cores),
+        "--itypes", "all",
+        "--distout",
+        "--sele", "protein",
+        "--sele2", "protein",
+    ]
+    sele = ctx.residue_selection()
+    if sele is not None:
+        # getcontacts takes no pair list; restrict it to the residues involved
+        cmd[cmd.index("--sele") + 1] = sele
+        cmd[cmd.index("--sele2") + 1] = sele
+    if end is not None:
+        cmd.extend(["--end", str(end)])
+    if stride > 1:
+        cmd.extend(["--stride", str(stride)])
+    return cmd
+
+
+def _core_budget(ctx: _RunContext, state_idx: int) -> dict:
     """
-    Merge *current_run_df* with the accumulated contact data from all prior runs.
-    Uses MDAnalysis trajectory length to determine weights.
+    K concurrent getcontacts jobs x C cores, from --contact_jobs /
+    --contact_cores, a cached calibration, or a new calibration run.
     """
-    if run == 1:
-        return current_run_df
+    total = ctx.total_cores
+    jobs, cores = ctx.args.contact_jobs, ctx.args.contact_cores
+    if jobs or cores:
+        cores = cores or max(1, total // jobs)
+        jobs = jobs or max(1, total // cores)
+        return {"total_cores": total, "jobs": jobs, "cores_per_job": cores}
+
+    budget_file = f"./contact_output/run_{ctx.run}/core_budget.json"
+    if os.path.exists(budget_file):
+        with open(budget_file) as f:
+            budget = json.load(f)
+        if budget.get("total_cores") == total:
+            return budget
+
+    calibration_dir = f"./contact_output/run_{ctx.run}/logs/calibration"
+    os.makedirs(calibration_dir, exist_ok=True)
+
+    def run_with_cores(c):
+        ctx.telemetry.run(
+            f"calibration_cores_{c}",
+            _getcontacts_cmd(
+                ctx,
+                ctx.state_trajectory(state_idx),
+                f"{calibration_dir}/cores_{c}.tsv",
+                c,
+                end=_CALIBRATION_FRAMES,
+            ),
+            stage=_CONTACT_STAGE,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
 
-    prior_parquet = Path(f"./analysis_output/run_{run - 1}/total_contacts.parquet")
-    if not prior_parquet.exists():
+    candidates = [c for c in _CALIBRATION_CORES if c <= total]
+    try:
+        timings = calibrate_cores(run_with_cores, candidates)
+    except subprocess.CalledProcessError as e:
+        print(f"  [WARN] getcontacts calibration failed (exit code {e.returncode}).")
+        timings = {}
+    jobs, cores = choose_core_split(total, ctx.n_states, timings)
+    budget = {
+        "total_cores": total,
+        "jobs": jobs,
+        "cores_per_job": cores,
+        "calibration_frames": _CALIBRATION_FRAMES,
+        "calibration_seconds": {str(c): round(t, 3) for c, t in timings.items()},
+    }
+    with open(budget_file, "w") as f:
+        json.dump(budget, f, indent=2)
+    return budget
+
+
+def _cpu_contact_pool(ctx: _RunContext, state_idx: int) -> DevicePool:
+    with ctx.lock:
+        if ctx.device_pool is None:
+            budget = _core_budget(ctx, state_idx)
+            ctx.contact_cores = budget["cores_per_job"]
+            print(
+                f"  getcontacts: {budget['jobs']} concurrent states x "
+                f"{budget['cores_per_job']} cores ({budget['total_cores']} cores)"
+            )
+            ctx.device_pool = DevicePool(
+                [f"slot{k}" for k in range(budget["jobs"])],
+                retries=0,
+                env_var="CHACRA_CORE_SLOT",
+                log_dir=f"./contact_output/run_{ctx.run}/logs",
+            )
+    return ctx.device_pool
+
+
+def _run_frequencies(ctx: _RunContext, state_idx: int) -> bool:
+    """Contact frequencies for one state. Returns True on success."""
+    if ctx.engine == "chacra":
+        # condensed from the per-frame store written with the contacts
+        try:
+            contact_frequencies(ctx.contact_file(state_idx), ctx.freq_file(state_idx))
+        except Exception as e:
+            print(f"  [WARN] frequencies failed for state {state_idx} ({e}). Continuing.")
+            return False
+        return True
+    if ctx.use_ultracontacts:
+        # ultracontacts frequencies (CPU — no GPU needed)
+        cmd = [
+            "ultracontacts", "frequencies",
+            "--input", ctx.contact_file(state_idx),
+            "--output", ctx.freq_file(state_idx),
+            "--condensed",
+        ]
+        name = "ultracontacts frequencies"
+    else:
+        cmd = [
+            "get-contact-frequencies",
+            "--input_files", ctx.contact_file(state_idx),
+            "--output_file", ctx.freq_file(state_idx),
+        ]
+        name = "get-contact-frequencies"
+    try:
+        ctx.telemetry.run(
+            f"freqs_state_{state_idx}", cmd, stage=_FREQ_STAGE,
+            check=True, capture_output=ctx.use_ultracontacts,
+        )
+    except subprocess.CalledProcessError as e:
         print(
-            f"  [process-output] No prior parquet found at {prior_parquet}; "
-            "falling back to unweighted direct merge."
+            f"  [WARN] {name} failed for state {state_idx} "
+            f"(exit code {e.returncode}). Continuing."
         )
-        return current_run_df
+        return False
+    return True
+
+
+_ANALYSIS_CACHE = "analysis_cache.json"
+_TOP_CONTACTS = 10
+_CENTER_CUTOFF = 0.7
+
+
+def _fingerprints(paths: list[str], content_hash: bool) -> dict:
+    return {str(p): file_fingerprint(str(p), content_hash) for p in paths}
+
+
+def _chacra_key(matrix_key: str, temps: np.ndarray) -> str:
+    """Cache key of the ChACRA PCA, plots and .pml."""
+    return params_hash(
+        {
+            "matrix": matrix_key,
+            # exact values: the plots and .pml use them unrounded
+            "temps": np.asarray(temps, dtype=np.float64).tolist(),
+            "top_contacts": _TOP_CONTACTS,
+            "center_cutoff": _CENTER_CUTOFF,
+        }
+    )
+
+
+def _run_analysis(ctx: _RunContext, keys: list, done) -> None:
+    """
+    Cumulative analysis of runs 1..N.  Every group of artefacts is cached
+    in ``analysis_cache.json`` under a key of the data it is derived from,
+    so only the groups whose inputs changed are recomputed.
+    """
+    run, temps, n_jobs = ctx.run, ctx.temps, ctx.args.n_jobs
+    content_hash = ctx.args.hash
+    cache = ResultCache(f"{ctx.analysis_dir}/{_ANALYSIS_CACHE}", content_hash)
+
+    current_files = [ctx.freq_file(i) for i in range(ctx.n_states)]
+    summary_path = f"./contact_output/run_{run}/freqs_summary.parquet"
+    summary_key = params_hash(_fingerprints(current_files, content_hash))
+    if cache.get("freqs_summary", summary_key) is None:
+        current_run_df = make_contact_dataframe(current_files)
+        # Save a per-run summary parquet (raw, unweighted) for archival
+        current_run_df.to_parquet(summary_path, index=True)
+        cache.record("freqs_summary", summary_key, [summary_path])
+        del current_run_df
+        gc.collect()
+
+    # Cumulative integer counts: the previous run's counts plus this run's
+    # contact files; frequencies are derived from them
+    counts = cumulative_counts(run, ctx.n_states, n_jobs=n_jobs)
+    print(
+        f"  {len(counts.pair_names)} contacts over "
+        f"{int(counts.n_frames.sum())} frames (runs 1-{run})."
+    )
+    matrix_key = counts.digest()
+    counts_path = f"{ctx.analysis_dir}/{COUNTS_FILE}"
+    totals_path = f"{ctx.analysis_dir}/total_contacts.parquet"
+    cdf = None
+    if cache.get("cumulative_contacts", matrix_key) is None:
+        counts.save(counts_path)
+        cdf = counts.frequencies()
+        cdf.to_parquet(totals_path, index=True)
+        cache.record("cumulative_contacts", matrix_key, [counts_path, totals_path])
+
+    chacra_key = _chacra_key(matrix_key, temps)
+    chacra_outputs = [
+        f"{ctx.analysis_dir}/{name}"
+        for name in (
+            PCA_ARTEFACT_FILE,
+            "top_chacra_contacts.csv",
+            "chacra_modes.png",
+            "difference_of_roots.png",
+            "explained_variance.png",
+            "top_chacras.pml",
+        )
+    ]
+    cached = cache.get("chacra", chacra_key)
+    if cached is not None:
+        top_chacras = cached["top_chacras"]
+        print("  Contact matrix and temperatures unchanged; reusing ChACRA outputs.")
+    else:
+        if cdf is None:
+            cdf = counts.frequencies()
+        top_chacras = _chacra_outputs(ctx, cdf)
+        cache.record("chacra", chacra_key, chacra_outputs, top_chacras=top_chacras)
+    del cdf, counts
+    gc.collect()
+
+    # ---------------------------------------------------------------------- #
+    # Convergence diagnostics                                                 #
+    # ---------------------------------------------------------------------- #
+    # Split-half RMSIP streams each state's contact files once and keeps only
+    # per-pair half counts, so memory scales with contacts, not frames.
+    print(f"\n[process-output] Convergence diagnostics")
+    exch_path = f"{ctx.analysis_dir}/exchange_probabilities.npy"
+    mixing_path = f"{ctx.analysis_dir}/replica_mixing.json"
+    k_convergence = len(top_chacras) if top_chacras else 3
+    # the report reads every state's contact files of every run and the
+    # cumulative outputs of this run and the previous one
+    report_inputs = [
+        path
+        for state_idx in range(ctx.n_states)
+        for path, _ in _find_contact_files(state_idx)
+    ]
+    for d in (Path(ctx.analysis_dir).parent / f"run_{run - 1}", Path(ctx.analysis_dir)):
+        report_inputs += [str(d / PCA_ARTEFACT_FILE), str(d / "total_contacts.parquet")]
+    report_key = params_hash(
+        {
+            "run": run,
+            "k": k_convergence,
+            "inputs": _fingerprints(
+                report_inputs + [exch_path, mixing_path], content_hash
+            ),
+        }
+    )
+    report_outputs = [f"{ctx.analysis_dir}/convergence.json"]
+    if cache.get("convergence", report_key) is not None:
+        print("  Inputs unchanged; reusing convergence.json.")
+    else:
+        exchange_probs = np.load(exch_path) if os.path.exists(exch_path) else None
+        mixing = None
+        if os.path.exists(mixing_path):
+            with open(mixing_path) as f:
+                mixing = json.load(f)
+        report = convergence_report(
+            run=run,
+            n_states=ctx.n_states,
+            exchange_probs=exchange_probs,
+            k=k_convergence,
+            n_jobs=n_jobs,
+            streaming=True,
+            mixing=mixing,
+        )
+        save_convergence_report(report, ctx.analysis_dir)
+        print_convergence_report(report)
+
+        # Exchange diagnostics plot
+        if exchange_probs is not None:
+            fig = plot_exchange_diagnostics(
+                exchange_probs,
+                filename=f"{ctx.analysis_dir}/exchange_diagnostics.png",
+            )
+            fig.clf()
+            report_outputs.append(f"{ctx.analysis_dir}/exchange_diagnostics.png")
+        cache.record("convergence", report_key, report_outputs)
+
+    # Convergence history plot (across all runs)
+    history_path = "./analysis_output/convergence_history.png"
+    history_inputs = sorted(
+        str(p)
+        for pattern in ("run_*/convergence.json", f"run_*/{PCA_ARTEFACT_FILE}")
+        for p in Path("./analysis_output").glob(pattern)
+    )
+    history_key = params_hash(_fingerprints(history_inputs, content_hash))
+    if cache.get("convergence_history", history_key) is None:
+        fig = plot_convergence_history(filename=history_path)
+        if fig is not None:
+            fig.clf()
+            cache.record("convergence_history", history_key, [history_path])
+    done(None)
+
+
+def _chacra_outputs(ctx: _RunContext, cdf: pd.DataFrame) -> list[int]:
+    """
+    PCA model, ChACRA plots and PyMOL script of the cumulative frequencies.
+    Returns the top ChACRAs.
+    """
+    temps = ctx.temps
+    cf = ContactFrequencies(cdf, temps=np.round(temps), n_jobs=ctx.args.n_jobs)
+
+    # Persist the PCA model so cross-run metrics never refit it
+    save_pca_artefacts(cf.cpca.pca, cdf.columns, ctx.analysis_dir)
 
-    prior_df = pd.read_parquet(prior_parquet)
+    top_ten = {
+        pc: cf.cpca.sorted_norm_loadings(pc)[f"PC{pc}"][:_TOP_CONTACTS].index.tolist()
+        for pc in cf.cpca.top_chacras
+    }
+    pd.DataFrame(top_ten).to_csv(
+        f"{ctx.analysis_dir}/top_chacra_contacts.csv", index=False
+    )
 
-    # Recover frame counts via MDAnalysis (only needs 1 IO call per run)
-    current_xtc = f"./state_trajectories/run_{run}/state_0.xtc"
-    current_frames = len(mda.Universe(selection_file, current_xtc).trajectory) if os.path.exists(current_xtc) else 1
+    fig = plot_chacras(
+        cf.cpca,
+        n_pcs=cf.cpca.top_chacras[-1],
+        contacts=cf.freqs,
+        temps=temps,
+        temp_scale="K",
+        filename=f"{ctx.analysis_dir}/chacra_modes.png",
+    )
+    fig.clf()
+
+    fig = plot_difference_of_roots(
+        cf.cpca,
+        n_pcs=cf.cpca.top_chacras[-1],
+        filename=f"{ctx.analysis_dir}/difference_of_roots.png",
+    )
+    fig.clf()
+
+    plot_explained_variance(
+        cf.cpca,
+        filename=f"{ctx.analysis_dir}/explained_variance.png",
+    )
+
+    to_visualize = []
+    for pc in cf.cpca.top_chacras:
+        to_visualize.extend(cf.cpca.get_chacra_center(pc, cutoff=_CENTER_CUTOFF).index)
+
+    to_pymol(
+        to_visualize,
+        cf.freqs,
+        cf.cpca,
+        output_file=f"{ctx.analysis_dir}/top_chacras.pml",
+        pc_range=(cf.cpca.top_chacras[0], cf.cpca.top_chacras[-1]),
+        variable_sphere_scale=True,
+    )
+    return [int(pc) for pc in cf.cpca.top_chacras]
 
-    prior_total_frames = 0
-    for i in range(1, run):
-        prior_xtc = f"./state_trajectories/run_{i}/state_0.xtc"
-        if os.path.exists(prior_xtc):
-            prior_total_frames += len(mda.Universe(selection_file, prior_xtc).trajectory)
 
-    total_frames = prior_total_frames + current_frames
+def build_pipeline(ctx: _RunContext, content_hash: bool = False) -> Pipeline:
+    """
+    The process-output DAG for one run.
 
-    # Align columns — union with zero-fill
-    all_cols = prior_df.columns.union(current_run_df.columns)
-    prior_df = prior_df.reindex(columns=all_cols, fill_value=0.0)
-    current_run_df = current_run_df.reindex(columns=all_cols, fill_value=0.0)
+    Per-state nodes chain trajectory → contacts → frequencies; the exchange
+    and analysis stages are single nodes. The analysis also depends on the
+    previous run's cumulative outputs, so a re-processed earlier run
+    invalidates the later ones.
+    """
+    run, n = ctx.run, ctx.n_states
+    states = range(n)
+    replica_dcds = sorted(
+        str(p) for p in Path(f"./replica_trajectories/run_{run}/trajectories").glob("*.dcd")
+    )
 
-    # Re-weight
-    if prior_total_frames > 0 and total_frames > 0:
-        result = (
-            prior_df * (prior_total_frames / total_frames)
-            + current_run_df * (current_frames / total_frames)
+    trajectories = [
+        Node(
+            name=f"trajectory:{i}",
+            inputs=[ctx.samples, ctx.selection_file] + replica_dcds,
+            outputs=[ctx.state_trajectory(i)],
+            params={
+                "selection": ctx.args.output_selection,
+                "save_interval": ctx.args.save_interval,
+            },
+            key=i,
         )
+        for i in states
+    ]
+    exchange = [
+        Node(
+            name="exchange",
+            inputs=[ctx.samples],
+            outputs=[
+                f"{ctx.analysis_dir}/exchange_probabilities.npy",
+                f"{ctx.analysis_dir}/exchange_probabilities.txt",
+                f"{ctx.analysis_dir}/replica_mixing.json",
+            ],
+        )
+    ]
+    engine = ctx.engine
+    contact_inputs = [ctx.selection_file]
+    contact_deps = []
+    contact_params = {"engine": engine, "stride": ctx.args.contact_stride}
+    if ctx.args.contact_stride == "auto":
+        contact_params["stride_observable"] = ctx.args.stride_observable
+    prefilter = []
+    if ctx.use_ultracontacts and ctx.openmm_sys and os.path.exists(ctx.openmm_sys):
+        contact_inputs.append(str(ctx.openmm_sys))
+    if ctx.use_prefilter:
+        prefilter_params = {
+            "cutoff": ctx.args.prefilter_cutoff,
+            "stride": ctx.args.prefilter_stride,
+        }
+        prefilter = [
+            Node(
+                name="prefilter",
+                inputs=[ctx.selection_file] + [ctx.state_trajectory(i) for i in states],
+                outputs=[ctx.candidate_pairs_file],
+                params=prefilter_params,
+                deps=[f"trajectory:{i}" for i in states],
+            )
+        ]
+        contact_inputs.append(ctx.candidate_pairs_file)
+        contact_deps.append("prefilter")
+        contact_params["prefilter"] = prefilter_params
+    contacts = [
+        Node(
+            name=f"contacts:{i}",
+            inputs=[ctx.state_trajectory(i)] + contact_inputs,
+            outputs=[ctx.contact_file(i)],
+            params=contact_params,
+            deps=[f"trajectory:{i}"] + contact_deps,
+            key=i,
+        )
+        for i in states
+    ]
+    freqs = [
+        Node(
+            name=f"freqs:{i}",
+            inputs=[ctx.contact_file(i)],
+            outputs=[ctx.freq_file(i)],
+            params={"engine": engine},
+            deps=[f"contacts:{i}"],
+            key=i,
+        )
+        for i in states
+    ]
+    prior = f"./analysis_output/run_{run - 1}"
+    analysis = [
+        Node(
+            name="analysis",
+            inputs=[ctx.freq_file(i) for i in states]
+            + [ctx.contact_file(i) for i in states],
+            optional_inputs=[
+                f"{ctx.analysis_dir}/exchange_probabilities.npy",
+                f"{ctx.analysis_dir}/replica_mixing.json",
+                f"{prior}/{COUNTS_FILE}",
+                f"{prior}/pca_model.npz",
+            ],
+            outputs=[
+                f"{ctx.analysis_dir}/total_contacts.parquet",
+                f"{ctx.analysis_dir}/{COUNTS_FILE}",
+                f"{ctx.analysis_dir}/pca_model.npz",
+                f"{ctx.analysis_dir}/top_chacra_contacts.csv",
+                f"{ctx.analysis_dir}/convergence.json",
+            ],
+            params={"temps": [float(t) for t in ctx.temps]},
+            deps=[f"freqs:{i}" for i in states] + ["exchange"],
+        )
+    ]
+
+    def batch(func):
+        return lambda keys, done: func(ctx, keys, done)
+
+    def per_state(func):
+        return lambda state_idx: func(ctx, state_idx)
+
+    # CPU contacts are throttled by the calibrated core slots of the device
+    # pool and the chacra engine uses every core per state; frequencies are
+    # single-threaded, so several run side by side
+    if ctx.use_ultracontacts:
+        contact_workers = ctx.n_gpus
+    elif ctx.engine == "chacra":
+        contact_workers = 1
     else:
-        result = current_run_df
-    return result
+        contact_workers = min(n, ctx.total_cores)
+    freq_workers = max(1, min(n, (os.cpu_count() or 1) // 4))
+
+    stages = [
+        Stage("1/5 state trajectories", trajectories, batch(_run_state_trajectories)),
+        Stage("2/5 exchange probabilities", exchange, batch(_run_exchange)),
+    ]
+    if prefilter:
+        # needs every state, so --stream overlaps contacts with trajectories
+        # only without it
+        stages.append(Stage("3/5 contact prefilter", prefilter, batch(_run_prefilter)))
+    stages += [
+        Stage(
+            _CONTACT_STAGE, contacts,
+            run_one=per_state(_run_contacts), workers=contact_workers,
+        ),
+        Stage(
+            _FREQ_STAGE, freqs,
+            run_one=per_state(_run_frequencies), workers=freq_workers,
+        ),
+        Stage("5/5 ChACRA analysis", analysis, batch(_run_analysis)),
+    ]
+    return Pipeline(
+        stages,
+        db_path=f"{ctx.analysis_dir}/pipeline_state.json",
+        content_hash=content_hash,
+        telemetry=ctx.telemetry,
+    )
 
 
 # --------------------------------------------------------------------------- #
 # CLI                                                                          #
 # --------------------------------------------------------------------------- #
 
+def _stride_arg(value: str) -> int | str:
+    if value == "auto":
+        return value
+    try:
+        stride = int(value)
+    except ValueError:
+        stride = 0
+    if stride < 1:
+        raise argparse.ArgumentTypeError("expected a positive integer or 'auto'")
+    return stride
+
+
 def main():
     parser = argparse.ArgumentParser(
         description=(
             "Process the HREMD output.  Replica trajectories are separated into "
             "individual thermodynamic-state trajectories (state_trajectories/run_N/), "
             "contacts are calculated (contact_output/run_N/), and cumulative analysis "
-            "outputs are written to analysis_output/run_N/.  Stages with existing "
-            "outputs are skipped automatically; use --force to rerun everything."
+            "outputs are written to analysis_output/run_N/.  Only states whose inputs "
+            "or parameters changed are recomputed; use --force to rerun everything."
         )
     )
     parser.add_argument(
@@ -176,6 +981,89 @@ def main():
         default=False,
         help="Force all stages to re-run, ignoring existing outputs.",
     )
+    parser.add_argument(
+        "--hash",
+        action="store_true",
+        default=False,
+        help="Fingerprint files by SHA-256 content instead of size and mtime "
+             "when deciding which stages are out of date.",
+    )
+    parser.add_argument(
+        "--devices",
+        type=str,
+        default=None,
+        help="Comma-separated GPU ids for ultracontacts (default: every GPU "
+             "GPUtil detects; an empty string forces getcontacts on CPU).",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["auto", "ultracontacts", "getcontacts", "chacra"],
+        default="auto",
+        help="Contact engine.  'chacra' is the built-in NumPy/MDAnalysis "
+             "engine; 'auto' uses ultracontacts when GPUs are available and "
+             "getcontacts otherwise.",
+    )
+    parser.add_argument(
+        "--prefilter",
+        action="store_true",
+        default=False,
+        help="Before computing contacts, keep only residue pairs whose CA / "
+             "side-chain centroids come within --prefilter_cutoff in strided "
+             "frames of any state (chacra and getcontacts engines).",
+    )
+    parser.add_argument(
+        "--prefilter_cutoff",
+        type=float,
+        default=PREFILTER_CUTOFF,
+        help="Centroid distance cutoff (Å) of the contact prefilter.",
+    )
+    parser.add_argument(
+        "--prefilter_stride",
+        type=int,
+        default=PREFILTER_STRIDE,
+        help="Frame stride of the contact prefilter scan.",
+    )
+    parser.add_argument(
+        "--contact_stride",
+        type=_stride_arg,
+        default=1,
+        help="Compute contacts on every Nth frame, or 'auto' to use each "
+             "state's decorrelation stride (see --stride_observable).",
+    )
+    parser.add_argument(
+        "--stride_observable",
+        choices=["rmsd", "energy"],
+        default="rmsd",
+        help="Observable whose statistical inefficiency sets the 'auto' "
+             "contact stride: CA RMSD of the state trajectory, or the "
+             "state's reduced energy from samples.arrow.",
+    )
+    parser.add_argument(
+        "--gpu_retries",
+        type=int,
+        default=1,
+        help="Times a failed ultracontacts job is retried on the next free GPU.",
+    )
+    parser.add_argument(
+        "--contact_jobs",
+        type=int,
+        default=None,
+        help="Concurrent getcontacts jobs on CPU (default: calibrated).",
+    )
+    parser.add_argument(
+        "--contact_cores",
+        type=int,
+        default=None,
+        help="Cores per getcontacts job on CPU (default: calibrated).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=False,
+        help="Overlap the stages: each state moves on to contacts and "
+             "frequencies as soon as its trajectory is written, instead of "
+             "waiting for every state to finish the previous stage.",
+    )
     parser.add_argument(
         "--config",
         type=str,
@@ -283,397 +1171,76 @@ def main():
         u.select_atoms(args.output_selection).write(selection_file)
 
     # ---------------------------------------------------------------------- #
-    # Determine what needs to run — cascade rule                              #
+    # Run the stale nodes of the stage DAG                                    #
     # ---------------------------------------------------------------------- #
-    # Once a stage is identified as incomplete, all downstream stages must
-    # re-run even if their outputs already exist.
-    cascade = args.force
-
-    # Stage 1 check: all state trajectory xtc files exist?
-    stage1_complete = all(
-        os.path.exists(f"./state_trajectories/run_{run}/state_{i}.xtc")
-        for i in range(n_states)
-    )
-    run_stage1 = cascade or not stage1_complete
-    if run_stage1:
-        cascade = True
-
-    # Stage 2 check: exchange probabilities exist?
-    stage2_complete = os.path.exists(
-        f"./analysis_output/run_{run}/exchange_probabilities.npy"
-    )
-    run_stage2 = cascade or not stage2_complete
-    if run_stage2:
-        cascade = True
-
-    # Stage 3 check: per-state contact files
-    missing_contacts = [
-        i for i in range(n_states)
-        if not _contact_exists(run, i)
-    ]
-    stage3_complete = len(missing_contacts) == 0
-    run_stage3 = cascade or not stage3_complete
-    if run_stage3 and not cascade:
-        # Stage 3 is the first incomplete stage — cascade starts here
-        cascade = True
-
-    # Stage 4 check: per-state frequency files
-    missing_freqs = [
-        i for i in range(n_states)
-        if not _freq_exists(run, i)
-    ]
-    stage4_complete = len(missing_freqs) == 0
-    run_stage4 = cascade or not stage4_complete
-    if run_stage4 and not cascade:
-        cascade = True
-
-    # Stage 5: always re-run
-    run_stage5 = True
-
-    # ---------------------------------------------------------------------- #
-    # Stage 1: State trajectory assembly                                      #
-    # ---------------------------------------------------------------------- #
-    print(f"\n[process-output] Stage 1/5: State trajectories")
-    if run_stage1:
-        hremd_data = f"./replica_trajectories/run_{run}/samples.arrow"
-        if not os.path.exists(hremd_data):
-            sys.exit(f"  [ERROR] {hremd_data} not found. Cannot generate state trajectories.")
-
-        df = load_femto_data(hremd_data)
-
-        # Energy plots (cheap, uses femto data)
-        from chacra.plot import plot_energies
-        plot_energies(
-            get_state_energies(df),
-            filename=f"./analysis_output/run_{run}/state_energies.png",
-            n_bins=50,
+    if args.devices is not None:
+        gpu_devices = [d.strip() for d in args.devices.split(",") if d.strip()]
+    else:
+        gpu_devices = [str(gpu.id) for gpu in GPUtil.getGPUs()]
+    engine = args.engine
+    if engine == "auto":
+        engine = "ultracontacts" if gpu_devices else "getcontacts"
+    elif engine == "ultracontacts" and not gpu_devices:
+        parser.error("--engine ultracontacts needs at least one GPU.")
+    ctx = _RunContext(
+        run=run,
+        n_states=n_states,
+        temps=temps,
+        args=args,
+        structure_file=structure_file,
+        selection_file=selection_file,
+        openmm_sys=getattr(args, "system_file", None) or run_config.get("system_file"),
+        gpu_devices=gpu_devices,
+        engine=engine,
+        stream=args.stream,
+    )
+    if not os.path.exists(ctx.samples) and not all(
+        os.path.exists(ctx.state_trajectory(i)) for i in range(n_states)
+    ):
+        sys.exit(f"  [ERROR] {ctx.samples} not found. Cannot generate state trajectories.")
+
+    print(f"\n[process-output] Stages")
+    with ctx.telemetry:
+        summary = build_pipeline(ctx, content_hash=args.hash).run(
+            force=args.force, stream=args.stream
         )
 
-        replica_handler = ReplicaHandler(
-            structure=structure_file,
-            traj_dir=f"./replica_trajectories/run_{run}/trajectories",
-            hremd_data=hremd_data,
-            save_interval=args.save_interval,
+    if ctx.device_pool is not None and ctx.device_pool.timeline:
+        kind = "gpu" if ctx.use_ultracontacts else "cpu"
+        ctx.telemetry.add_timeline(
+            ctx.device_pool.timeline,
+            "ultracontacts" if ctx.use_ultracontacts else "get-dynamic-contacts",
+            stage=_CONTACT_STAGE,
         )
-        replica_handler.write_state_trajectories(
-            output_dir=f"./state_trajectories/run_{run}",
-            selection=args.output_selection,
-            ref=selection_file,
+        ctx.device_pool.save_timeline(
+            f"./contact_output/run_{run}/{kind}_timeline.json"
         )
-        print(f"  [DONE] Wrote {n_states} state trajectories.")
-    else:
-        df = None  # not loaded — not needed
-        print(f"  [SKIP] All {n_states} state trajectories already exist.")
-
-    # ---------------------------------------------------------------------- #
-    # Stage 2: Exchange probabilities                                         #
-    # ---------------------------------------------------------------------- #
-    print(f"\n[process-output] Stage 2/5: Exchange probabilities")
-    if run_stage2:
-        # Load femto data if stage 1 was skipped
-        if df is None:
-            hremd_data = f"./replica_trajectories/run_{run}/samples.arrow"
-            if not os.path.exists(hremd_data):
-                sys.exit(f"  [ERROR] {hremd_data} not found. Cannot compute exchange probabilities.")
-            df = load_femto_data(hremd_data)
-
-        exchange_probs = get_exchange_probabilities(df)
-        np.save(f"./analysis_output/run_{run}/exchange_probabilities", exchange_probs)
-        with open(f"./analysis_output/run_{run}/exchange_probabilities.txt", "w") as f:
-            for i, prob in enumerate(exchange_probs):
-                f.write(f"{i}\n\t{prob:.4f}\n")
-        print(f"  [DONE] Exchange probabilities saved.")
-    else:
-        print(f"  [SKIP] Exchange probabilities already exist.")
-
-    # Free femto data — no longer needed after stage 2
-    if df is not None:
-        del df
-    if "replica_handler" in dir():
-        del replica_handler
-    gc.collect()
-
-    # ---------------------------------------------------------------------- #
-    # Stage 3: Contact calculations (per-state)                              #
-    # ---------------------------------------------------------------------- #
-    print(f"\n[process-output] Stage 3/5: Contact calculations")
-
-    gpus = GPUtil.getGPUs()
-    n_gpus = len(gpus)
-    use_ultracontacts = n_gpus > 0
-    openmm_sys = getattr(args, "system_file", None) or run_config.get("system_file")
-
-    if run_stage3:
-        # Which states need contacts?
-        if cascade and stage3_complete and not args.force:
-            # Cascade from upstream — but contacts are all present.
-            # No upstream data changed if we didn't re-run stage 1,
-            # but cascade rule says rerun anyway for safety.
-            states_to_contact = list(range(n_states))
-        elif args.force:
-            states_to_contact = list(range(n_states))
-        else:
-            states_to_contact = missing_contacts
-
-        n_skip = n_states - len(states_to_contact)
-        if n_skip > 0:
-            print(f"  [SKIP] {n_skip}/{n_states} states already have contacts.")
-        print(f"  [RUN]  Computing contacts for {len(states_to_contact)} states.")
-
-        if use_ultracontacts:
-            print(f"  Engine: ultracontacts ({n_gpus} GPUs)")
-            # Process in GPU-sized chunks
-            chunks = [
-                states_to_contact[i:i + n_gpus]
-                for i in range(0, len(states_to_contact), n_gpus)
-            ]
-            for chunk in chunks:
-                processes = []
-                for gpu_offset, state_idx in enumerate(chunk):
-                    contacts_out = f"contact_output/run_{run}/contacts/cont_state_{state_idx}.parquet"
-                    cmd = [
-                        "ultracontacts", "contacts",
-                        "--topology", selection_file,
-                        "--trajectory", f"./state_trajectories/run_{run}/state_{state_idx}.xtc",
-                        "--output", contacts_out,
-                        "--stride", "1",
-                    ]
-                    if openmm_sys and os.path.exists(openmm_sys):
-                        cmd.extend(["--openmm-system", str(openmm_sys)])
-
-                    env = os.environ.copy()
-                    env["CUDA_VISIBLE_DEVICES"] = str(gpu_offset)
-
-                    proc = subprocess.Popen(
-                        cmd, env=env,
-                        stdout=subprocess.DEVNULL,
-                        stderr=subprocess.PIPE,
-                    )
-                    processes.append((state_idx, proc))
-
-                for state_idx, proc in processes:
-                    _, stderr = proc.communicate()
-                    if proc.returncode != 0:
-                        err_msg = stderr.decode().strip() if stderr else ""
-                        print(
-                            f"  [WARN] ultracontacts failed for state {state_idx} "
-                            f"(exit code {proc.returncode}). {err_msg}"
-                        )
-        else:
-            print(f"  Engine: getcontacts (CPU)")
-            for state_idx in states_to_contact:
-                contacts_out = f"contact_output/run_{run}/contacts/cont_state_{state_idx}.tsv"
-                try:
-                    subprocess.run(
-                        [
-                            "get-dynamic-contacts",
-                            "--topology", selection_file,
-                            "--trajectory", f"./state_trajectories/run_{run}/state_{state_idx}.xtc",
-                            "--output", str(contacts_out),
-                            "--cores", str(args.n_jobs),
-                            "--itypes", "all",
-                            "--distout",
-                            "--sele", "protein",
-                            "--sele2", "protein",
-                        ],
-                        check=True,
-                    )
-                except subprocess.CalledProcessError as e:
-                    print(
-                        f"  [WARN] getcontacts failed for state {state_idx} "
-                        f"(exit code {e.returncode}). Continuing."
-                    )
-        print(f"  [DONE] Contact calculations complete.")
-    else:
-        print(f"  [SKIP] All {n_states} states already have contacts.")
-
-    # ---------------------------------------------------------------------- #
-    # Stage 4: Frequency calculation (per-state)                             #
-    # ---------------------------------------------------------------------- #
-    print(f"\n[process-output] Stage 4/5: Frequency calculation")
-
-    if run_stage4:
-        # Which states need frequencies?
-        if cascade and stage4_complete and not args.force:
-            states_to_freq = list(range(n_states))
-        elif args.force:
-            states_to_freq = list(range(n_states))
-        else:
-            states_to_freq = missing_freqs
-
-        n_skip = n_states - len(states_to_freq)
-        if n_skip > 0:
-            print(f"  [SKIP] {n_skip}/{n_states} states already have frequencies.")
-        print(f"  [RUN]  Computing frequencies for {len(states_to_freq)} states.")
-
-        freq_failures = []
-        for state_idx in states_to_freq:
-            # Determine which contact file exists for this state
-            contact_parquet = f"contact_output/run_{run}/contacts/cont_state_{state_idx}.parquet"
-            contact_tsv = f"contact_output/run_{run}/contacts/cont_state_{state_idx}.tsv"
-
-            if os.path.exists(contact_parquet):
-                # ultracontacts frequencies (CPU — no GPU needed)
-                freq_out = f"contact_output/run_{run}/freqs/freqs_state_{state_idx}_condensed.parquet"
-                try:
-                    subprocess.run(
-                        [
-                            "ultracontacts", "frequencies",
-                            "--input", contact_parquet,
-                            "--output", freq_out,
-                            "--condensed",
-                        ],
-                        check=True,
-                        capture_output=True,
-                    )
-                except subprocess.CalledProcessError as e:
-                    print(
-                        f"  [WARN] ultracontacts frequencies failed for state {state_idx} "
-                        f"(exit code {e.returncode}). Continuing."
-                    )
-                    freq_failures.append(state_idx)
-
-            elif os.path.exists(contact_tsv):
-                # getcontacts frequency calculation
-                freq_out = f"contact_output/run_{run}/freqs/freqs_state_{state_idx}.tsv"
-                try:
-                    subprocess.run(
-                        [
-                            "get-contact-frequencies",
-                            "--input_files", str(contact_tsv),
-                            "--output_file", str(freq_out),
-                        ],
-                        check=True,
-                    )
-                except subprocess.CalledProcessError as e:
-                    print(
-                        f"  [WARN] get-contact-frequencies failed for state {state_idx} "
-                        f"(exit code {e.returncode}). Continuing."
-                    )
-                    freq_failures.append(state_idx)
-            else:
-                print(
-                    f"  [WARN] No contact file found for state {state_idx}. "
-                    f"Cannot compute frequencies."
-                )
-                freq_failures.append(state_idx)
-
-        if freq_failures:
-            print(f"  [WARN] Frequency calculation failed for states: {freq_failures}")
-        print(f"  [DONE] Frequency calculation complete.")
-    else:
-        print(f"  [SKIP] All {n_states} states already have frequencies.")
-
-    # ---------------------------------------------------------------------- #
-    # Stage 5: Contact frequency aggregation + ChACRA analysis               #
-    # ---------------------------------------------------------------------- #
-    print(f"\n[process-output] Stage 5/5: ChACRA analysis")
+        for device, usage in ctx.device_pool.utilisation().items():
+            busy = usage["busy_fraction"]
+            print(
+                f"  {kind.upper()} {device}: {usage['jobs']} jobs "
+                f"({usage['failures']} failed), busy {usage['busy_seconds']:.0f}s"
+                + (f" ({100 * busy:.0f}%)" if busy is not None else "")
+            )
+
+    print(f"\n[process-output] Stage metrics")
+    metrics = ctx.telemetry.save(
+        f"{ctx.analysis_dir}/{METRICS_FILE}",
+        previous_path=f"./analysis_output/run_{run - 1}/{METRICS_FILE}",
+    )
+    print(format_summary(metrics))
 
-    # Hard-fail if any frequency files are missing
-    still_missing = [i for i in range(n_states) if not _freq_exists(run, i)]
-    if still_missing:
+    # Hard-fail if the analysis could not run
+    if "analysis" in summary["blocked"] + summary["failed"]:
+        still_missing = [
+            i for i in range(n_states) if not os.path.exists(ctx.freq_file(i))
+        ]
         sys.exit(
             f"  [ERROR] Cannot proceed with analysis — frequency files missing "
             f"for states: {still_missing}.\n"
             f"  Fix the upstream issue and rerun: process-output --run {run}"
         )
 
-    current_freq_dir = f"./contact_output/run_{run}/freqs"
-    current_files = _sorted_contact_files(current_freq_dir)
-    current_run_df = make_contact_dataframe(current_files)
-
-    # Save a per-run summary parquet (raw, unweighted) for archival
-    current_run_df.to_parquet(
-        f"./contact_output/run_{run}/freqs_summary.parquet", index=True
-    )
-
-    # Compute (or update) the cumulative weighted contact frequencies
-    cdf = _accumulate_contacts(run, current_run_df, selection_file)
-    del current_run_df
-    gc.collect()
-
-    # Persist the cumulative result
-    cdf.to_parquet(f"./analysis_output/run_{run}/total_contacts.parquet", index=True)
-
-    cf = ContactFrequencies(cdf, temps=np.round(temps), n_jobs=args.n_jobs)
-
-    top_ten = {
-        pc: cf.cpca.sorted_norm_loadings(pc)[f"PC{pc}"][:10].index.tolist()
-        for pc in cf.cpca.top_chacras
-    }
-    pd.DataFrame(top_ten).to_csv(
-        f"./analysis_output/run_{run}/top_chacra_contacts.csv", index=False
-    )
-
-    fig = plot_chacras(
-        cf.cpca,
-        n_pcs=cf.cpca.top_chacras[-1],
-        contacts=cf.freqs,
-        temps=temps,
-        temp_scale="K",
-        filename=f"./analysis_output/run_{run}/chacra_modes.png",
-    )
-    fig.clf()
-
-    fig = plot_difference_of_roots(
-        cf.cpca,
-        n_pcs=cf.cpca.top_chacras[-1],
-        filename=f"./analysis_output/run_{run}/difference_of_roots.png",
-    )
-    fig.clf()
-
-    plot_explained_variance(
-        cf.cpca,
-        filename=f"./analysis_output/run_{run}/explained_variance.png",
-    )
-
-    to_visualize = []
-    for pc in cf.cpca.top_chacras:
-        to_visualize.extend(cf.cpca.get_chacra_center(pc, cutoff=0.7).index)
-
-    to_pymol(
-        to_visualize,
-        cf.freqs,
-        cf.cpca,
-        output_file=f"./analysis_output/run_{run}/top_chacras.pml",
-        pc_range=(cf.cpca.top_chacras[0], cf.cpca.top_chacras[-1]),
-        variable_sphere_scale=True,
-    )
-
-    # ---------------------------------------------------------------------- #
-    # Convergence diagnostics (disabled — pending rework of split-half RMSIP  #
-    # to use windowed-freqs approach for memory efficiency)                    #
-    # ---------------------------------------------------------------------- #
-    # # Load exchange probs for this run (saved in stage 2)
-    # exch_path = f"./analysis_output/run_{run}/exchange_probabilities.npy"
-    # exchange_probs = np.load(exch_path) if os.path.exists(exch_path) else None
-    #
-    # k_convergence = len(cf.cpca.top_chacras) if cf.cpca.top_chacras else 3
-    # report = convergence_report(
-    #     run=run,
-    #     n_states=n_states,
-    #     exchange_probs=exchange_probs,
-    #     k=k_convergence,
-    #     n_jobs=args.n_jobs,
-    # )
-    # save_convergence_report(report, f"./analysis_output/run_{run}")
-    # print_convergence_report(report)
-    #
-    # # Exchange diagnostics plot
-    # if exchange_probs is not None:
-    #     fig = plot_exchange_diagnostics(
-    #         exchange_probs,
-    #         filename=f"./analysis_output/run_{run}/exchange_diagnostics.png",
-    #     )
-    #     fig.clf()
-    #
-    # # Convergence history plot (across all runs)
-    # fig = plot_convergence_history(
-    #     filename=f"./analysis_output/convergence_history.png",
-    # )
-    # if fig is not None:
-    #     fig.clf()
-
     # ---------------------------------------------------------------------- #
     # Finalize                                                                #
     # ---------------------------------------------------------------------- #
@@ -242,10 +242,11 @@ def main():
     # ------------------------------------------------------------------ #
     if current_run > 1:
         # Load data from the previous completed run to verify / infer n_systems
-        df = load_femto_data(
-            f"replica_trajectories/run_{current_run - 1}/samples.arrow"
-        )
-        n_systems_from_data = get_num_states(df)
+        prev_samples = f"replica_trajectories/run_{current_run - 1}/samples.arrow"
+        n_systems_from_data = get_num_states(prev_samples)
+        last_step = read_femto_columns(
+            prev_samples, ["step"], rows=slice(-1, None)
+        )["step"][-1]
         if args.n_systems is None:
             n_systems = n_systems_from_data
         elif args.n_systems != n_systems_from_data:
@@ -288,7 +289,7 @@ def main():
                 total_cycles = args.n_cycles
             else:
                 cycles_completed = (
-                    int((df["step"].values / args.steps_per_cycle)[-1]) + 1
+                    int(last_step / args.steps_per_cycle) + 1
                 )
                 total_cycles = cycles_completed + args.n_cycles
     else:
@@ -297,7 +298,7 @@ def main():
             total_cycles = args.n_cycles
         else:
             cycles_completed = (
-                int((df["step"].values / args.steps_per_cycle)[-1]) + 1
+                int(last_step / args.steps_per_cycle) + 1
             )
             total_cycles = cycles_completed + args.n_cycles
 
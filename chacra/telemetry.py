@@ -0,0 +1,536 @@
+"""
+Per-stage and per-job telemetry for the process-output pipeline.
+
+:class:`Telemetry` is handed to :class:`chacra.pipeline.Pipeline`, which
+reports every stage and every node (job) it executes.  For each it records:
+
+- wall time;
+- CPU time: for a stage, user + system time of this process and of its
+  reaped child processes over the stage window; for a per-state job the
+  CPU time of the thread that dispatched it (``thread_cpu_seconds``).
+  Work done in process pools (the prefilter, the chacra engine) is only in
+  the stage figure;
+- for every command a job runs through :meth:`Telemetry.run` (getcontacts,
+  calibration, contact frequencies), that command's own resource usage as
+  reported by ``os.wait4``: user + system CPU (``subprocess_cpu_seconds``),
+  maximum RSS (``subprocess_max_rss_bytes``) and block I/O
+  (``subprocess_read_bytes`` / ``subprocess_write_bytes``), summed over
+  the job's commands (the RSS is their maximum);
+- peak RSS of this process plus its live children, sampled in a background
+  thread while the window is open (``process_peak_rss_bytes`` for a job,
+  ``peak_rss_bytes`` for a stage);
+- the total size of the node's declared input and output files
+  (``input_file_bytes`` / ``output_file_bytes``).  These are file sizes,
+  not I/O: an input shared by several nodes (e.g. the replica DCDs of
+  every state trajectory) is counted once per node.  Stages also carry
+  this process's own I/O counters (``process_read_bytes`` /
+  ``process_write_bytes``) where the platform provides them.
+
+External commands run through :meth:`Telemetry.run` or recorded from a
+:class:`chacra.scheduling.DevicePool` timeline are listed with their exit
+codes and durations; those run through :meth:`Telemetry.run` also carry
+their own resource usage.  :meth:`Telemetry.save` writes everything to
+``pipeline_metrics.json`` together with a per-stage summary table and a
+comparison against the metrics of a previous run.
+
+In streaming mode stages overlap, so their process-wide CPU and RSS figures
+include the work of whichever stages ran at the same time.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterable, Sequence
+
+import psutil
+
+METRICS_FILE = "pipeline_metrics.json"
+
+# A stage regresses when a metric grows by more than this fraction...
+REGRESSION_THRESHOLD = 0.25
+# ...and, for times, by more than this many seconds (ignores noise on
+# short stages)
+REGRESSION_MIN_SECONDS = 5.0
+_REGRESSION_METRICS = ("wall_seconds_per_job", "cpu_seconds_per_job", "peak_rss_bytes")
+
+# ru_maxrss is in kilobytes except on macOS (bytes); ru_inblock/ru_oublock
+# count 512-byte blocks
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+_BLOCK_BYTES = 512
+_USAGE_FIELDS = (
+    "subprocess_cpu_seconds",
+    "subprocess_max_rss_bytes",
+    "subprocess_read_bytes",
+    "subprocess_write_bytes",
+)
+
+
+def _tree_rss(process: psutil.Process) -> int:
+    """RSS of *process* and all of its live descendants."""
+    rss = 0
+    try:
+        procs = [process] + process.children(recursive=True)
+    except psutil.Error:
+        return 0
+    for proc in procs:
+        try:
+            rss += proc.memory_info().rss
+        except psutil.Error:
+            continue
+    return rss
+
+
+def _cpu_seconds(process: psutil.Process) -> float:
+    t = process.cpu_times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def _io_bytes(process: psutil.Process) -> tuple[int, int] | None:
+    try:
+        io = process.io_counters()
+    except (AttributeError, psutil.Error):
+        return None
+    return io.read_bytes, io.write_bytes
+
+
+def _file_bytes(paths: Iterable[str]) -> int:
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            continue
+    return total
+
+
+def _usage(rusage) -> dict:
+    """The resource usage of one reaped command."""
+    if rusage is None:
+        return dict.fromkeys(_USAGE_FIELDS)
+    return {
+        "subprocess_cpu_seconds": round(rusage.ru_utime + rusage.ru_stime, 3),
+        "subprocess_max_rss_bytes": rusage.ru_maxrss * _MAXRSS_UNIT,
+        "subprocess_read_bytes": rusage.ru_inblock * _BLOCK_BYTES,
+        "subprocess_write_bytes": rusage.ru_oublock * _BLOCK_BYTES,
+    }
+
+
+def _add_usage(total: dict, usage: dict) -> None:
+    """Sum *usage* into *total*; the RSS is the maximum."""
+    for field, value in usage.items():
+        if value is None:
+            continue
+        old = total.get(field)
+        if old is None:
+            total[field] = value
+        elif field == "subprocess_max_rss_bytes":
+            total[field] = max(old, value)
+        else:
+            total[field] = round(old + value, 3)
+
+
+class _Popen(subprocess.Popen):
+    """
+    Popen that reaps its child with ``os.wait4``, keeping the child's own
+    resource usage in ``rusage`` (None where wait4 is unavailable).
+    """
+
+    rusage = None
+
+    if hasattr(os, "wait4"):
+
+        def _try_wait(self, wait_flags):
+            # every blocking wait (wait, communicate) reaps through here
+            try:
+                pid, sts, rusage = os.wait4(self.pid, wait_flags)
+            except ChildProcessError:
+                return self.pid, 0
+            if pid == self.pid:
+                self.rusage = rusage
+            return pid, sts
+
+
+class _Window:
+    """Start snapshot and running RSS peak of one stage or job."""
+
+    def __init__(self, process: psutil.Process, origin: float):
+        self.start = time.monotonic()
+        self.offset = self.start - origin
+        self.end = self.start
+        self.cpu_start = _cpu_seconds(process)
+        self.cpu_end = self.cpu_start
+        self.io_start = _io_bytes(process)
+        self.io_end = self.io_start
+        self.peak_rss = _tree_rss(process)
+        self.active = 0
+
+    def close(self, process: psutil.Process) -> None:
+        self.end = time.monotonic()
+        self.cpu_end = _cpu_seconds(process)
+        self.io_end = _io_bytes(process)
+        self.peak_rss = max(self.peak_rss, _tree_rss(process))
+
+
+class Telemetry:
+    """
+    Collects stage, job and subprocess metrics for one pipeline invocation.
+
+    Parameters
+    ----------
+    sample_interval : float, optional
+        Seconds between RSS samples. Default is 0.5.
+    """
+
+    def __init__(self, sample_interval: float = 0.5):
+        self.sample_interval = sample_interval
+        self.jobs = []
+        self.subprocesses = []
+        self._stages = {}
+        self._open = set()
+        self._lock = threading.Lock()
+        self._process = psutil.Process()
+        self._origin = time.monotonic()
+        self._stop = threading.Event()
+        self._sampler = None
+        # resource usage of the commands run by the job open in each thread
+        self._local = threading.local()
+
+    # ------------------------------------------------------------------ #
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.sample_interval):
+            rss = _tree_rss(self._process)
+            with self._lock:
+                for window in self._open:
+                    window.peak_rss = max(window.peak_rss, rss)
+
+    def __enter__(self):
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    # ------------------------------------------------------------------ #
+
+    def stage_begin(self, stage: str) -> None:
+        """Open (or re-open, for overlapping jobs) the window of a stage."""
+        with self._lock:
+            window = self._stages.get(stage)
+            if window is None:
+                window = self._stages[stage] = _Window(self._process, self._origin)
+            window.active += 1
+            self._open.add(window)
+
+    def stage_end(self, stage: str) -> None:
+        with self._lock:
+            window = self._stages[stage]
+            window.active -= 1
+            if window.active <= 0:
+                self._open.discard(window)
+        window.close(self._process)
+
+    def record_job(
+        self,
+        stage: str,
+        name: str,
+        ok: bool,
+        wall_seconds: float,
+        inputs: Sequence[str] = (),
+        outputs: Sequence[str] = (),
+        thread_cpu_seconds: float | None = None,
+        peak_rss: int | None = None,
+        start: float | None = None,
+        usage: dict | None = None,
+    ) -> None:
+        """
+        Record a finished node.  *inputs* and *outputs* are only sized;
+        *thread_cpu_seconds* is the CPU time of the dispatching thread,
+        *peak_rss* that of the process tree and *usage* the summed resource
+        usage of the commands the node ran.
+        """
+        entry = {
+            "stage": stage,
+            "node": name,
+            "ok": bool(ok),
+            "start": round(start, 3) if start is not None else None,
+            "wall_seconds": round(wall_seconds, 3),
+            "thread_cpu_seconds": (
+                round(thread_cpu_seconds, 3) if thread_cpu_seconds is not None else None
+            ),
+            **dict.fromkeys(_USAGE_FIELDS),
+            **(usage or {}),
+            "process_peak_rss_bytes": peak_rss,
+            "input_file_bytes": _file_bytes(inputs),
+            "output_file_bytes": _file_bytes(outputs),
+        }
+        with self._lock:
+            self.jobs.append(entry)
+
+    @contextmanager
+    def job(self, stage: str, name: str, inputs=(), outputs=()):
+        """
+        Measure one node run in the calling thread. The body sets
+        ``result["ok"]``. CPU time is that of the calling thread; commands
+        the body runs through :meth:`run` add their own usage to the job.
+        """
+        result = {"ok": False}
+        self.stage_begin(stage)
+        window = _Window(self._process, self._origin)
+        with self._lock:
+            self._open.add(window)
+        outer = getattr(self._local, "usage", None)
+        usage = self._local.usage = {}
+        cpu = time.thread_time()
+        try:
+            yield result
+        finally:
+            cpu = time.thread_time() - cpu
+            self._local.usage = outer
+            with self._lock:
+                self._open.discard(window)
+            window.close(self._process)
+            self.stage_end(stage)
+            self.record_job(
+                stage, name, result["ok"], window.end - window.start,
+                inputs, outputs, thread_cpu_seconds=cpu, peak_rss=window.peak_rss,
+                start=window.offset, usage=usage,
+            )
+
+    def run(
+        self,
+        key: str,
+        cmd: Sequence[str],
+        stage: str | None = None,
+        *,
+        input=None,
+        capture_output: bool = False,
+        timeout: float | None = None,
+        check: bool = False,
+        **kwargs,
+    ) -> subprocess.CompletedProcess:
+        """
+        ``subprocess.run(cmd, ...)``, recording the exit code, duration and
+        the command's own CPU time, maximum RSS and block I/O. Inside
+        :meth:`job` the usage is also added to that job.
+        """
+        if capture_output:
+            kwargs["stdout"] = kwargs["stderr"] = subprocess.PIPE
+        if input is not None:
+            kwargs["stdin"] = subprocess.PIPE
+        start = time.monotonic()
+        proc = None
+        try:
+            with _Popen(cmd, **kwargs) as proc:
+                try:
+                    stdout, stderr = proc.communicate(input, timeout=timeout)
+                except BaseException:
+                    proc.kill()
+                    proc.wait()
+                    raise
+            completed = subprocess.CompletedProcess(
+                proc.args, proc.returncode, stdout, stderr
+            )
+            if check:
+                completed.check_returncode()
+            return completed
+        finally:
+            usage = _usage(proc.rusage if proc is not None else None)
+            job_usage = getattr(self._local, "usage", None)
+            if job_usage is not None:
+                _add_usage(job_usage, usage)
+            returncode = -1
+            if proc is not None and proc.returncode is not None:
+                returncode = proc.returncode
+            self.record_subprocess(
+                key, cmd[0], returncode, time.monotonic() - start,
+                stage=stage, start=start - self._origin, **usage,
+            )
+
+    def record_subprocess(
+        self,
+        key: str,
+        command: str,
+        returncode: int,
+        seconds: float,
+        stage: str | None = None,
+        start: float | None = None,
+        **extra,
+    ) -> None:
+        entry = {
+            "key": str(key),
+            "stage": stage,
+            "command": command,
+            "returncode": returncode,
+            "start": round(start, 3) if start is not None else None,
+            "seconds": round(seconds, 3),
+            **extra,
+        }
+        with self._lock:
+            self.subprocesses.append(entry)
+
+    def add_timeline(self, timeline: list[dict], command: str, stage: str | None = None) -> None:
+        """Record every attempt of a DevicePool timeline."""
+        for e in timeline:
+            self.record_subprocess(
+                e["key"], command, e["returncode"], e["end"] - e["start"],
+                stage=stage, device=str(e["device"]), attempt=e["attempt"],
+            )
+
+    # ------------------------------------------------------------------ #
+
+    def stages(self) -> list[dict]:
+        """Per-stage metrics, in the order the stages started."""
+        rows = []
+        with self._lock:
+            items = sorted(self._stages.items(), key=lambda kv: kv[1].start)
+            jobs = list(self.jobs)
+            subprocesses = list(self.subprocesses)
+        for name, w in items:
+            stage_jobs = [j for j in jobs if j["stage"] == name]
+            stage_subs = [s for s in subprocesses if s["stage"] == name]
+            n_jobs = max(1, len(stage_jobs))
+            wall = w.end - w.start
+            cpu = w.cpu_end - w.cpu_start
+            row = {
+                "stage": name,
+                "start": round(w.offset, 3),
+                "wall_seconds": round(wall, 3),
+                "cpu_seconds": round(cpu, 3),
+                "wall_seconds_per_job": round(wall / n_jobs, 3),
+                "cpu_seconds_per_job": round(cpu / n_jobs, 3),
+                "peak_rss_bytes": w.peak_rss,
+                "jobs": len(stage_jobs),
+                "failed_jobs": sum(not j["ok"] for j in stage_jobs),
+                "input_file_bytes": sum(j["input_file_bytes"] for j in stage_jobs),
+                "output_file_bytes": sum(j["output_file_bytes"] for j in stage_jobs),
+                "subprocesses": len(stage_subs),
+                "failed_subprocesses": sum(s["returncode"] != 0 for s in stage_subs),
+                "subprocess_seconds": round(sum(s["seconds"] for s in stage_subs), 3),
+            }
+            usage = {}
+            for s in stage_subs:
+                _add_usage(usage, {f: s.get(f) for f in _USAGE_FIELDS})
+            row.update({**dict.fromkeys(_USAGE_FIELDS), **usage})
+            if w.io_start is not None and w.io_end is not None:
+                row["process_read_bytes"] = w.io_end[0] - w.io_start[0]
+                row["process_write_bytes"] = w.io_end[1] - w.io_start[1]
+            rows.append(row)
+        return rows
+
+    def report(self, previous: dict | None = None) -> dict:
+        """All metrics, the summary rows and regressions against *previous*."""
+        stages = self.stages()
+        with self._lock:
+            jobs = list(self.jobs)
+            subprocesses = list(self.subprocesses)
+        return {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "wall_seconds": round(time.monotonic() - self._origin, 3),
+            "stages": stages,
+            "jobs": jobs,
+            "subprocesses": subprocesses,
+            "regressions": compare_metrics(stages, previous["stages"]) if previous else [],
+        }
+
+    def save(self, path: str | os.PathLike, previous_path: str | os.PathLike | None = None) -> dict:
+        """
+        Write :meth:`report` to *path*, comparing against the metrics file
+        at *previous_path* if it exists. Returns the report.
+        """
+        previous = None
+        if previous_path is not None and os.path.exists(previous_path):
+            with open(previous_path) as f:
+                previous = json.load(f)
+        report = self.report(previous)
+        if previous is not None:
+            report["previous"] = str(previous_path)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp, path)
+        return report
+
+
+def compare_metrics(
+    current: list[dict],
+    previous: list[dict],
+    threshold: float = REGRESSION_THRESHOLD,
+    min_seconds: float = REGRESSION_MIN_SECONDS,
+) -> list[dict]:
+    """
+    Stage metrics that grew by more than *threshold* (relative) since
+    *previous*; times must also grow by more than *min_seconds*. Per-job
+    times are compared, so runs with different numbers of stale nodes stay
+    comparable.
+    """
+    before = {row["stage"]: row for row in previous}
+    regressions = []
+    for row in current:
+        old = before.get(row["stage"])
+        if old is None:
+            continue
+        for metric in _REGRESSION_METRICS:
+            new_val, old_val = row.get(metric), old.get(metric)
+            if not new_val or not old_val:
+                continue
+            if metric.endswith("seconds_per_job") and new_val - old_val <= min_seconds:
+                continue
+            ratio = new_val / old_val
+            if ratio > 1.0 + threshold:
+                regressions.append({
+                    "stage": row["stage"],
+                    "metric": metric,
+                    "previous": old_val,
+                    "current": new_val,
+                    "ratio": round(ratio, 2),
+                })
+    return regressions
+
+
+def _human_bytes(n: int | None) -> str:
+    if n is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def format_summary(report: dict) -> str:
+    """Plain-text per-stage summary table (and regressions) of a report."""
+    header = (
+        f"  {'stage':<28} {'jobs':>5} {'wall s':>9} {'cpu s':>9} {'sub cpu s':>9} "
+        f"{'peak RSS':>10} {'in files':>10} {'out files':>10} {'subproc':>8}"
+    )
+    lines = [header, "  " + "-" * (len(header) - 2)]
+    for row in report["stages"]:
+        jobs = f"{row['jobs']}" + (f"/{row['failed_jobs']}!" if row["failed_jobs"] else "")
+        subs = f"{row['subprocesses']}" + (
+            f"/{row['failed_subprocesses']}!" if row["failed_subprocesses"] else ""
+        )
+        sub_cpu = row.get("subprocess_cpu_seconds")
+        sub_cpu = "-" if sub_cpu is None else f"{sub_cpu:.1f}"
+        lines.append(
+            f"  {row['stage']:<28} {jobs:>5} {row['wall_seconds']:>9.1f} "
+            f"{row['cpu_seconds']:>9.1f} {sub_cpu:>9} "
+            f"{_human_bytes(row['peak_rss_bytes']):>10} "
+            f"{_human_bytes(row['input_file_bytes']):>10} "
+            f"{_human_bytes(row['output_file_bytes']):>10} {subs:>8}"
+        )
+    for r in report.get("regressions", []):
+        lines.append(
+            f"  [REGRESSION] {r['stage']}: {r['metric']} {r['previous']} → "
+            f"{r['current']} (x{r['ratio']})"
+        )
+    return "\n".join(lines)
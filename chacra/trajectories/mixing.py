@@ -0,0 +1,222 @@
+"""
+Replica-exchange mixing diagnostics from the femto replica_to_state_idx history.
+
+Nearest-neighbour swap probabilities only bound how well replicas move along
+the ladder.  The functions here measure it directly from the state each
+replica visited on every cycle:
+
+- **State-transition matrix** and its **spectral gap**: the per-cycle Markov
+  matrix of state→state moves; 1/gap is the ladder relaxation time in cycles.
+- **Round-trip times**: cycles between successive arrivals of a replica at the
+  lowest state with a visit to the highest state in between.
+- **Flow fraction**: the fraction of replicas at each state that last visited
+  the lowest (rather than the highest) state.  Ideal mixing gives a linear
+  decrease from 1 to 0 across the ladder; steep drops mark bottlenecks.
+- **Time to first traversal**: the cycle by which each replica has visited
+  both ends of the ladder.
+
+Everything is computed with array operations over the full
+(cycles x replicas) history, read once from samples.arrow.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from chacra.trajectories.process_hremd import _femto_array
+
+
+def state_transition_matrix(replica_to_state_idx: np.ndarray) -> np.ndarray:
+    """
+    Empirical per-cycle state-transition matrix.
+
+    Parameters
+    ----------
+    replica_to_state_idx : np.ndarray
+        Array of shape n_cycles x n_replicas; element [t, r] is the state
+        replica r was at in cycle t.
+
+    Returns
+    -------
+    np.ndarray of shape n_states x n_states
+    Row i holds the probabilities that a replica at state i is at state j on
+    the next cycle. Rows of unvisited states are zero.
+    """
+    r2s = np.asarray(replica_to_state_idx, dtype=np.int64)
+    n_states = r2s.shape[1]
+    counts = np.bincount(
+        (r2s[:-1] * n_states + r2s[1:]).ravel(), minlength=n_states * n_states
+    ).reshape(n_states, n_states)
+    totals = counts.sum(axis=1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(totals > 0, counts / totals, 0.0)
+
+
+def spectral_gap(transition_matrix: np.ndarray) -> float:
+    """
+    1 - |λ2| of a transition matrix, where λ2 is its second-largest
+    eigenvalue by modulus.
+    """
+    eigenvalues = np.sort(np.abs(np.linalg.eigvals(transition_matrix)))[::-1]
+    if len(eigenvalues) < 2:
+        return float("nan")
+    return float(1.0 - eigenvalues[1])
+
+
+def _last_extreme(replica_to_state_idx: np.ndarray) -> np.ndarray:
+    """
+    For every (cycle, replica), which end of the ladder the replica visited
+    most recently: 0 for the lowest state, 1 for the highest, -1 for neither
+    yet.
+    """
+    r2s = np.asarray(replica_to_state_idx)
+    top = r2s.shape[1] - 1
+    label = np.where(r2s == 0, 0, np.where(r2s == top, 1, -1))
+    # forward-fill the last extreme hit along the cycle axis
+    cycles = np.arange(len(r2s))[:, None]
+    last_hit = np.maximum.accumulate(np.where(label >= 0, cycles, -1), axis=0)
+    filled = np.take_along_axis(label, np.maximum(last_hit, 0), axis=0)
+    return np.where(last_hit >= 0, filled, -1)
+
+
+def round_trip_times(replica_to_state_idx: np.ndarray) -> list[np.ndarray]:
+    """
+    Measured round-trip times of each replica.
+
+    A round trip runs from an arrival at the lowest state, via the highest
+    state, to the next arrival at the lowest state.
+
+    Returns
+    -------
+    list[np.ndarray]
+    Element r holds the durations (in cycles) of replica r's round trips.
+    """
+    last = _last_extreme(replica_to_state_idx)
+    # cycles where a replica arrives at the lowest state coming from the top
+    # (or for the first time)
+    previous = np.vstack([np.full((1, last.shape[1]), -1), last[:-1]])
+    arrivals = (last == 0) & (previous != 0)
+    times = []
+    for r in range(last.shape[1]):
+        starts = np.flatnonzero(arrivals[:, r])
+        times.append(np.diff(starts))
+    return times
+
+
+def flow_fraction(replica_to_state_idx: np.ndarray) -> np.ndarray:
+    """
+    Fraction of replicas at each state moving up the ladder.
+
+    A replica is moving up if it last visited the lowest state and down if
+    it last visited the highest. Replicas that have visited neither are
+    ignored.
+
+    Returns
+    -------
+    np.ndarray of length n_states (NaN where no labelled replica visited)
+    """
+    r2s = np.asarray(replica_to_state_idx)
+    n_states = r2s.shape[1]
+    last = _last_extreme(r2s)
+    up = np.bincount(r2s[last == 0], minlength=n_states)
+    down = np.bincount(r2s[last == 1], minlength=n_states)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(up + down > 0, up / (up + down), np.nan)
+
+
+def time_to_first_traversal(replica_to_state_idx: np.ndarray) -> np.ndarray:
+    """
+    Cycle by which each replica has visited both the lowest and the highest
+    state (NaN if it never did).
+    """
+    r2s = np.asarray(replica_to_state_idx)
+    top = r2s.shape[1] - 1
+
+    def first_visit(mask):
+        return np.where(mask.any(axis=0), mask.argmax(axis=0), np.nan)
+
+    # np.maximum propagates NaN: never reaching either end gives NaN
+    return np.maximum(first_visit(r2s == 0), first_visit(r2s == top))
+
+
+def replica_mixing(data: np.ndarray | pd.DataFrame | str | os.PathLike) -> dict:
+    """
+    All mixing diagnostics for an HREMD run.
+
+    Parameters
+    ----------
+    data : np.ndarray | pd.DataFrame | str
+        The n_cycles x n_replicas replica_to_state_idx history, femto state
+        data, or the path to the samples.arrow file (only
+        replica_to_state_idx is read).
+
+    Returns
+    -------
+    dict with keys:
+        - ``n_cycles``
+        - ``transition_matrix``: n_states x n_states
+        - ``spectral_gap`` and ``relaxation_cycles`` (1 / gap)
+        - ``round_trip_times``: list of per-replica arrays
+        - ``flow_fraction``: per state
+        - ``time_to_first_traversal``: per replica
+    """
+    if isinstance(data, np.ndarray):
+        r2s = data
+    else:
+        r2s = _femto_array(data, "replica_to_state_idx")
+    transitions = state_transition_matrix(r2s)
+    gap = spectral_gap(transitions)
+    return {
+        "n_cycles": int(len(r2s)),
+        "transition_matrix": transitions,
+        "spectral_gap": gap,
+        "relaxation_cycles": 1.0 / gap if gap > 0 else float("inf"),
+        "round_trip_times": round_trip_times(r2s),
+        "flow_fraction": flow_fraction(r2s),
+        "time_to_first_traversal": time_to_first_traversal(r2s),
+    }
+
+
+def _json_float(value: float, ndigits: int = 4) -> float | None:
+    return None if not np.isfinite(value) else round(float(value), ndigits)
+
+
+def mixing_summary(mixing: dict) -> dict:
+    """
+    JSON-serialisable summary of :func:`replica_mixing` output.
+
+    The nearest-neighbour per-cycle transition probabilities and the
+    steepest drop in flow fraction locate ladder bottlenecks.
+    """
+    trips = mixing["round_trip_times"]
+    all_trips = np.concatenate(trips) if trips else np.array([])
+    transitions = mixing["transition_matrix"]
+    flow = mixing["flow_fraction"]
+    drops = -np.diff(flow)
+    first = mixing["time_to_first_traversal"]
+    return {
+        "n_cycles": mixing["n_cycles"],
+        "spectral_gap": _json_float(mixing["spectral_gap"], 6),
+        "relaxation_cycles": _json_float(mixing["relaxation_cycles"], 1),
+        "n_round_trips": int(len(all_trips)),
+        "round_trips_per_replica": [int(len(t)) for t in trips],
+        "mean_round_trip_cycles": (
+            _json_float(all_trips.mean(), 1) if len(all_trips) else None
+        ),
+        "median_round_trip_cycles": (
+            _json_float(np.median(all_trips), 1) if len(all_trips) else None
+        ),
+        "neighbor_transition_probs": [
+            _json_float(p) for p in np.diagonal(transitions, offset=1)
+        ],
+        "flow_fraction": [_json_float(f) for f in flow],
+        "flow_bottleneck": (
+            [int(np.nanargmax(drops)), int(np.nanargmax(drops)) + 1]
+            if np.isfinite(drops).any() else None
+        ),
+        "replicas_traversed": int(np.isfinite(first).sum()),
+        "median_first_traversal_cycles": (
+            _json_float(np.nanmedian(first), 1) if np.isfinite(first).any() else None
+        ),
+    }
@@ -1,15 +1,15 @@
 import os
-import sys
+from contextlib import ExitStack
 from dataclasses import dataclass
-from multiprocessing import Pool
 from pathlib import Path
 
 import MDAnalysis as mda
 import numpy as np
 import pandas as pd
 import pyarrow
-from MDAnalysis.analysis import align
+from MDAnalysis.exceptions import SelectionError
 
+from chacra.scheduling import UNIVERSE_BYTES_PER_ATOM, read_dcd_header, run_memory_aware
 from chacra.utils import get_resources
 
 import warnings
@@ -21,7 +21,98 @@ warnings.filterwarnings(
 
 
 
-def load_femto_data(hremd_data: str | os.PathLike) -> pd.DataFrame:
+def _open_femto_table(
+    hremd_data: str | os.PathLike, columns: list[str] | None = None
+) -> pyarrow.Table:
+    """
+    Memory-map a femto samples.arrow stream as a Table.
+
+    Record batches reference the mapped file, so nothing is copied or paged
+    in until a column is actually used; ``columns`` drops the others.
+    """
+    source = pyarrow.memory_map(str(hremd_data), "r")
+    with pyarrow.ipc.open_stream(source) as reader:
+        table = reader.read_all()
+    if columns is not None:
+        table = table.select(list(columns))
+    return table
+
+
+def _take_rows(table: pyarrow.Table, rows: slice | np.ndarray | None) -> pyarrow.Table:
+    if rows is None:
+        return table
+    if isinstance(rows, slice):
+        start, stop, step = rows.indices(table.num_rows)
+        if step == 1:
+            return table.slice(start, max(0, stop - start))
+        rows = np.arange(start, stop, step)
+    return table.take(np.asarray(rows, dtype=np.int64))
+
+
+def _list_column_to_numpy(column: pyarrow.ChunkedArray) -> np.ndarray:
+    """
+    Nested (fixed-size) list column to an n-dimensional array.
+
+    The lists are flattened level by level down to the primitive values,
+    which are viewed as one NumPy array and reshaped, so there is no
+    per-row Python work. Single-chunk columns without nulls are not copied.
+    """
+    if column.num_chunks == 1:
+        array = column.chunk(0)
+    else:
+        array = column.combine_chunks()
+    shape = [len(array)]
+    while pyarrow.types.is_list(array.type) or pyarrow.types.is_large_list(
+        array.type
+    ) or pyarrow.types.is_fixed_size_list(array.type):
+        if pyarrow.types.is_fixed_size_list(array.type):
+            width = array.type.list_size
+        else:
+            lengths = pyarrow.compute.list_value_length(array).to_numpy(
+                zero_copy_only=False
+            )
+            width = int(lengths[0]) if len(lengths) else 0
+            if len(lengths) and (lengths != width).any():
+                raise ValueError("Column has rows of unequal length.")
+        array = array.flatten()
+        shape.append(width)
+    return array.to_numpy(zero_copy_only=False).reshape(shape)
+
+
+def read_femto_columns(
+    hremd_data: str | os.PathLike,
+    columns: list[str],
+    rows: slice | np.ndarray | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Read selected columns of a femto samples.arrow file as NumPy arrays.
+
+    Only the requested columns and rows are materialised. List columns
+    (e.g. u_kn, replica_to_state_idx, n_accepted_swaps) become arrays of
+    shape n_rows x n_states (x n_states).
+
+    Parameters
+    ----------
+    hremd_data : str
+        Path to the femto state data output (i.e. samples.arrow file).
+    columns : list[str]
+        Names of the columns to read.
+    rows : slice | np.ndarray | None, optional
+        Rows to read, e.g. ``slice(0, None, save_interval)`` for strided
+        reads or ``slice(-1, None)`` for the final row. Default is None
+        (all rows).
+
+    Returns
+    -------
+    dict[str, np.ndarray]
+    """
+    table = _take_rows(_open_femto_table(hremd_data, columns), rows)
+    return {c: _list_column_to_numpy(table.column(c)) for c in columns}
+
+
+def load_femto_data(
+    hremd_data: str | os.PathLike, columns: list[str] | None = None
+) -> pd.DataFrame:
     """
     Load femto HREMD state data output (.arrow) file into a pandas DataFrame.
 
@@ -29,32 +120,72 @@ def load_femto_data(hremd_data: str | os.PathLike) -> pd.DataFrame:
     ----------
     hremd_data : str
         Path to the femto state data output (i.e. samples.arrow file).
+    columns : list[str] | None, optional
+        Only load these columns. Default is None (all columns).
     """
-    with pyarrow.OSFile(str(hremd_data), "rb") as file:
-        with pyarrow.RecordBatchStreamReader(file) as reader:
-            output_table = reader.read_all()
-    return output_table.to_pandas()
+    return _open_femto_table(hremd_data, columns).to_pandas()
 
 
-def get_num_states(df: pd.DataFrame) -> int:
+def get_num_states(df: pd.DataFrame | str | os.PathLike) -> int:
     """
     Get the number of thermodynamic states (same as number of replicas)
     from the femto data.
 
     Parameters
     ----------
-    df : pd.DataFrame
-        State data output from femto.
+    df : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file
+        (only the first row of replica_to_state_idx is read).
     Returns
     -------
     int
     The number of thermodynamic states in the HREMD simulation.
     """
+    if isinstance(df, (str, os.PathLike)):
+        return read_femto_columns(
+            df, ["replica_to_state_idx"], rows=slice(0, 1)
+        )["replica_to_state_idx"].shape[1]
     return df["u_kn"][0].shape[0]
 
 
+def get_replica_to_state_idx(
+    df: pd.DataFrame | str | os.PathLike, save_interval: int, traj_len: int
+) -> np.ndarray:
+    """
+    The state each replica was simulated at for every saved trajectory frame.
+
+    Parameters
+    ----------
+    df : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file
+        (only the saved rows of replica_to_state_idx are read).
+    save_interval : int
+        The number of cycles that elapse between writing coordinates.
+        femto.md.config.HREMD(trajectory_interval=save_interval)
+    traj_len : int
+        The length of an individual replica trajectory.
+
+    Returns
+    -------
+    np.ndarray of shape traj_len x n_replicas
+    Element [t, r] is the state replica r was at in frame t.
+    """
+    # have to know traj_len because there could be additional rows in the
+    # state_data between the final saved frame and the next frame that would have
+    # been saved.
+    if isinstance(df, (str, os.PathLike)):
+        return read_femto_columns(
+            df,
+            ["replica_to_state_idx"],
+            rows=slice(0, traj_len * save_interval, save_interval),
+        )["replica_to_state_idx"]
+    return np.vstack(
+        (df["replica_to_state_idx"][::save_interval]).values[:traj_len]
+    )
+
+
 def sort_replica_trajectories(
-    df: pd.DataFrame, save_interval: int, traj_len: int
+    df: pd.DataFrame | str | os.PathLike, save_interval: int, traj_len: int
 ) -> dict:
     """
     Creates a dictionary with state id keys and list of lists containing
@@ -62,8 +193,8 @@ def sort_replica_trajectories(
 
     Parameters
     ----------
-    df : pd.DataFrame
-        State data output from femto
+    df : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file
     save_interval : int
         The number of cycles that elapse between writing coordinates.
         femto.md.config.HREMD(trajectory_interval=save_interval)
@@ -73,62 +204,109 @@ def sort_replica_trajectories(
     Returns
     -------
     Dictionary
-    keys corresponding to states i to n_states. values are lists of lists where
-    list index j holds the frames from replica j corresponding to state i.
+    keys corresponding to replicas i to n_states. values are lists of arrays
+    where list index j holds the frames from replica i corresponding to
+    state j.
     """
 
-    n_states = df["u_kn"][0].shape[0]
-    replica_state_frames = {i: [] for i in range(n_states)}
-    # have to know traj_len because there could be additional rows in the
-    # state_data between the final saved frame and the next frame that would have
-    # been saved.
-    replica_to_state_idx = np.vstack(
-        (df["replica_to_state_idx"][::save_interval]).values[:traj_len]
-    )
+    replica_to_state_idx = get_replica_to_state_idx(df, save_interval, traj_len)
+    n_states = replica_to_state_idx.shape[1]
 
+    # one stable argsort per replica groups its frames by state (in time
+    # order within each state); the per-state counts give the split points
+    order = np.argsort(replica_to_state_idx, axis=0, kind="stable")
+    replica_state_frames = {}
     for replica in range(n_states):
-        for state in range(n_states):
-            frames = np.where(replica_to_state_idx[:, replica] == state)[0]
-            replica_state_frames[replica].append(frames)
+        counts = np.bincount(replica_to_state_idx[:, replica], minlength=n_states)
+        replica_state_frames[replica] = np.split(
+            order[:, replica], np.cumsum(counts)[:-1]
+        )
 
     return replica_state_frames
 
 
+# Written to ReplicaHandler's map_dir and memory-mapped by the
+# demultiplexing workers, so the frame map is never pickled into jobs.
+STATE_FRAME_MAP_FILE = "state_frame_map.npy"
+
+
+def get_state_frame_map(replica_to_state_idx: np.ndarray) -> np.ndarray:
+    """
+    Forward and inverse replica/state maps for every saved frame.
+
+    All replicas save coordinates on the same cycles, so the source of
+    frame t of a state trajectory is frame t of one replica; only the
+    replica index needs to be stored.
+
+    Parameters
+    ----------
+    replica_to_state_idx : np.ndarray
+        Array of shape traj_len x n_replicas from get_replica_to_state_idx.
+
+    Returns
+    -------
+    np.ndarray of shape 2 x traj_len x n_states
+    [0, t, r] is the state of replica r at frame t (replica_to_state_idx) and
+    [1, t, s] the replica at state s at frame t.
+    """
+    replica_to_state_idx = np.asarray(replica_to_state_idx)
+    n_states = replica_to_state_idx.shape[1]
+    dtype = np.int16 if n_states <= np.iinfo(np.int16).max else np.int32
+    # each row is a permutation, so its argsort is the inverse permutation
+    state_to_replica_idx = np.argsort(replica_to_state_idx, axis=1)
+    return np.stack((replica_to_state_idx, state_to_replica_idx)).astype(dtype)
+
+
+def save_state_frame_map(
+    replica_to_state_idx: np.ndarray, output_dir: str | os.PathLike
+) -> str:
+    """
+    Write get_state_frame_map's array to output_dir/state_frame_map.npy.
+
+    Returns
+    -------
+    str
+    Path to the written file.
+    """
+    path = Path(output_dir) / STATE_FRAME_MAP_FILE
+    tmp = path.with_suffix(".tmp.npy")
+    np.save(tmp, get_state_frame_map(replica_to_state_idx))
+    os.replace(tmp, path)
+    return str(path)
+
+
+def load_state_frame_map(path: str | os.PathLike) -> np.ndarray:
+    """Memory-map a state frame map written by save_state_frame_map."""
+    return np.load(str(path), mmap_mode="r")
+
+
 def get_traj_size(
     structure: str | os.PathLike, traj: str | os.PathLike, selection: str = None
 ) -> int:
     """
-    Get the size of the trajectory file in bytes.
+    Get the size of the trajectory coordinates in bytes.
+
+    Frame and atom counts come from the DCD header, so the trajectory is not
+    loaded; a topology-only Universe is built only to size a selection.
+
     Parameters
     ----------
     structure : str|os.PathLike
         Path to simulation topology / pdb.
     traj : str|os.PathLike
         Path to the trajectory file (i.e. r0.dcd).
+    selection : str, optional
+        Only count the atoms in this MDAnalysis selection.
     Returns
     -------
     int
-        Size of the trajectory file in bytes.
+        Size of the float32 coordinates of all frames in bytes.
     """
-    structure = str(structure)
-    traj = str(traj)
-    u = mda.Universe(structure, traj)
-    n_frames = len(u.trajectory)
+    header = read_dcd_header(traj)
+    n_atoms = header["n_atoms"]
     if selection is not None:
-        coords = u.select_atoms(selection).positions
-    else:
-        coords = u.atoms.positions
-    size = sys.getsizeof(coords)  # size of the coordinates array in bytes
-    return size * n_frames
-
-
-def determine_max_jobs(
-    mem_per_job_gb: float, available_mem_gb: float, reserve_pct: float = 0.2
-) -> int:
-
-    usable_mem = available_mem_gb * (1 - reserve_pct)
-
-    return max(1, int(usable_mem // mem_per_job_gb))
+        n_atoms = mda.Universe(str(structure)).select_atoms(selection).n_atoms
+    return header["n_frames"] * n_atoms * 3 * np.dtype(np.float32).itemsize
 
 
 @dataclass
@@ -141,9 +319,11 @@ class TrajectoryJob:
         Path to simulation topology / pdb.
     traj_dir : str
         Path to directory with the femto hremd trajectories.
-    hremd_data : dict
-        A dictionary with state id keys and list of lists containing
-        each replica's frames that correspond to the state.
+    hremd_data : str | dict | np.ndarray
+        A dictionary with replica id keys and list of lists containing
+        each replica's frames that correspond to each state, or the path
+        to a state_frame_map.npy (see save_state_frame_map), or the
+        replica_to_state_idx array.
     save_interval : int
         The number of cycles that elapse between writing coordinates.
         femto.md.config.HREMD(trajectory_interval=save_interval)
@@ -164,11 +344,13 @@ class TrajectoryJob:
     n_states : int | None, optional
         The number of thermodynamic states in the HREMD simulation. If None,
         will be determined from the hremd_data. Default is None.
+    state_indices : list[int] | None, optional
+        States written by a demultiplexing job. Default is None.
     """
 
     structure: str
     traj_dir: str
-    hremd_data: str | dict
+    hremd_data: str | dict | np.ndarray
     save_interval: int = None
     output_dir: str = None
     selection: str = "protein"
@@ -176,6 +358,7 @@ class TrajectoryJob:
     state_index: int = None
     replica_index: int = None
     n_states: int | None = None
+    state_indices: list[int] | None = None
 
 
 ################# Functions called from the ReplicaHandler class ###############
@@ -230,11 +413,149 @@ def get_state_coordinates_from_replica(
         return indices, coordinates
 
 
-def write_state_trajectory(job: TrajectoryJob):
+def align_frames(
+    frames: np.ndarray, fit_indices: np.ndarray, ref_positions: np.ndarray
+) -> np.ndarray:
+    """
+    Superimpose a batch of frames onto a reference (Kabsch), in place.
+
+    Equivalent to calling MDAnalysis.analysis.align.alignto on each frame
+    with unweighted centres, but all centroids, covariance matrices and
+    rotations are computed at once with einsum and a batched SVD.
+
+    Parameters
+    ----------
+    frames : np.ndarray
+        Array of shape n_frames x n_atoms x 3. Overwritten with the aligned
+        coordinates.
+    fit_indices : np.ndarray
+        Indices (into the atom axis) of the atoms used for the fit.
+    ref_positions : np.ndarray
+        Reference coordinates of the fit atoms, shape len(fit_indices) x 3.
+
+    Returns
+    -------
+    np.ndarray
+    frames, aligned.
+    """
+    if len(frames) == 0:
+        return frames
+    ref_positions = np.asarray(ref_positions, dtype=np.float64)
+    ref_com = ref_positions.mean(axis=0)
+    fit = frames[:, fit_indices].astype(np.float64)
+    com = fit.mean(axis=1)
+    fit -= com[:, None]
+    # rows are coordinates: find R minimising |fit @ R - ref|
+    h = np.einsum("nai,aj->nij", fit, ref_positions - ref_com)
+    u, _, vt = np.linalg.svd(h)
+    d = np.sign(np.linalg.det(u @ vt))
+    u[:, :, -1] *= d[:, None]
+    rot = u @ vt
+    frames[:] = np.einsum(
+        "nai,nij->naj", frames - com[:, None].astype(frames.dtype), rot
+    ) + ref_com
+    return frames
+
+
+# Frames held per state before alignment and writing. Memory per state is
+# buffer_frames x n_atoms x 12 bytes, independent of the trajectory length.
+DEFAULT_BUFFER_FRAMES = 128
+
+
+class StateTrajectoryWriter:
+    """
+    Buffered writer for one state trajectory.
+
+    Frames are appended in time order into a fixed float32 buffer; when it
+    fills, the whole buffer is aligned to the C-alphas of the reference with
+    align_frames and written. Use as a context manager so the last partial
+    buffer is flushed.
+
+    Parameters
+    ----------
+    path : str|os.PathLike
+        Output trajectory path (format from the extension).
+    sel : mda.AtomGroup
+        Output atoms. Its positions are overwritten on flush, so writers may
+        share one AtomGroup.
+    ref : mda.Universe
+        Reference structure for alignment.
+    selection : str
+        The MDAnalysis selection of sel; alignment uses its C-alphas.
+    buffer_frames : int, optional
+        Number of frames buffered before writing.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike,
+        sel: mda.AtomGroup,
+        ref: mda.Universe,
+        selection: str,
+        buffer_frames: int = DEFAULT_BUFFER_FRAMES,
+    ):
+        self.path = str(path)
+        self.sel = sel
+        self.ref = ref
+        self.selection = selection
+        self.n_written = 0
+        self._buffer = np.empty((max(1, buffer_frames), sel.n_atoms, 3), dtype=np.float32)
+        # resolve the fit atoms once: positions of the CAs within sel
+        fit_selection = f"({selection}) and name CA"
+        mobile_ca = sel.select_atoms(fit_selection)
+        ref_ca = ref.select_atoms(fit_selection)
+        if mobile_ca.n_atoms != ref_ca.n_atoms:
+            raise SelectionError(
+                f"Reference and trajectory atom selections do not contain the "
+                f"same number of atoms: N_ref={ref_ca.n_atoms}, "
+                f"N_traj={mobile_ca.n_atoms}"
+            )
+        self._fit_indices = np.searchsorted(sel.ix, mobile_ca.ix)
+        self._ref_positions = ref_ca.positions.astype(np.float64)
+        self._n_buffered = 0
+        self._writer = mda.Writer(self.path, n_atoms=sel.n_atoms)
+
+    def append(self, positions: np.ndarray):
+        """Add the next frame's positions of the output selection."""
+        self._buffer[self._n_buffered] = positions
+        self._n_buffered += 1
+        if self._n_buffered == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        """Align and write the buffered frames."""
+        frames = align_frames(
+            self._buffer[: self._n_buffered], self._fit_indices, self._ref_positions
+        )
+        for positions in frames:
+            self.sel.positions = positions
+            self._writer.write(self.sel.atoms)
+        self.n_written += self._n_buffered
+        self._n_buffered = 0
+
+    def close(self):
+        self.flush()
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_state_trajectory(
+    job: TrajectoryJob, buffer_frames: int = DEFAULT_BUFFER_FRAMES
+):
     """
     Separate the state trajectory for a thermodynamic state from the femto HREMD
     replica trajectories.
 
+    Frames are written in time order: frame t is read from the replica that
+    was at the state at t. Each replica is read through its own forward-only
+    cursor, so memory is bounded by buffer_frames frames rather than the
+    whole state trajectory.
+
     Parameters
     ----------
     job : TrajectoryJob
@@ -251,6 +572,8 @@ def write_state_trajectory(job: TrajectoryJob):
                             state_index=i,
                             n_states=self.n_states
                             )
+    buffer_frames : int, optional
+        Number of frames buffered before alignment and writing.
 
     Returns
     -------
@@ -261,9 +584,15 @@ def write_state_trajectory(job: TrajectoryJob):
     traj = [
         file for file in os.listdir(job.traj_dir) if (file.endswith("dcd"))
     ][0]
-    u = mda.Universe(job.structure, str(Path(job.traj_dir) / traj))
-
-    traj_len = len(u.trajectory)
+    traj_len = len(mda.Universe(job.structure, str(Path(job.traj_dir) / traj)).trajectory)
+    # source[t] is the replica holding the state at frame t
+    if isinstance(job.hremd_data, dict):
+        n_states = job.n_states if job.n_states is not None else len(job.hremd_data)
+        source = np.full(traj_len, -1, dtype=np.int64)
+        for replica in range(n_states):
+            source[job.hremd_data[replica][job.state_index]] = replica
+    else:
+        source = _frame_map(job.hremd_data)[1][:traj_len, job.state_index]
 
     if job.ref is not None:
         ref = mda.Universe(job.ref)
@@ -273,38 +602,150 @@ def write_state_trajectory(job: TrajectoryJob):
     out_u = mda.Universe(job.structure)
     sel = out_u.select_atoms(job.selection)
 
-    results = [
-        get_state_coordinates_from_replica(
-            TrajectoryJob(
-                structure=job.structure,
-                traj_dir=job.traj_dir,
-                hremd_data=job.hremd_data,
-                save_interval=job.save_interval,
-                selection=job.selection,
-                replica_index=i,
-                state_index=job.state_index,
-            )
-        )
-        for i in range(job.n_states)
+    cursors = {}
+    with StateTrajectoryWriter(
+        Path(job.output_dir) / f"state_{job.state_index}.xtc",
+        sel, ref, job.selection, buffer_frames,
+    ) as writer:
+        for frame, replica in enumerate(source):
+            if replica < 0:
+                continue
+            if replica not in cursors:
+                u = mda.Universe(
+                    job.structure, str(Path(job.traj_dir) / f"r{replica}.dcd")
+                )
+                cursors[replica] = u.select_atoms(job.selection)
+            cursors[replica].universe.trajectory[frame]
+            writer.append(cursors[replica].positions)
+
+
+def demultiplex_state_trajectories(
+    structure: str | os.PathLike,
+    traj_dir: str | os.PathLike,
+    replica_to_state_idx: np.ndarray | str | os.PathLike,
+    output_dir: str | os.PathLike,
+    selection: str = "protein",
+    ref: str | os.PathLike | None = None,
+    states: list[int] | None = None,
+    buffer_frames: int = DEFAULT_BUFFER_FRAMES,
+) -> list[str]:
+    """
+    Write state trajectories in a single pass over the replica trajectories.
+
+    All replica DCDs are opened together and advanced frame by frame.  At
+    frame t, replica r's coordinates go to the writer of state
+    ``replica_to_state_idx[t, r]``, so every state trajectory is written in
+    time order while each replica file is read once, front to back.
+
+    Parameters
+    ----------
+    structure : str|os.PathLike
+        Path to simulation topology / pdb.
+    traj_dir : str|os.PathLike
+        Path to directory with the femto hremd trajectories (r0.dcd, ...).
+    replica_to_state_idx : np.ndarray | str | os.PathLike
+        Array of shape traj_len x n_replicas from get_replica_to_state_idx,
+        or the path to a state_frame_map.npy (memory-mapped).
+    output_dir : str|os.PathLike
+        Path to the directory where the state trajectories will be written.
+    selection : str, optional
+        An MDAnalysis selection of the atoms that should be used. Default is
+        'protein'.
+    ref : str | None, optional
+        Path to reference structure. If ref is provided, coordinates are
+        aligned to C-alphas of selection. Default is None and coordinates will
+        be aligned to C-alphas of original structure.
+    states : list[int] | None, optional
+        Only write these states. Replica frames belonging to other states are
+        skipped. Default is None (all states).
+    buffer_frames : int, optional
+        Frames buffered per state before alignment and writing.
+
+    Returns
+    -------
+    list[str]
+        Paths of the written state trajectories.
+    """
+    replica_to_state_idx = _frame_map(replica_to_state_idx)[0]
+    traj_len, n_replicas = replica_to_state_idx.shape
+    if states is None:
+        states = range(n_replicas)
+    states = [int(s) for s in states]
+
+    replicas = [
+        mda.Universe(str(structure), str(Path(traj_dir) / f"r{r}.dcd"))
+        for r in range(n_replicas)
     ]
+    replica_sels = [u.select_atoms(selection) for u in replicas]
+    ref = mda.Universe(str(ref) if ref is not None else str(structure))
+    out_u = mda.Universe(str(structure))
+    sel = out_u.select_atoms(selection)
+
+    wanted = np.isin(replica_to_state_idx, states)
+    paths = {s: str(Path(output_dir) / f"state_{s}.xtc") for s in states}
+
+    with ExitStack() as stack:
+        writers = {
+            s: stack.enter_context(
+                StateTrajectoryWriter(paths[s], sel, ref, selection, buffer_frames)
+            )
+            for s in states
+        }
+        for t in range(traj_len):
+            for r in np.flatnonzero(wanted[t]):
+                # consecutive frames of a replica are read in order, so each
+                # DCD is streamed sequentially rather than seeked per state
+                replicas[r].trajectory[t]
+                writers[replica_to_state_idx[t, r]].append(replica_sels[r].positions)
+
+    return [paths[s] for s in states]
+
+
+def estimate_demux_memory(
+    n_atoms: int,
+    n_selection_atoms: int,
+    n_replicas: int,
+    n_group_states: int,
+    buffer_frames: int = DEFAULT_BUFFER_FRAMES,
+) -> int:
+    """
+    Estimated peak bytes of one demultiplex_state_trajectories job.
 
-    results = [r for r in results if r is not None]
-    indices, coords = zip(*results)
-    coordinates = np.zeros((traj_len, sel.n_atoms, 3))
-    for index_array, coord_array in zip(indices, coords):
-        if coord_array is None:
-            continue
-        else:
-            coordinates[index_array] = coord_array
+    Each job holds a Universe and a float32 timestep per replica, plus a
+    frame buffer and an equally sized alignment temporary per state it
+    writes.
+    """
+    frame = 3 * np.dtype(np.float32).itemsize
+    replicas = n_replicas * n_atoms * (UNIVERSE_BYTES_PER_ATOM + 2 * frame)
+    buffers = n_group_states * 2 * buffer_frames * n_selection_atoms * frame
+    return int(replicas + buffers)
 
-    with mda.Writer(
-        str(Path(job.output_dir) / f"state_{job.state_index}.xtc"),
-        n_atoms=sel.n_atoms,
-    ) as writer:
-        for i in range(coordinates.shape[0]):
-            sel.positions = coordinates[i]
-            align.alignto(sel, ref, select=f"({job.selection}) and name CA")
-            writer.write(sel.atoms)
+
+def _frame_map(data: np.ndarray | str | os.PathLike) -> np.ndarray:
+    """A state frame map from a .npy path or a replica_to_state_idx array."""
+    if isinstance(data, (str, os.PathLike)):
+        return load_state_frame_map(data)
+    data = np.asarray(data)
+    return data if data.ndim == 3 else get_state_frame_map(data)
+
+
+def demultiplex_worker(job: TrajectoryJob) -> list[str]:
+    """
+    Pool entry point for demultiplex_state_trajectories.
+
+    ``job.hremd_data`` holds the path to the state frame map (or the
+    replica_to_state_idx array) and ``job.state_indices`` the states this
+    worker writes.
+    """
+    return demultiplex_state_trajectories(
+        job.structure,
+        job.traj_dir,
+        job.hremd_data,
+        job.output_dir,
+        selection=job.selection,
+        ref=job.ref,
+        states=job.state_indices,
+    )
 
 
 class ReplicaHandler:
@@ -325,6 +766,19 @@ class ReplicaHandler:
     save_interval : int
         The number of cycles that elapse between writing coordinates.
         femto.md.config.HREMD(trajectory_interval=save_interval)
+    map_dir : str|os.PathLike, optional
+        Directory for state_frame_map.npy, which the trajectory writers
+        memory-map (e.g. the state trajectory directory). Default is None:
+        the map is kept in memory and sent to each writer job. The
+        simulation output directories are never written to.
+
+    Notes
+    -----
+    The handler no longer keeps the state data as a ``df`` attribute. Pass
+    the samples file to the analysis functions instead, e.g.
+    ``get_state_energies(handler.hremd_data)`` or
+    ``get_exchange_probabilities(handler.hremd_data)``, or load the columns
+    with ``load_femto_data(handler.hremd_data)``.
     """
 
     def __init__(
@@ -333,6 +787,7 @@ class ReplicaHandler:
         traj_dir: str | os.PathLike,
         hremd_data: str | os.PathLike,
         save_interval: int,
+        map_dir: str | os.PathLike | None = None,
     ):
         self.structure = str(structure)
         self.traj_dir = traj_dir
@@ -341,17 +796,22 @@ class ReplicaHandler:
         )
         self.traj_len = len(self.rep_u.trajectory)
         self.hremd_data = str(hremd_data)
-        self.df = load_femto_data(hremd_data)
-        self.n_states = get_num_states(self.df)
         self.save_interval = save_interval
-        self.state_replica_frames = sort_replica_trajectories(
-            self.df, self.save_interval, self.traj_len
+        # the saved rows of replica_to_state_idx are read once; n_states and
+        # the frame map come from them and u_kn is never loaded
+        self.replica_to_state_idx = get_replica_to_state_idx(
+            self.hremd_data, self.save_interval, self.traj_len
         )
+        self.n_states = self.replica_to_state_idx.shape[1]
+        if map_dir is None:
+            self.state_frame_map = get_state_frame_map(self.replica_to_state_idx)
+        else:
+            os.makedirs(map_dir, exist_ok=True)
+            self.state_frame_map = save_state_frame_map(
+                self.replica_to_state_idx, map_dir
+            )
         self.resources = get_resources()
-        # size in bytes of all-atom trajectory
-        self.traj_size = get_traj_size(
-            self.structure, str(Path(self.traj_dir) / "r0.dcd")
-        )
+        self.traj_header = read_dcd_header(Path(self.traj_dir) / "r0.dcd")
 
     def write_state_trajectory(
         self,
@@ -363,8 +823,8 @@ class ReplicaHandler:
     ):
         """
         Separate the state trajectory for a thermodynamic state from the femto
-        HREMD replica trajectories. Each replica is assigned to a single
-        separate process.
+        HREMD replica trajectories. Only the replica frames at the state are
+        read, and they are streamed to the output in time order.
 
         Parameters
         ----------
@@ -380,58 +840,24 @@ class ReplicaHandler:
             will be aligned to C-alphas of original structure.
         state_index : int
             Index of the state to write.
+        n_jobs : int, optional
+            Unused; a single state is streamed by one process. Kept for
+            backwards compatibility.
 
         Returns
         -------
         Writes state trajectory for state_index to output_dir.
 
         """
-
-        if ref is not None:
-            ref = mda.Universe(ref)
-        else:
-            ref = mda.Universe(self.structure)
-
-        state = state_index
-
-        out_u = mda.Universe(self.structure)
-        sel = out_u.select_atoms(selection)
-
-        coords_args_list = [
-            TrajectoryJob(
-                structure=self.structure,
-                traj_dir=self.traj_dir,
-                hremd_data=self.state_replica_frames,
-                save_interval=self.save_interval,
-                selection=selection,
-                replica_index=i,
-                state_index=state,
-            )
-            for i in range(self.n_states)
-        ]
-
-        if n_jobs is None:
-            n_jobs = self.resources["num_cores"]
-        with Pool(n_jobs) as worker_pool:
-            results = worker_pool.map(
-                get_state_coordinates_from_replica, coords_args_list
-            )
-        results = [r for r in results if r is not None]
-        indices, coords = zip(*results)
-        coordinates = np.zeros((self.traj_len, sel.n_atoms, 3))
-        for index_array, coord_array in zip(indices, coords):
-            if coord_array is None:
-                continue
-            else:
-                coordinates[index_array] = coord_array
-
-        with mda.Writer(
-            str(Path(output_dir) / f"state_{state}.xtc"), n_atoms=sel.n_atoms
-        ) as writer:
-            for i in range(coordinates.shape[0]):
-                sel.positions = coordinates[i]
-                align.alignto(sel, ref, select=f"({selection}) and name CA")
-                writer.write(sel.atoms)
+        demultiplex_state_trajectories(
+            self.structure,
+            self.traj_dir,
+            self.state_frame_map,
+            output_dir,
+            selection=selection,
+            ref=ref,
+            states=[state_index],
+        )
 
     def write_state_trajectories(
         self,
@@ -439,11 +865,26 @@ class ReplicaHandler:
         selection: str = "protein",
         ref=None,
         n_jobs=None,
+        states: list[int] | None = None,
+        n_groups: int | None = None,
+        callback=None,
     ):
         """
         Write separate trajectories for each thermodynamic state from a femto
         HREMD simulation.
 
+        The states are split into ``n_jobs`` groups and each group is written
+        by demultiplex_state_trajectories, which streams every replica
+        trajectory once for the whole group instead of re-reading every
+        replica for every state. The replica trajectories are therefore read
+        once per group, ``n_groups`` times in total. Memory per job is
+        independent of the trajectory length: a Universe and one timestep
+        per replica, plus a buffer of ``DEFAULT_BUFFER_FRAMES`` output frames
+        and an equally sized alignment temporary per state of the group
+        (StateTrajectoryWriter). Jobs are admitted by run_memory_aware
+        against the live available memory, using estimate_demux_memory,
+        which sizes exactly these.
+
         Parameters
         ----------
         output_dir : str
@@ -458,64 +899,95 @@ class ReplicaHandler:
         ref : str
             Path to reference structure. If ref is provided, coordinates are
             aligned to C-alphas of selection.
+        states : list[int], optional
+            Only write these states. Default is None (all states).
+        n_groups : int, optional
+            Number of state groups, each streaming the replica trajectories
+            once. More groups than jobs finish states in waves, so
+            downstream work can start earlier, but every extra group reads
+            all replica trajectories again. Default is n_jobs.
+        callback : Callable, optional
+            Called with the list of state indices of each group as soon as
+            that group has been written.
         """
+        states = np.arange(self.n_states) if states is None else np.asarray(states)
+        if n_jobs is None:
+            n_jobs = self.resources["num_cores"]
+        n_jobs = max(1, min(n_jobs, len(states)))
+        n_groups = max(n_jobs, min(n_groups or n_jobs, len(states)))
 
-        state_args_list = [
+        state_groups = np.array_split(states, n_groups)
+        demux_args_list = [
             TrajectoryJob(
                 structure=self.structure,
                 traj_dir=self.traj_dir,
-                hremd_data=self.state_replica_frames,
-                save_interval=self.save_interval,
+                hremd_data=self.state_frame_map,
                 output_dir=output_dir,
                 selection=selection,
                 ref=ref,
-                state_index=i,
                 n_states=self.n_states,
+                state_indices=group.tolist(),
             )
-            for i in range(self.n_states)
+            for group in state_groups
         ]
 
-        if n_jobs is None:
-            n_jobs = self.resources["num_cores"]
+        if n_jobs == 1:
+            for job in demux_args_list:
+                demultiplex_worker(job)
+                if callback is not None:
+                    callback(job.state_indices)
+            return
 
-        required_memory_gb = (
-            get_traj_size(
-                self.structure,
-                str(Path(self.traj_dir) / "r0.dcd"),
-                selection=selection,
-            )
-            / 1e9
+        n_selection_atoms = (
+            mda.Universe(self.structure).select_atoms(selection).n_atoms
         )
-
-        max_jobs = determine_max_jobs(
-            required_memory_gb,
-            self.resources["available_ram_gb"],
-            reserve_pct=0.1,
+        job_memory = [
+            estimate_demux_memory(
+                self.traj_header["n_atoms"],
+                n_selection_atoms,
+                self.n_states,
+                len(group),
+            )
+            for group in state_groups
+        ]
+        run_memory_aware(
+            demultiplex_worker,
+            demux_args_list,
+            job_memory,
+            max_workers=n_jobs,
+            callback=(
+                None if callback is None
+                else lambda i, _: callback(demux_args_list[i].state_indices)
+            ),
         )
-        # TODO: If you're memory limited, is it faster to run one state
-        # with all cores processing that one state, or to run as many cores
-        # as max jobs permits with one core per state?
-        # if n_jobs > max_jobs:
-        # # Then just use all cores for one state at a time.
-        # [self.write_state_trajectory_parallel(output_dir,
-        #                                       selection,
-        #                                       ref,
-        #                                       i)
-        #                          for i in range(self.n_states)]
-        n_jobs = min(n_jobs, max_jobs)
-        # run as many states as cores simultaneously
-
-        with Pool(n_jobs) as worker_pool:
-            worker_pool.map(write_state_trajectory, state_args_list)
 
 
 ##################### Functions to get additional data from femto state data ###
 
 
-def get_state_energies(df: pd.DataFrame) -> np.ndarray:
+def _femto_array(
+    data: pd.DataFrame | str | os.PathLike,
+    column: str,
+    rows: slice | np.ndarray | None = None,
+) -> np.ndarray:
+    """One femto column as an n-dimensional array from a path or DataFrame."""
+    if isinstance(data, (str, os.PathLike)):
+        return read_femto_columns(data, [column], rows=rows)[column]
+    series = data[column] if rows is None else data[column].iloc[rows]
+    return _list_column_to_numpy(pyarrow.chunked_array([pyarrow.array(series)]))
+
+
+def get_state_energies(
+    data: pd.DataFrame | str | os.PathLike,
+    rows: slice | np.ndarray | None = None,
+) -> np.ndarray:
     """
-    df : pd.DataFrame
-        State data output from femto.
+    data : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file
+        (only u_kn and replica_to_state_idx are read).
+    rows : slice | np.ndarray | None, optional
+        Cycles to read, e.g. ``slice(0, None, save_interval)`` for the
+        cycles with saved frames. Default is None (all cycles).
 
     Returns
     -------
@@ -523,34 +995,84 @@ def get_state_energies(df: pd.DataFrame) -> np.ndarray:
     column i corresponds to the energies sampled at state i
 
     """
-    n_states = df["u_kn"][0].shape[0]
-    energies = []
-    for row, index in zip(df["u_kn"], df["replica_to_state_idx"]):
-        # each row contains n_states arrays of size n_states
-        # the index contains the replica id in the element corresponding to the
-        # state it's being simulated at that frame.
-        # by indexing the vstacked row with [np.arange(n_states), index], you
-        # retrieve the energy of the replica being simulated at that state
-        energies.append(np.vstack(row)[np.arange(n_states), index])
-    return np.vstack(energies)
+    u_kn = _femto_array(data, "u_kn", rows=rows)
+    index = _femto_array(data, "replica_to_state_idx", rows=rows)
+    # u_kn is n_cycles x n_states x n_states. For each cycle, row i holds the
+    # energies at state i and the index contains the replica id in the element
+    # corresponding to the state it's being simulated at that frame, so one
+    # gather along the last axis retrieves the energy of the replica being
+    # simulated at each state.
+    return np.take_along_axis(u_kn, index[:, :, None].astype(np.intp), axis=2)[:, :, 0]
+
+
+def get_state_rmsd(
+    structure: str | os.PathLike,
+    trajectory: str | os.PathLike,
+    selection: str = "name CA",
+    chunk_frames: int = DEFAULT_BUFFER_FRAMES,
+) -> np.ndarray:
+    """
+    RMSD of every frame of a state trajectory from *structure*, after
+    superposition on the selected atoms.
+
+    A cheap observable for the decorrelation time of a state: only the
+    selected atoms are read, *chunk_frames* frames at a time.
+
+    Returns
+    -------
+    np.ndarray
+        float64 array (n_frames,), in Å.
+    """
+    ref = mda.Universe(structure).select_atoms(selection).positions.astype(np.float64)
+    u = mda.Universe(structure, trajectory)
+    atoms = u.select_atoms(selection)
+    fit = np.arange(atoms.n_atoms)
+    rmsd = np.empty(len(u.trajectory))
+    for start in range(0, len(u.trajectory), chunk_frames):
+        frames = np.array(
+            [atoms.positions for _ in u.trajectory[start:start + chunk_frames]],
+            dtype=np.float64,
+        )
+        align_frames(frames, fit, ref)
+        rmsd[start:start + len(frames)] = np.sqrt(((frames - ref) ** 2).sum(axis=2).mean(axis=1))
+    return rmsd
+
+
+def get_final_swap_counts(
+    data: pd.DataFrame | str | os.PathLike,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cumulative accepted and proposed swap counts after the final cycle.
+
+    Parameters
+    ----------
+    data : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file
+        (only the last row of the swap columns is read).
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray)
+        n_states x n_states accepted and proposed swap counts.
+    """
+    accepted = _femto_array(data, "n_accepted_swaps", rows=slice(-1, None))[-1]
+    proposed = _femto_array(data, "n_proposed_swaps", rows=slice(-1, None))[-1]
+    return accepted, proposed
 
 
 def get_exchange_probability(
-    df: pd.DataFrame, state_i: int, state_j: int
+    df: pd.DataFrame | str | os.PathLike, state_i: int, state_j: int
 ) -> float:
     """
-    df : pd.DataFrame
-        State data output from femto
+    df : pd.DataFrame | str
+        State data output from femto, or the path to the samples.arrow file.
 
     Returns
     -------
     float
     The probability of exchange between states i and j
     """
-    array = np.vstack(df["n_accepted_swaps"].values)
-    attempt_array = np.vstack(df["n_proposed_swaps"].values)
-    final_swap = array[-1]
-    final_attempts = attempt_array[-1]
+    final_swap, final_attempts = get_final_swap_counts(df)
 
     return final_swap[state_i][state_j] / final_attempts[state_i][state_j]
 
@@ -570,21 +1092,8 @@ def get_exchange_probabilities(data: pd.DataFrame | str) -> np.ndarray:
     -------
     np.ndarray
     """
-    if type(data) == str:
-        df = load_femto_data(data)
-    else:
-        df = data
-    array = np.vstack(df["n_accepted_swaps"].values)
-    attempt_array = np.vstack(df["n_proposed_swaps"].values)
-    n_states = array.shape[1]
-    swaps = np.vstack(array[-1])
-    attempts = np.vstack(attempt_array[-1])
-    states_i = np.array(range(n_states - 1))
-    states_j = np.array(range(1, n_states))
-    indices = [
-        i for i in zip(states_i, states_j)
-    ]  # return indices if necessary
-    return swaps[states_i, states_j] / attempts[states_i, states_j]
+    swaps, attempts = get_final_swap_counts(data)
+    return np.diagonal(swaps, offset=1) / np.diagonal(attempts, offset=1)
 
 
 def freq_frames(freq_file: str | os.PathLike) -> int:
@@ -0,0 +1,122 @@
+"""
+Tests for exact cumulative contact counts in chacra.contact_counts.
+
+getcontacts-style per-frame TSVs for two runs of three states are written
+to tmp_path; expected counts are tallied directly from the generated rows.
+"""
+
+import numpy as np
+import pytest
+
+from chacra.contact_counts import (
+    COUNTS_FILE,
+    ContactCounts,
+    cumulative_counts,
+    run_contact_files,
+)
+
+N_STATES = 3
+_RESIDUES = ["A:ALA:1", "A:GLY:5", "A:LYS:9", "B:ASP:2", "B:PHE:7"]
+
+
+def _write_run(base, run, n_frames, seed):
+    """Per-frame TSVs of one run; returns {state: {pair: frames in contact}}."""
+    rng = np.random.default_rng(seed)
+    d = base / f"run_{run}" / "contacts"
+    d.mkdir(parents=True)
+    expected = {}
+    for state in range(N_STATES):
+        lines = [
+            f"# total_frames:{n_frames} beg:0 end:{n_frames - 1} stride:1\n",
+            "# Columns: frame, interaction_type, atom_1, atom_2\n",
+        ]
+        seen = {}
+        # the last frame has no contacts, so only the header counts it
+        for frame in range(n_frames - 1):
+            for _ in range(int(rng.integers(1, 5))):
+                a, b = rng.choice(_RESIDUES, size=2, replace=False)
+                lines.append(f"{frame}\tvdw\t{a}:CA\t{b}:CB\n")
+                seen.setdefault("-".join(sorted((a, b))), set()).add(frame)
+        (d / f"cont_state_{state}.tsv").write_text("".join(lines))
+        expected[state] = {pair: len(frames) for pair, frames in seen.items()}
+    return expected
+
+
+def _dense(counts):
+    return {
+        state: {
+            name: int(c)
+            for name, c in zip(counts.pair_names, counts.counts[state].toarray()[0])
+            if c
+        }
+        for state in range(counts.n_states)
+    }
+
+
+@pytest.fixture()
+def two_runs(tmp_path):
+    expected = [_write_run(tmp_path, 1, 30, seed=1), _write_run(tmp_path, 2, 20, seed=2)]
+    return tmp_path, expected
+
+
+class TestContactCounts:
+    def test_counts_from_contact_files(self, two_runs):
+        base, expected = two_runs
+        counts = ContactCounts.from_contact_files(run_contact_files(1, N_STATES, str(base)))
+        assert _dense(counts) == expected[0]
+        np.testing.assert_array_equal(counts.n_frames, [30] * N_STATES)
+        assert counts.counts.dtype == np.int64
+
+    def test_sum_is_exact_and_frequencies_pool_frames(self, two_runs):
+        base, expected = two_runs
+        run1, run2 = (
+            ContactCounts.from_contact_files(run_contact_files(r, N_STATES, str(base)), n_jobs=2)
+            for r in (1, 2)
+        )
+        total = run1 + run2
+        for state in range(N_STATES):
+            pairs = set(expected[0][state]) | set(expected[1][state])
+            assert _dense(total)[state] == {
+                p: expected[0][state].get(p, 0) + expected[1][state].get(p, 0) for p in pairs
+            }
+        np.testing.assert_array_equal(total.n_frames, [50] * N_STATES)
+
+        freqs = total.frequencies()
+        pair = total.pair_names[0]
+        assert freqs.loc[0, pair] == pytest.approx(_dense(total)[0].get(pair, 0) / 50)
+        assert list(total.frequencies(columns=[pair, "X:YYY:0-X:YYY:1"]).columns) == [
+            pair, "X:YYY:0-X:YYY:1",
+        ]
+
+        with pytest.raises(ValueError):
+            run1 + ContactCounts.empty(N_STATES + 1)
+
+    def test_save_load_roundtrip(self, two_runs, tmp_path):
+        base, _ = two_runs
+        counts = ContactCounts.from_contact_files(run_contact_files(1, N_STATES, str(base)))
+        counts.save(tmp_path / COUNTS_FILE)
+        loaded = ContactCounts.load(tmp_path / COUNTS_FILE)
+        assert loaded.pair_names == counts.pair_names
+        assert (loaded.counts != counts.counts).nnz == 0
+        np.testing.assert_array_equal(loaded.n_frames, counts.n_frames)
+        assert loaded.digest() == counts.digest()
+        counts.n_frames[0] += 1
+        assert loaded.digest() != counts.digest()
+
+
+def test_cumulative_counts_stored_or_rebuilt(two_runs, tmp_path):
+    base, _ = two_runs
+    analysis = tmp_path / "analysis_output"
+    (analysis / "run_1").mkdir(parents=True)
+    first = cumulative_counts(1, N_STATES, str(analysis), str(base))
+    first.save(analysis / "run_1" / COUNTS_FILE)
+
+    stored = cumulative_counts(2, N_STATES, str(analysis), str(base))
+    (analysis / "run_1" / COUNTS_FILE).unlink()
+    rebuilt = cumulative_counts(2, N_STATES, str(analysis), str(base))
+    assert _dense(stored) == _dense(rebuilt)
+    assert stored.digest() == rebuilt.digest()
+    np.testing.assert_array_equal(stored.n_frames, [50] * N_STATES)
+
+    with pytest.raises(FileNotFoundError):
+        cumulative_counts(3, N_STATES, str(analysis), str(base))
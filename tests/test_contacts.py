@@ -0,0 +1,166 @@
+"""
+Tests for the native contact engine in chacra.contacts.
+
+A six-residue heavy-atom chain with one Lys–Asp salt bridge and one
+Ala–Ala hydrophobic contact is written to tmp_path as PDB + DCD; the salt
+bridge is broken in the middle frame.
+"""
+
+import MDAnalysis as mda
+import numpy as np
+import pyarrow.parquet as pq
+import pytest
+
+from chacra.contacts import (
+    candidate_residue_pairs,
+    compute_contacts,
+    contact_frequencies,
+    vmd_residue_selection,
+)
+from chacra.convergence import _parse_contact_file, _read_contact_cache
+
+SALT_BRIDGE = "A:ASP:3-A:LYS:1"
+HYDROPHOBIC = "A:ALA:4-A:ALA:6"
+
+# residue, resname, side-chain atoms; backbones are 10 Å apart along x
+_RESIDUES = [
+    (1, "LYS", [("NZ", "N", (5.0, 5.0, 0.0))]),
+    (2, "GLY", []),
+    (3, "ASP", [("OD1", "O", (5.0, 8.0, 0.0))]),
+    (4, "ALA", [("CB", "C", (40.0, 20.0, 0.0))]),
+    (5, "GLY", []),
+    (6, "ALA", [("CB", "C", (43.6, 20.0, 0.0))]),
+]
+
+
+def _write_chain(path):
+    lines, serial = [], 1
+    for resid, resname, side in _RESIDUES:
+        x = 10.0 * (resid - 1)
+        backbone = [("N", "N", (x, 0.0, 0.0)), ("CA", "C", (x + 1.4, 0.0, 0.0)),
+                    ("C", "C", (x + 2.4, 0.0, 0.0))]
+        for name, element, (ax, ay, az) in backbone + side:
+            lines.append(
+                f"ATOM  {serial:5d} {name:<4s} {resname} A{resid:4d}    "
+                f"{ax:8.3f}{ay:8.3f}{az:8.3f}  1.00  0.00          {element:>2s}"
+            )
+            serial += 1
+    lines.append("END")
+    path.write_text("\n".join(lines) + "\n")
+
+
+@pytest.fixture()
+def chain(tmp_path):
+    pdb = tmp_path / "chain.pdb"
+    _write_chain(pdb)
+    u = mda.Universe(str(pdb))
+    od1 = u.select_atoms("name OD1")[0].index
+    dcd = tmp_path / "chain.dcd"
+    with mda.Writer(str(dcd), n_atoms=u.atoms.n_atoms) as w:
+        for frame in range(3):
+            pos = mda.Universe(str(pdb)).atoms.positions
+            if frame == 1:
+                pos[od1] = (5.0, 20.0, 0.0)
+            u.atoms.positions = pos
+            w.write(u.atoms)
+    return str(pdb), str(dcd)
+
+
+def _pair_frames(path):
+    _, pair_frames = _parse_contact_file(path, "parquet", 0)
+    return {pair: list(frames) for pair, frames in pair_frames.items()}
+
+
+class TestComputeContacts:
+    def test_classifies_contacts(self, chain, tmp_path):
+        out = str(tmp_path / "contacts.parquet")
+        result = compute_contacts(*chain, out, n_jobs=1)
+        assert result["n_frames"] == 3
+
+        df = pq.read_table(out).to_pandas()
+        assert list(df.columns) == ["frame", "interaction_type", "atom1", "atom2"]
+        frame0 = df[df["frame"] == 0]
+        itypes = {}
+        for a, b, t in zip(frame0["atom1"], frame0["atom2"], frame0["interaction_type"]):
+            pair = frozenset((a.rsplit(":", 1)[0], b.rsplit(":", 1)[0]))
+            itypes.setdefault(pair, set()).add(t)
+        assert itypes[frozenset(("A:LYS:1", "A:ASP:3"))] == {"sb", "hbss", "vdw"}
+        assert itypes[frozenset(("A:ALA:4", "A:ALA:6"))] == {"hp", "vdw"}
+
+    def test_store_matches_parsed_file(self, chain, tmp_path):
+        out = str(tmp_path / "contacts.parquet")
+        compute_contacts(*chain, out, n_jobs=1)
+        assert _pair_frames(out) == {SALT_BRIDGE: [0, 2], HYDROPHOBIC: [0, 1, 2]}
+
+        frames, pair_frames = _read_contact_cache(out)
+        np.testing.assert_array_equal(frames, [0, 1, 2])
+        assert {p: list(f) for p, f in pair_frames.items()} == _pair_frames(out)
+
+    def test_workers_and_stride(self, chain, tmp_path):
+        serial = str(tmp_path / "serial.parquet")
+        parallel = str(tmp_path / "parallel.parquet")
+        compute_contacts(*chain, serial, n_jobs=1)
+        compute_contacts(*chain, parallel, n_jobs=2)
+        assert pq.read_table(serial).equals(pq.read_table(parallel))
+
+        strided = str(tmp_path / "strided.parquet")
+        assert compute_contacts(*chain, strided, n_jobs=1, stride=2)["n_frames"] == 2
+        assert _pair_frames(strided) == {SALT_BRIDGE: [0, 1], HYDROPHOBIC: [0, 1]}
+
+    def test_residue_pairs_restrict_search(self, chain, tmp_path):
+        out = str(tmp_path / "contacts.parquet")
+        compute_contacts(*chain, out, n_jobs=1, residue_pairs=np.array([[5, 3]]))
+        assert set(_pair_frames(out)) == {HYDROPHOBIC}
+
+        compute_contacts(*chain, out, n_jobs=1, residue_pairs=np.empty((0, 2), int))
+        assert _pair_frames(out) == {}
+
+
+def test_contact_frequencies(chain, tmp_path):
+    out = tmp_path / "contacts.parquet"
+    compute_contacts(*chain, out, n_jobs=1)
+    freqs = contact_frequencies(out, tmp_path / "freqs.parquet")
+    assert freqs.loc[0, SALT_BRIDGE] == pytest.approx(2 / 3)
+    assert freqs.loc[0, HYDROPHOBIC] == 1.0
+    assert (tmp_path / "freqs.parquet").exists()
+
+
+class TestPrefilter:
+    def test_candidates_cover_contacts(self, chain, tmp_path):
+        pdb, dcd = chain
+        pairs = candidate_residue_pairs(pdb, [dcd, dcd], cutoff=5.0, stride=2, n_jobs=2)
+        # Lys–Asp (residues 0, 2) and Ala–Ala (3, 5); backbones are 10 Å apart
+        np.testing.assert_array_equal(pairs, [[0, 2], [3, 5]])
+
+        full = str(tmp_path / "full.parquet")
+        pruned = str(tmp_path / "pruned.parquet")
+        compute_contacts(pdb, dcd, full, n_jobs=1)
+        compute_contacts(pdb, dcd, pruned, n_jobs=1, residue_pairs=pairs)
+        assert pq.read_table(full).equals(pq.read_table(pruned))
+
+    def test_generous_cutoff_keeps_neighbours(self, chain):
+        pdb, dcd = chain
+        pairs = candidate_residue_pairs(pdb, [dcd], cutoff=12.0, n_jobs=1)
+        assert {(0, 1), (0, 2), (3, 5)} <= {tuple(p) for p in pairs}
+
+    def test_vmd_selection(self, chain):
+        pdb, _ = chain
+        assert vmd_residue_selection(np.array([[0, 2], [3, 5], [1, 3]]), pdb) == (
+            "residue 0 to 3 5"
+        )
+        assert vmd_residue_selection(np.empty((0, 2), int), pdb) == "none"
+        with pytest.raises(ValueError):
+            vmd_residue_selection(np.array([[0, 6]]), pdb)
+
+    def test_vmd_selection_skips_non_protein(self, tmp_path):
+        pdb = tmp_path / "solvated.pdb"
+        _write_chain(pdb)
+        water = (
+            "HETATM    1  O   HOH W   1      50.000  50.000  50.000  1.00  0.00"
+            "           O"
+        )
+        pdb.write_text(water + "\n" + pdb.read_text())
+        # residue 0 of the structure is the water
+        assert vmd_residue_selection(np.array([[0, 2]]), pdb) == (
+            "residue 1 3"
+        )
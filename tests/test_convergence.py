@@ -0,0 +1,575 @@
+"""
+Tests for convergence diagnostics in chacra.convergence.
+
+Per-frame contact files are synthesised in getcontacts' dynamic-contacts
+TSV layout inside tmp_path — no simulation data required.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.decomposition import PCA
+
+from chacra import convergence
+from chacra.convergence import (
+    _load_state_contacts,
+    _load_tsv_contacts,
+    contact_matrix_correlation,
+    convergence_curve,
+    cross_run_contact_correlation,
+    cross_run_rmsip,
+    load_pca_artefacts,
+    rmsip,
+    save_pca_artefacts,
+    split_half_rmsip,
+)
+
+
+# ------------------------------------------------------------------ #
+# Helpers                                                              #
+# ------------------------------------------------------------------ #
+
+_ATOMS = [
+    "A:ARG:76:NH2", "A:GLU:80:OE1", "A:LYS:12:NZ", "B:ASP:40:OD1",
+    "B:GLY:3:N", "A:ALA:9:O", "B:SER:55:OG", "A:THR:101:OG1",
+]
+
+
+def _write_dynamic_tsv(
+    path, n_frames: int = 60, seed: int = 0, min_contacts: int = 0,
+) -> None:
+    """Write a getcontacts-style per-frame contact TSV with awkward rows."""
+    rng = np.random.default_rng(seed)
+    lines = [
+        f"# total_frames:{n_frames} beg:0 end:{n_frames - 1} stride:1\n",
+        "# Columns: frame, interaction_type, atom_1, atom_2[, atom_3[, atom_4]]\n",
+    ]
+    for frame in range(n_frames):
+        for _ in range(int(rng.integers(min_contacts, 8))):
+            a, b = rng.choice(_ATOMS, size=2, replace=False)
+            itype = rng.choice(["sb", "hbbb", "vdw"])
+            lines.append(f"{frame}\t{itype}\t{a}\t{b}\t3.1\n")
+        if frame % 7 == 0:
+            # Water bridge rows carry extra atom columns
+            lines.append(f"{frame}\twb\t{_ATOMS[0]}\t{_ATOMS[3]}\tW:HOH:900:O\n")
+    path.write_text("".join(lines))
+
+
+def _reference_parse(path, frame_offset: int = 0):
+    """Line-by-line reference parser (the original implementation)."""
+    pairs: dict[str, set[int]] = {}
+    frames = set()
+    for line in open(path):
+        if line.startswith("#"):
+            continue
+        parts = line.rstrip().split("\t")
+        if len(parts) < 4:
+            continue
+        frame = int(parts[0]) + frame_offset
+        frames.add(frame)
+        r1 = ":".join(parts[2].split(":")[:3])
+        r2 = ":".join(parts[3].split(":")[:3])
+        if r2 < r1:
+            r1, r2 = r2, r1
+        pairs.setdefault(f"{r1}-{r2}", set()).add(frame)
+    return sorted(frames), {k: sorted(v) for k, v in pairs.items()}
+
+
+# ------------------------------------------------------------------ #
+# TSV loading                                                          #
+# ------------------------------------------------------------------ #
+
+
+class TestLoadTsvContacts:
+    def test_matches_reference_parser(self, tmp_path):
+        tsv = tmp_path / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv)
+        frames, pair_frames = _load_tsv_contacts(str(tsv), frame_offset=0)
+        ref_frames, ref_pairs = _reference_parse(tsv)
+
+        assert frames.tolist() == ref_frames
+        assert set(pair_frames) == set(ref_pairs)
+        for pair, arr in pair_frames.items():
+            assert arr.dtype == np.int32
+            assert arr.tolist() == ref_pairs[pair]
+
+    def test_frame_offset_applied(self, tmp_path):
+        tsv = tmp_path / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv)
+        frames, pair_frames = _load_tsv_contacts(str(tsv), frame_offset=1000)
+        ref_frames, ref_pairs = _reference_parse(tsv, frame_offset=1000)
+        assert frames.tolist() == ref_frames
+        assert {k: v.tolist() for k, v in pair_frames.items()} == ref_pairs
+
+    def test_dedup_across_chunk_boundary(self, tmp_path, monkeypatch):
+        """Tiny blocks split frames across chunks; duplicates must still collapse."""
+        monkeypatch.setattr(convergence, "_TSV_BLOCK_SIZE", 256)
+        tsv = tmp_path / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv, n_frames=120, seed=3)
+        _, pair_frames = _load_tsv_contacts(str(tsv), frame_offset=0)
+        _, ref_pairs = _reference_parse(tsv)
+        assert {k: v.tolist() for k, v in pair_frames.items()} == ref_pairs
+
+    def test_comment_only_file(self, tmp_path):
+        tsv = tmp_path / "cont_state_0.tsv"
+        tsv.write_text("# total_frames:0\n# Columns: frame\n")
+        frames, pair_frames = _load_tsv_contacts(str(tsv), frame_offset=0)
+        assert len(frames) == 0
+        assert pair_frames == {}
+
+
+class TestLoadStateContacts:
+    def test_runs_combined_with_offsets(self, tmp_path):
+        for run in (1, 2):
+            d = tmp_path / f"run_{run}" / "contacts"
+            d.mkdir(parents=True)
+            _write_dynamic_tsv(d / "cont_state_0.tsv", n_frames=40, seed=run)
+
+        sc = _load_state_contacts(0, contact_base=str(tmp_path))
+        # every recorded frame, contact-free ones included; run 2 starts
+        # after run 1's 40 recorded frames
+        assert sc.frames.tolist() == list(range(80))
+        _, first = _reference_parse(tmp_path / "run_1" / "contacts" / "cont_state_0.tsv")
+        _, second = _reference_parse(
+            tmp_path / "run_2" / "contacts" / "cont_state_0.tsv", frame_offset=40,
+        )
+        for pair, arr in sc.pair_frames.items():
+            assert arr.tolist() == first.get(pair, []) + second.get(pair, [])
+
+    def test_missing_files_raise(self, tmp_path):
+        with pytest.raises(FileNotFoundError):
+            _load_state_contacts(0, contact_base=str(tmp_path))
+
+
+class TestContactCache:
+    def _setup(self, tmp_path):
+        d = tmp_path / "run_1" / "contacts"
+        d.mkdir(parents=True)
+        tsv = d / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv)
+        return tsv
+
+    def test_cache_written_beside_contacts(self, tmp_path):
+        tsv = self._setup(tmp_path)
+        _load_state_contacts(0, contact_base=str(tmp_path))
+        assert (tsv.parent / ".cache" / "cont_state_0.tsv.npz").exists()
+
+    def test_cached_load_skips_parsing(self, tmp_path, monkeypatch):
+        self._setup(tmp_path)
+        first = _load_state_contacts(0, contact_base=str(tmp_path))
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("contact file re-parsed despite valid cache")
+
+        monkeypatch.setattr(convergence, "_load_tsv_contacts", _fail)
+        second = _load_state_contacts(0, contact_base=str(tmp_path))
+        assert second.frames.tolist() == first.frames.tolist()
+        assert {k: v.tolist() for k, v in second.pair_frames.items()} == {
+            k: v.tolist() for k, v in first.pair_frames.items()
+        }
+
+    def test_changed_file_invalidates_cache(self, tmp_path):
+        tsv = self._setup(tmp_path)
+        _load_state_contacts(0, contact_base=str(tmp_path))
+        _write_dynamic_tsv(tsv, n_frames=90, seed=11)
+        sc = _load_state_contacts(0, contact_base=str(tmp_path))
+        _, ref_pairs = _reference_parse(tsv)
+        assert sc.frames.tolist() == list(range(90))
+        assert {k: v.tolist() for k, v in sc.pair_frames.items()} == ref_pairs
+
+    def test_offset_applied_to_cached_runs(self, tmp_path):
+        for run in (1, 2):
+            d = tmp_path / f"run_{run}" / "contacts"
+            d.mkdir(parents=True)
+            _write_dynamic_tsv(d / "cont_state_0.tsv", n_frames=40, seed=run)
+        fresh = _load_state_contacts(0, contact_base=str(tmp_path), use_cache=False)
+        _load_state_contacts(0, contact_base=str(tmp_path))
+        cached = _load_state_contacts(0, contact_base=str(tmp_path))
+        assert cached.frames.tolist() == fresh.frames.tolist()
+        assert {k: v.tolist() for k, v in cached.pair_frames.items()} == {
+            k: v.tolist() for k, v in fresh.pair_frames.items()
+        }
+
+
+class TestLoadParquetContacts:
+    def test_matches_tsv_loader(self, tmp_path):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from chacra.convergence import _load_parquet_contacts
+
+        tsv = tmp_path / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv)
+        rows = [
+            line.rstrip().split("\t") for line in open(tsv)
+            if not line.startswith("#")
+        ]
+        parquet = tmp_path / "cont_state_0.parquet"
+        pq.write_table(pa.table({
+            "frame": [int(r[0]) for r in rows],
+            "atom1": [r[2] for r in rows],
+            "atom2": [r[3] for r in rows],
+        }), parquet)
+
+        frames_p, pairs_p = _load_parquet_contacts(str(parquet), 5)
+        frames_t, pairs_t = _load_tsv_contacts(str(tsv), 5)
+        assert frames_p.tolist() == frames_t.tolist()
+        assert {k: v.tolist() for k, v in pairs_p.items()} == {
+            k: v.tolist() for k, v in pairs_t.items()
+        }
+
+
+# ------------------------------------------------------------------ #
+# Convergence curve                                                    #
+# ------------------------------------------------------------------ #
+
+
+@pytest.fixture()
+def multi_state_contacts(tmp_path):
+    """Six states, two runs each, every frame carrying at least one contact."""
+    for run in (1, 2):
+        d = tmp_path / f"run_{run}" / "contacts"
+        d.mkdir(parents=True)
+        for state in range(6):
+            _write_dynamic_tsv(
+                d / f"cont_state_{state}.tsv", n_frames=40,
+                seed=100 * run + state, min_contacts=1,
+            )
+    return tmp_path
+
+
+class TestConvergenceCurve:
+    def test_tidy_columns_and_rows(self, multi_state_contacts):
+        curve = convergence_curve(
+            6, k=2, n_checkpoints=4, n_folds=3,
+            contact_base=str(multi_state_contacts),
+        )
+        assert list(curve.columns) == [
+            "mode", "checkpoint", "fraction", "frames_per_state",
+            "rmsip", "correlation",
+        ]
+        assert (curve["mode"] == "split_half").sum() == 4
+        assert (curve["mode"] == "vs_final").sum() == 4
+        assert (curve["mode"] == "kfold").sum() == 3
+
+    def test_final_checkpoint_matches_split_half(self, multi_state_contacts):
+        curve = convergence_curve(
+            6, k=2, n_checkpoints=5, n_folds=2,
+            contact_base=str(multi_state_contacts),
+        )
+        last = curve[curve["mode"] == "split_half"].iloc[-1]
+        expected = split_half_rmsip(6, k=2, contact_base=str(multi_state_contacts))
+        assert last["fraction"] == pytest.approx(1.0)
+        assert last["rmsip"] == pytest.approx(expected)
+
+    def test_vs_final_is_identity_at_end(self, multi_state_contacts):
+        curve = convergence_curve(
+            6, k=2, n_checkpoints=3, n_folds=3,
+            contact_base=str(multi_state_contacts),
+        )
+        last = curve[curve["mode"] == "vs_final"].iloc[-1]
+        assert last["rmsip"] == pytest.approx(1.0)
+        assert last["correlation"] == pytest.approx(1.0)
+        assert last["frames_per_state"] == 80
+
+
+# ------------------------------------------------------------------ #
+# Streaming split-half                                                 #
+# ------------------------------------------------------------------ #
+
+
+class TestBlockCounts:
+    def test_frames_without_contacts_count(self, tmp_path):
+        from chacra.convergence import _state_block_counts
+
+        d = tmp_path / "run_1" / "contacts"
+        d.mkdir(parents=True)
+        tsv = d / "cont_state_0.tsv"
+        # min_contacts=0: some frames carry no contact; ten more trail
+        _write_dynamic_tsv(tsv, n_frames=30, seed=5)
+        lines = tsv.read_text().splitlines(keepends=True)
+        tsv.write_text("".join(["# total_frames:40 beg:0 end:39 stride:1\n"] + lines[1:]))
+
+        sc = _load_state_contacts(0, contact_base=str(tmp_path))
+        assert len(sc.frames) == 40
+        bc = _state_block_counts(sc, 2)
+        assert bc.block_frames.tolist() == [20, 20]
+        _, ref_pairs = _reference_parse(tsv)
+        expected = {
+            pair: [sum(f < 20 for f in frames), sum(f >= 20 for f in frames)]
+            for pair, frames in ref_pairs.items()
+        }
+        assert dict(zip(bc.pairs, bc.counts.T.tolist())) == expected
+
+
+class TestStreamingSplitHalf:
+    def test_block_counts_match_loaded(self, multi_state_contacts, monkeypatch):
+        from chacra.convergence import _state_block_counts, _stream_state_block_counts
+
+        monkeypatch.setattr(convergence, "_TSV_BLOCK_SIZE", 512)
+        base = str(multi_state_contacts)
+        streamed = _stream_state_block_counts(2, 4, contact_base=base)
+        loaded = _state_block_counts(
+            _load_state_contacts(2, contact_base=base, use_cache=False), 4,
+        )
+        assert streamed.block_frames.tolist() == loaded.block_frames.tolist()
+        streamed_cols = dict(zip(streamed.pairs, streamed.counts.T.tolist()))
+        loaded_cols = dict(zip(loaded.pairs, loaded.counts.T.tolist()))
+        assert streamed_cols == loaded_cols
+
+    def test_reads_valid_contact_cache(self, multi_state_contacts, monkeypatch):
+        from chacra.convergence import _stream_state_block_counts
+
+        base = str(multi_state_contacts)
+        raw = _stream_state_block_counts(2, 4, contact_base=base, use_cache=False)
+        _load_state_contacts(2, contact_base=base)  # writes the .cache/ parses
+
+        def no_parse(*args):
+            raise AssertionError("raw contact file re-parsed")
+
+        monkeypatch.setattr(convergence, "_iter_contact_chunks", no_parse)
+        # 16 entries per chunk: pairs are split across cached chunks
+        monkeypatch.setattr(convergence, "_TSV_BLOCK_SIZE", 64)
+        cached = _stream_state_block_counts(2, 4, contact_base=base)
+        assert cached.block_frames.tolist() == raw.block_frames.tolist()
+        assert dict(zip(cached.pairs, cached.counts.T.tolist())) == dict(
+            zip(raw.pairs, raw.counts.T.tolist())
+        )
+
+    def test_frames_without_contacts_count(self, tmp_path):
+        from chacra.convergence import _stream_state_block_counts
+
+        d = tmp_path / "run_1" / "contacts"
+        d.mkdir(parents=True)
+        tsv = d / "cont_state_0.tsv"
+        _write_dynamic_tsv(tsv, n_frames=30, min_contacts=1)
+        # ten trailing frames without contacts
+        lines = tsv.read_text().splitlines(keepends=True)
+        tsv.write_text("".join(["# total_frames:40 beg:0 end:39 stride:1\n"] + lines[1:]))
+
+        bc = _stream_state_block_counts(0, 2, contact_base=str(tmp_path))
+        assert bc.block_frames.tolist() == [20, 20]
+        _, ref_pairs = _reference_parse(tsv)
+        expected = {
+            pair: [sum(f < 20 for f in frames), sum(f >= 20 for f in frames)]
+            for pair, frames in ref_pairs.items()
+        }
+        assert dict(zip(bc.pairs, bc.counts.T.tolist())) == expected
+
+    def test_paths_agree_with_contact_free_frames(self, tmp_path):
+        for run in (1, 2):
+            d = tmp_path / f"run_{run}" / "contacts"
+            d.mkdir(parents=True)
+            for state in range(6):
+                tsv = d / f"cont_state_{state}.tsv"
+                # min_contacts=0 leaves empty frames; the header adds 5 more
+                _write_dynamic_tsv(tsv, n_frames=35, seed=10 * run + state)
+                lines = tsv.read_text().splitlines(keepends=True)
+                tsv.write_text(
+                    "".join(["# total_frames:40 beg:0 end:39 stride:1\n"] + lines[1:])
+                )
+        base = str(tmp_path)
+        in_memory = split_half_rmsip(6, k=2, contact_base=base)
+        streamed = split_half_rmsip(6, k=2, contact_base=base, streaming=True)
+        assert streamed == pytest.approx(in_memory)
+
+    def test_streaming_matches_in_memory(self, multi_state_contacts):
+        base = str(multi_state_contacts)
+        expected = split_half_rmsip(6, k=2, contact_base=base)
+        streamed = split_half_rmsip(6, k=2, contact_base=base, streaming=True)
+        assert streamed == pytest.approx(expected)
+
+
+# ------------------------------------------------------------------ #
+# Cross-run metrics from PCA artefacts                                 #
+# ------------------------------------------------------------------ #
+
+
+@pytest.fixture()
+def two_run_analysis(tmp_path, synthetic_df):
+    """Cumulative matrices for runs 1 and 2 with partially shared contacts."""
+    rng = np.random.default_rng(7)
+    run1 = synthetic_df.iloc[:, :30]
+    run2 = synthetic_df.iloc[:, 5:] + rng.normal(0, 0.05, (20, 35))
+    for run, df in ((1, run1), (2, run2)):
+        d = tmp_path / f"run_{run}"
+        d.mkdir()
+        df.to_parquet(d / "total_contacts.parquet")
+        save_pca_artefacts(PCA().fit(df), df.columns, d)
+    return tmp_path, run1, run2
+
+
+class TestPcaArtefacts:
+    def test_round_trip(self, tmp_path, synthetic_df):
+        pca = PCA().fit(synthetic_df)
+        save_pca_artefacts(pca, synthetic_df.columns, tmp_path / "run_1")
+        art = load_pca_artefacts(1, str(tmp_path))
+        assert art["columns"].tolist() == list(synthetic_df.columns)
+        assert art["components"].shape == (10, synthetic_df.shape[1])
+        np.testing.assert_allclose(art["mean"], synthetic_df.mean(axis=0).values)
+
+    def test_cross_run_rmsip_matches_union_refit(self, two_run_analysis):
+        base, run1, run2 = two_run_analysis
+        all_cols = run1.columns.union(run2.columns)
+        a = PCA().fit(run1.reindex(columns=all_cols, fill_value=0.0)).components_.T
+        b = PCA().fit(run2.reindex(columns=all_cols, fill_value=0.0)).components_.T
+        expected = rmsip(a, b, 3)
+        assert cross_run_rmsip(2, k=3, analysis_dir=str(base)) == pytest.approx(
+            expected, abs=1e-5,
+        )
+
+    def test_cross_run_correlation_matches_frames(self, two_run_analysis):
+        base, run1, run2 = two_run_analysis
+        expected = contact_matrix_correlation(run1, run2)
+        assert cross_run_contact_correlation(2, analysis_dir=str(base)) == pytest.approx(
+            expected,
+        )
+
+    def test_missing_artefact_fitted_from_parquet(self, two_run_analysis):
+        base, _, _ = two_run_analysis
+        (base / "run_1" / "pca_model.npz").unlink()
+        assert cross_run_rmsip(2, k=3, analysis_dir=str(base)) is not None
+        assert (base / "run_1" / "pca_model.npz").exists()
+
+    def test_cross_run_does_not_read_parquet(self, two_run_analysis, monkeypatch):
+        base, _, _ = two_run_analysis
+
+        def _fail(*args, **kwargs):
+            raise AssertionError("total_contacts.parquet re-read")
+
+        monkeypatch.setattr(pd, "read_parquet", _fail)
+        assert cross_run_rmsip(2, k=3, analysis_dir=str(base)) is not None
+        assert cross_run_contact_correlation(2, analysis_dir=str(base)) is not None
+
+
+# ------------------------------------------------------------------ #
+# Autocorrelation / effective sample size                              #
+# ------------------------------------------------------------------ #
+
+
+def _two_state_markov(n: int, stay: float, n_series: int, seed: int) -> np.ndarray:
+    """Binary series that keep their value with probability *stay* per step."""
+    rng = np.random.default_rng(seed)
+    flips = rng.random((n, n_series)) > stay
+    return (np.cumsum(flips, axis=0) % 2).astype(np.float32)
+
+
+class TestStatisticalInefficiency:
+    def test_uncorrelated_series_near_one(self):
+        from chacra.convergence import statistical_inefficiency
+
+        g = statistical_inefficiency(_two_state_markov(20000, 0.5, 4, seed=0))
+        assert np.all(g < 1.2)
+
+    def test_markov_chain_matches_theory(self):
+        from chacra.convergence import statistical_inefficiency
+
+        # C(t) = (2p - 1)^t  →  g = (1 + rho) / (1 - rho) = 9 for p = 0.9
+        g = statistical_inefficiency(_two_state_markov(50000, 0.9, 8, seed=1))
+        assert np.median(g) == pytest.approx(9.0, rel=0.2)
+
+    @pytest.mark.parametrize("phi", [0.8, -0.5])
+    def test_ar1_matches_direct_sum(self, phi):
+        from chacra.convergence import statistical_inefficiency
+
+        rng = np.random.default_rng(4)
+        x = np.zeros(3000)
+        for t in range(1, len(x)):
+            x[t] = phi * x[t - 1] + rng.normal()
+
+        # pymbar's statisticalInefficiency loop, written out
+        n, dx = len(x), x - x.mean()
+        sigma2 = (dx * dx).mean()
+        expected, t = 1.0, 1
+        while t < n - 1:
+            c = (dx[: n - t] * dx[t:]).sum() / ((n - t) * sigma2)
+            if c <= 0 and t > 3:
+                break
+            expected += 2.0 * c * (1.0 - t / n)
+            t += 1
+        expected = max(expected, 1.0)
+
+        g = statistical_inefficiency(x[:, None])
+        assert g[0] == pytest.approx(expected, rel=1e-9)
+        if phi > 0:
+            # (1 + phi) / (1 - phi) = 9
+            assert g[0] == pytest.approx(9.0, rel=0.3)
+
+    def test_constant_series_is_nan(self):
+        from chacra.convergence import statistical_inefficiency
+
+        series = np.ones((100, 2), dtype=np.float32)
+        series[::2, 1] = 0
+        g = statistical_inefficiency(series)
+        assert np.isnan(g[0])
+        assert g[1] == pytest.approx(1.0)
+
+
+    def test_decorrelation_stride(self):
+        from chacra.convergence import decorrelation_stride
+
+        g, stride = decorrelation_stride(_two_state_markov(50000, 0.9, 1, seed=2)[:, 0])
+        assert stride == int(np.ceil(g)) and 7 <= stride <= 11
+        assert decorrelation_stride(np.ones(50)) == (pytest.approx(np.nan, nan_ok=True), 1)
+
+
+class TestEffectiveSampleSize:
+    def test_shapes_and_stride(self, multi_state_contacts):
+        from chacra.convergence import effective_sample_size, recommended_stride
+
+        per_state, per_contact = effective_sample_size(
+            6, contact_base=str(multi_state_contacts),
+        )
+        assert list(per_state.index) == list(range(6))
+        assert (per_state["n_frames"] == 80).all()
+        assert per_contact.shape[0] == 6
+        finite = per_contact.values[np.isfinite(per_contact.values)]
+        assert (finite <= 80 + 1e-9).all()
+        assert recommended_stride(per_state) >= 1
+
+
+class TestBlockBootstrap:
+    def test_moving_block_counts(self, multi_state_contacts):
+        blocks = convergence._bootstrap_block_worker(
+            (0, str(multi_state_contacts), None, True, 8)
+        )
+        sc = _load_state_contacts(0, str(multi_state_contacts))
+        # 80 frames: a block of 8 frames starts at every frame
+        assert len(blocks.block_frames) == 73 and blocks.n_draws == 10
+        assert (blocks.block_frames == 8).all()
+        for start in (0, 5, 72):
+            window = sc.frames[start:start + 8]
+            expected = [np.isin(sc.pair_frames[p], window).sum() for p in blocks.pairs]
+            assert blocks.counts[start].tolist() == expected
+
+    def test_moving_blocks_over_units(self, multi_state_contacts, monkeypatch):
+        monkeypatch.setattr(convergence, "_MAX_BOOTSTRAP_UNITS", 20)
+        blocks = convergence._bootstrap_block_worker(
+            (0, str(multi_state_contacts), None, True, 8)
+        )
+        sc = _load_state_contacts(0, str(multi_state_contacts))
+        # 20 units of 4 frames; blocks of 2 units overlap by one unit
+        assert len(blocks.block_frames) == 19 and blocks.n_draws == 10
+        window = sc.frames[4:12]
+        expected = [np.isin(sc.pair_frames[p], window).sum() for p in blocks.pairs]
+        assert blocks.counts[1].tolist() == expected
+
+    def test_rank_frequencies(self, multi_state_contacts):
+        from chacra.convergence import bootstrap_loadings
+
+        result = bootstrap_loadings(
+            6, k=2, n_top=3, n_bootstrap=10,
+            contact_base=str(multi_state_contacts), method="block",
+        )
+        sc = _load_state_contacts(0, str(multi_state_contacts))
+        assert list(result.columns) == ["PC1_rank_freq", "PC2_rank_freq"]
+        assert set(result.index) >= set(sc.pair_frames)
+        assert ((result.values >= 0) & (result.values <= 1)).all()
+        assert np.allclose(result.sum(axis=0), 3)
+
+    def test_rejects_unknown_method(self, multi_state_contacts):
+        from chacra.convergence import bootstrap_loadings
+
+        with pytest.raises(ValueError):
+            bootstrap_loadings(
+                6, contact_base=str(multi_state_contacts), method="moving",
+            )
@@ -0,0 +1,97 @@
+"""
+Tests for replica-exchange mixing diagnostics in chacra.trajectories.mixing.
+
+replica_to_state_idx histories are built directly as arrays — no femto
+output required.
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from chacra.trajectories.mixing import (
+    flow_fraction,
+    mixing_summary,
+    replica_mixing,
+    round_trip_times,
+    spectral_gap,
+    state_transition_matrix,
+    time_to_first_traversal,
+)
+
+
+def _cyclic_history(n_states=3, n_cycles=12):
+    """Replica r is at state (r + t) % n_states on cycle t."""
+    t = np.arange(n_cycles)[:, None]
+    return (np.arange(n_states)[None, :] + t) % n_states
+
+
+def _neighbour_swap_history(n_states=6, n_cycles=5000, p=0.5, seed=0):
+    rng = np.random.default_rng(seed)
+    perm = np.arange(n_states)
+    rows = []
+    for t in range(n_cycles):
+        for i in range(t % 2, n_states - 1, 2):
+            if rng.random() < p:
+                a, b = np.flatnonzero(perm == i)[0], np.flatnonzero(perm == i + 1)[0]
+                perm[a], perm[b] = perm[b], perm[a]
+        rows.append(perm.copy())
+    return np.array(rows)
+
+
+class TestTransitionMatrix:
+    def test_cyclic_is_permutation(self):
+        T = state_transition_matrix(_cyclic_history())
+        np.testing.assert_array_equal(T, np.roll(np.eye(3), 1, axis=1))
+        assert spectral_gap(T) == pytest.approx(0.0, abs=1e-12)
+
+    def test_rows_stochastic_and_gap(self):
+        history = _neighbour_swap_history()
+        T = state_transition_matrix(history)
+        np.testing.assert_allclose(T.sum(axis=1), 1.0)
+        # only nearest-neighbour moves
+        assert np.allclose(np.triu(T, 2), 0) and np.allclose(np.tril(T, -2), 0)
+        assert 0 < spectral_gap(T) < 1
+
+
+class TestRoundTrips:
+    def test_cyclic_round_trips(self):
+        trips = round_trip_times(_cyclic_history(n_states=3, n_cycles=12))
+        # replica 0 arrives at state 0 on cycles 0, 3, 6, 9
+        np.testing.assert_array_equal(trips[0], [3, 3, 3])
+        assert all((t == 3).all() for t in trips)
+
+    def test_no_round_trip_without_top(self):
+        history = np.array([[0, 1, 2], [1, 0, 2], [0, 1, 2], [1, 0, 2]])
+        trips = round_trip_times(history)
+        assert all(len(t) == 0 for t in trips)
+
+
+class TestFlowAndTraversal:
+    def test_cyclic_flow(self):
+        flow = flow_fraction(_cyclic_history())
+        np.testing.assert_array_equal(flow, [1.0, 1.0, 0.0])
+
+    def test_flow_decreases_along_ladder(self):
+        flow = flow_fraction(_neighbour_swap_history())
+        assert flow[0] == 1.0 and flow[-1] == 0.0
+        assert (np.diff(flow) <= 0.05).all()
+
+    def test_first_traversal(self):
+        first = time_to_first_traversal(_cyclic_history())
+        np.testing.assert_array_equal(first, [2, 2, 1])
+        stuck = np.array([[0, 1, 2], [1, 0, 2]])
+        first = time_to_first_traversal(stuck)
+        assert np.isnan(first).all()
+
+
+class TestSummary:
+    def test_json_serialisable(self):
+        summary = mixing_summary(replica_mixing(_neighbour_swap_history()))
+        json.dumps(summary)
+        assert summary["n_cycles"] == 5000
+        assert summary["n_round_trips"] == sum(summary["round_trips_per_replica"])
+        assert summary["n_round_trips"] > 0
+        assert len(summary["neighbor_transition_probs"]) == 5
+        assert summary["replicas_traversed"] == 6
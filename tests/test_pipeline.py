@@ -0,0 +1,276 @@
+"""
+Tests for the fingerprinted stage DAG in chacra.pipeline.
+
+A two-stage toy pipeline (copy input → per-state "contacts", then a summary
+over all of them) runs inside tmp_path; runners count their invocations.
+"""
+
+import os
+import threading
+
+import pytest
+
+from chacra.pipeline import Node, Pipeline, ResultCache, Stage, file_fingerprint
+
+N_STATES = 3
+
+
+class _Toy:
+    def __init__(self, root, fail=()):
+        self.root = root
+        self.fail = set(fail)
+        self.calls = {"contacts": [], "summary": 0}
+        for i in range(N_STATES):
+            self.src(i).write_text(f"state {i}\n")
+
+    def src(self, i):
+        return self.root / f"src_{i}.txt"
+
+    def out(self, i):
+        return self.root / f"out_{i}.txt"
+
+    @property
+    def summary(self):
+        return self.root / "summary.txt"
+
+    def run_contacts(self, keys, done):
+        self.calls["contacts"].extend(keys)
+        for i in keys:
+            if i in self.fail:
+                continue
+            self.out(i).write_text(self.src(i).read_text().upper())
+            done(i)
+
+    def run_summary(self, keys, done):
+        self.calls["summary"] += 1
+        self.summary.write_text(
+            "".join(self.out(i).read_text() for i in range(N_STATES))
+        )
+        done(None)
+
+    def pipeline(self, content_hash=False, params=None):
+        contacts = [
+            Node(
+                name=f"contacts:{i}",
+                inputs=[str(self.src(i))],
+                outputs=[str(self.out(i))],
+                params=params or {},
+                key=i,
+            )
+            for i in range(N_STATES)
+        ]
+        summary = [
+            Node(
+                name="summary",
+                inputs=[str(self.out(i)) for i in range(N_STATES)],
+                outputs=[str(self.summary)],
+                deps=[n.name for n in contacts],
+            )
+        ]
+        return Pipeline(
+            [
+                Stage("contacts", contacts, self.run_contacts),
+                Stage("summary", summary, self.run_summary),
+            ],
+            db_path=self.root / "state.json",
+            content_hash=content_hash,
+        )
+
+
+def _touch_later(path, text=None):
+    if text is not None:
+        path.write_text(text)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+
+class TestFingerprint:
+    def test_missing_and_modes(self, tmp_path):
+        path = tmp_path / "a.txt"
+        assert file_fingerprint(str(path)) is None
+        path.write_text("abc")
+        assert set(file_fingerprint(str(path))) == {"size", "mtime_ns"}
+        assert set(file_fingerprint(str(path), content_hash=True)) == {"size", "sha256"}
+
+
+class TestPipeline:
+    def test_first_run_then_up_to_date(self, tmp_path):
+        toy = _Toy(tmp_path)
+        summary = toy.pipeline().run(verbose=False)
+        assert sorted(toy.calls["contacts"]) == [0, 1, 2]
+        assert toy.calls["summary"] == 1
+        assert len(summary["ran"]) == N_STATES + 1
+
+        summary = toy.pipeline().run(verbose=False)
+        assert summary["ran"] == []
+        assert len(summary["skipped"]) == N_STATES + 1
+        assert toy.calls["summary"] == 1
+
+    def test_changed_input_reruns_only_that_state(self, tmp_path):
+        toy = _Toy(tmp_path)
+        toy.pipeline().run(verbose=False)
+        _touch_later(toy.src(1), "changed\n")
+        toy.calls["contacts"].clear()
+
+        summary = toy.pipeline().run(verbose=False)
+        assert toy.calls["contacts"] == [1]
+        assert toy.calls["summary"] == 2
+        assert set(summary["ran"]) == {"contacts:1", "summary"}
+        assert "CHANGED" in toy.summary.read_text()
+
+    def test_params_change_reruns(self, tmp_path):
+        toy = _Toy(tmp_path)
+        toy.pipeline(params={"engine": "a"}).run(verbose=False)
+        toy.calls["contacts"].clear()
+        toy.pipeline(params={"engine": "b"}).run(verbose=False)
+        assert sorted(toy.calls["contacts"]) == [0, 1, 2]
+
+    def test_modified_output_reruns(self, tmp_path):
+        toy = _Toy(tmp_path)
+        toy.pipeline().run(verbose=False)
+        _touch_later(toy.summary, "tampered")
+        toy.pipeline().run(verbose=False)
+        assert toy.calls["summary"] == 2
+
+    def test_resume_after_partial_failure(self, tmp_path):
+        toy = _Toy(tmp_path, fail={2})
+        summary = toy.pipeline().run(verbose=False)
+        assert summary["failed"] == ["contacts:2"]
+        assert summary["blocked"] == ["summary"]
+        assert toy.calls["summary"] == 0
+
+        toy.fail.clear()
+        toy.calls["contacts"].clear()
+        summary = toy.pipeline().run(verbose=False)
+        assert toy.calls["contacts"] == [2]
+        assert toy.calls["summary"] == 1
+
+    def test_force(self, tmp_path):
+        toy = _Toy(tmp_path)
+        toy.pipeline().run(verbose=False)
+        toy.pipeline().run(force=True, verbose=False)
+        assert len(toy.calls["contacts"]) == 2 * N_STATES
+        assert toy.calls["summary"] == 2
+
+    def test_adopts_existing_outputs(self, tmp_path):
+        toy = _Toy(tmp_path)
+        for i in range(N_STATES):
+            toy.out(i).write_text("precomputed\n")
+        toy.summary.write_text("precomputed\n")
+        summary = toy.pipeline().run(verbose=False)
+        assert summary["ran"] == []
+        assert toy.calls["contacts"] == []
+
+    def test_missing_input_keeps_recorded_outputs(self, tmp_path):
+        toy = _Toy(tmp_path)
+        toy.pipeline().run(verbose=False)
+        toy.src(0).unlink()
+        summary = toy.pipeline().run(verbose=False)
+        assert summary["blocked"] == [] and summary["ran"] == []
+        assert toy.calls["summary"] == 1
+
+    @pytest.mark.parametrize("content_hash, expected", [(False, 2), (True, 1)])
+    def test_content_hash_ignores_touch(self, tmp_path, content_hash, expected):
+        toy = _Toy(tmp_path)
+        toy.pipeline(content_hash=content_hash).run(verbose=False)
+        _touch_later(toy.src(0))
+        toy.pipeline(content_hash=content_hash).run(verbose=False)
+        assert toy.calls["contacts"].count(0) == expected
+
+
+class TestStreaming:
+    """Three chained per-state stages with a batch source stage."""
+
+    def _pipeline(self, root, log, fail=()):
+        lock = threading.Lock()
+        states = range(N_STATES)
+        released = {i: threading.Event() for i in states}
+
+        def path(stage, i):
+            return str(root / f"{stage}_{i}.txt")
+
+        def source(keys, done):
+            for i in keys:
+                with open(path("a", i), "w") as f:
+                    f.write(str(i))
+                with lock:
+                    log.append(("a", i))
+                done(i)
+                # hold the next state until this one has moved downstream,
+                # which deadlocks if stages are barriers
+                released[i].wait(timeout=5)
+
+        def step(stage, prev):
+            def run_one(i):
+                if (stage, i) in fail:
+                    released[i].set()
+                    return False
+                with open(path(prev, i)) as f, open(path(stage, i), "w") as g:
+                    g.write(f.read())
+                with lock:
+                    log.append((stage, i))
+                if stage == "c":
+                    released[i].set()
+                return True
+            return run_one
+
+        def nodes(stage, prev):
+            return [
+                Node(
+                    name=f"{stage}:{i}",
+                    inputs=[] if prev is None else [path(prev, i)],
+                    outputs=[path(stage, i)],
+                    deps=[] if prev is None else [f"{prev}:{i}"],
+                    key=i,
+                )
+                for i in states
+            ]
+
+        return Pipeline(
+            [
+                Stage("a", nodes("a", None), source),
+                Stage("b", nodes("b", "a"), run_one=step("b", "a"), workers=2),
+                Stage("c", nodes("c", "b"), run_one=step("c", "b"), workers=2),
+            ],
+            db_path=root / "state.json",
+        )
+
+    def test_states_flow_through_stages(self, tmp_path):
+        log = []
+        summary = self._pipeline(tmp_path, log).run(stream=True, verbose=False)
+        assert len(summary["ran"]) == 3 * N_STATES
+        # state 0 finished the last stage before state 1 left the first
+        assert log.index(("c", 0)) < log.index(("a", 1))
+        assert summary["queue"][-1][1]["c"] == {"ran": N_STATES}
+
+        summary = self._pipeline(tmp_path, log).run(stream=True, verbose=False)
+        assert summary["ran"] == [] and len(summary["skipped"]) == 3 * N_STATES
+
+    def test_failure_blocks_only_that_state(self, tmp_path):
+        log = []
+        pipeline = self._pipeline(tmp_path, log, fail={("b", 1)})
+        summary = pipeline.run(stream=True, verbose=False, report_interval=0.01)
+        assert summary["failed"] == ["b:1"]
+        assert summary["blocked"] == ["c:1"]
+        assert {("c", 0), ("c", 2)} <= set(log)
+        assert len(summary["queue"]) >= 1
+
+
+def test_result_cache(tmp_path):
+    out = tmp_path / "plot.png"
+    out.write_text("v1")
+    cache = ResultCache(tmp_path / "cache.json")
+    assert cache.get("plot", "k1") is None
+    cache.record("plot", "k1", [out], top=[1, 2])
+
+    reopened = ResultCache(tmp_path / "cache.json")
+    assert reopened.get("plot", "k1") == {"top": [1, 2]}
+    # new key: the inputs changed
+    assert reopened.get("plot", "k2") is None
+    # output modified since it was recorded
+    out.write_text("edited")
+    assert reopened.get("plot", "k1") is None
+    # output removed
+    reopened.record("plot", "k1", [out])
+    out.unlink()
+    assert reopened.get("plot", "k1") is None
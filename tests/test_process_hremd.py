@@ -0,0 +1,459 @@
+"""
+Tests for chacra.trajectories.process_hremd.
+
+A miniature femto HREMD run (a four-residue peptide, replica DCDs and a
+samples.arrow state data file) is synthesised in tmp_path — no simulation
+data required.
+"""
+
+from pathlib import Path
+
+import MDAnalysis as mda
+import numpy as np
+import pyarrow as pa
+import pytest
+
+from chacra.trajectories.process_hremd import (
+    STATE_FRAME_MAP_FILE,
+    ReplicaHandler,
+    TrajectoryJob,
+    align_frames,
+    demultiplex_state_trajectories,
+    get_exchange_probabilities,
+    get_exchange_probability,
+    get_num_states,
+    get_replica_to_state_idx,
+    get_state_energies,
+    get_state_frame_map,
+    get_state_rmsd,
+    load_femto_data,
+    load_state_frame_map,
+    read_femto_columns,
+    save_state_frame_map,
+    sort_replica_trajectories,
+    write_state_trajectory,
+)
+
+
+# ------------------------------------------------------------------ #
+# Helpers                                                              #
+# ------------------------------------------------------------------ #
+
+N_REPLICAS = 4
+N_CYCLES = 30
+SAVE_INTERVAL = 2
+TRAJ_LEN = N_CYCLES // SAVE_INTERVAL
+
+
+def _write_peptide_pdb(path, n_residues=4):
+    lines = []
+    serial = 1
+    for res in range(1, n_residues + 1):
+        for name, element, offset in (("N", "N", 0.0), ("CA", "C", 1.5), ("C", "C", 2.6)):
+            x = 3.8 * (res - 1) + offset
+            y = 0.7 * ((res + serial) % 3)
+            lines.append(
+                f"ATOM  {serial:5d} {name:<4s} ALA A{res:4d}    "
+                f"{x:8.3f}{y:8.3f}{0.0:8.3f}  1.00  0.00          {element:>2s}"
+            )
+            serial += 1
+    lines.append("END")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _replica_to_state_idx(rng, n_cycles, n_replicas):
+    """Random nearest-neighbour swaps of a replica→state permutation."""
+    perm = np.arange(n_replicas)
+    rows = []
+    for _ in range(n_cycles):
+        i = int(rng.integers(0, n_replicas - 1))
+        if rng.random() < 0.5:
+            a, b = np.flatnonzero(perm == i)[0], np.flatnonzero(perm == i + 1)[0]
+            perm[a], perm[b] = perm[b], perm[a]
+        rows.append(perm.copy())
+    return np.array(rows)
+
+
+@pytest.fixture()
+def femto_run(tmp_path):
+    """Replica DCDs, topology and samples.arrow for a 4-replica run."""
+    rng = np.random.default_rng(7)
+    pdb = tmp_path / "peptide.pdb"
+    _write_peptide_pdb(pdb)
+    u = mda.Universe(str(pdb))
+    traj_dir = tmp_path / "trajectories"
+    traj_dir.mkdir()
+    for r in range(N_REPLICAS):
+        with mda.Writer(str(traj_dir / f"r{r}.dcd"), n_atoms=u.atoms.n_atoms) as w:
+            for _ in range(TRAJ_LEN):
+                u.atoms.positions = (
+                    mda.Universe(str(pdb)).atoms.positions
+                    + rng.normal(scale=0.5, size=(u.atoms.n_atoms, 3))
+                )
+                w.write(u.atoms)
+
+    r2s = _replica_to_state_idx(rng, N_CYCLES, N_REPLICAS)
+    n = N_REPLICAS
+    proposed = np.cumsum(rng.integers(0, 3, size=(N_CYCLES, n, n)), axis=0)
+    accepted = np.minimum(proposed, np.cumsum(rng.integers(0, 2, size=(N_CYCLES, n, n)), axis=0))
+    u_kn = rng.normal(size=(N_CYCLES, n, n))
+    table = pa.table({
+        "step": np.arange(N_CYCLES),
+        "u_kn": [[list(row) for row in c] for c in u_kn],
+        "replica_to_state_idx": [list(row) for row in r2s],
+        "n_proposed_swaps": [[list(row) for row in c] for c in proposed],
+        "n_accepted_swaps": [[list(row) for row in c] for c in accepted],
+    })
+    samples = tmp_path / "samples.arrow"
+    with pa.OSFile(str(samples), "wb") as f:
+        with pa.ipc.new_stream(f, table.schema) as writer:
+            writer.write_table(table)
+
+    return {
+        "structure": str(pdb),
+        "traj_dir": str(traj_dir),
+        "samples": str(samples),
+        "replica_to_state_idx": r2s[::SAVE_INTERVAL][:TRAJ_LEN],
+        "tmp_path": tmp_path,
+    }
+
+
+def _positions(structure, traj):
+    u = mda.Universe(structure, traj)
+    return np.array([ts.positions.copy() for ts in u.trajectory])
+
+
+# ------------------------------------------------------------------ #
+# Femto state data                                                     #
+# ------------------------------------------------------------------ #
+
+
+class TestReadFemtoColumns:
+    def test_matches_pandas_load(self, femto_run):
+        df = load_femto_data(femto_run["samples"])
+        arrays = read_femto_columns(
+            femto_run["samples"], ["u_kn", "replica_to_state_idx"],
+        )
+        assert arrays["u_kn"].shape == (N_CYCLES, N_REPLICAS, N_REPLICAS)
+        np.testing.assert_array_equal(
+            arrays["u_kn"], np.stack([np.vstack(r) for r in df["u_kn"]]),
+        )
+        np.testing.assert_array_equal(
+            arrays["replica_to_state_idx"], np.vstack(df["replica_to_state_idx"]),
+        )
+
+    def test_strided_and_tail_rows(self, femto_run):
+        full = read_femto_columns(femto_run["samples"], ["n_accepted_swaps"])
+        full = full["n_accepted_swaps"]
+        strided = read_femto_columns(
+            femto_run["samples"], ["n_accepted_swaps"], rows=slice(1, None, 3),
+        )["n_accepted_swaps"]
+        np.testing.assert_array_equal(strided, full[1::3])
+        tail = read_femto_columns(
+            femto_run["samples"], ["n_accepted_swaps"], rows=slice(-1, None),
+        )["n_accepted_swaps"]
+        np.testing.assert_array_equal(tail, full[-1:])
+
+    def test_multiple_record_batches(self, tmp_path):
+        path = tmp_path / "samples.arrow"
+        schema = pa.schema([("replica_to_state_idx", pa.list_(pa.int64()))])
+        with pa.OSFile(str(path), "wb") as f:
+            with pa.ipc.new_stream(f, schema) as writer:
+                for i in range(5):
+                    writer.write_batch(pa.record_batch(
+                        [pa.array([[i, i + 1], [i + 1, i]])], schema=schema,
+                    ))
+        arr = read_femto_columns(
+            path, ["replica_to_state_idx"], rows=slice(0, None, 2),
+        )["replica_to_state_idx"]
+        np.testing.assert_array_equal(
+            arr, [[0, 1], [1, 2], [2, 3], [3, 4], [4, 5]],
+        )
+
+    def test_column_projection(self, femto_run):
+        df = load_femto_data(femto_run["samples"], columns=["replica_to_state_idx"])
+        assert list(df.columns) == ["replica_to_state_idx"]
+        assert get_num_states(femto_run["samples"]) == N_REPLICAS
+
+
+class TestEnergiesAndExchange:
+    def test_state_energies(self, femto_run):
+        df = load_femto_data(femto_run["samples"])
+        expected = np.vstack([
+            np.vstack(row)[np.arange(N_REPLICAS), index]
+            for row, index in zip(df["u_kn"], df["replica_to_state_idx"])
+        ])
+        np.testing.assert_array_equal(get_state_energies(df), expected)
+        np.testing.assert_array_equal(get_state_energies(femto_run["samples"]), expected)
+        rows = slice(0, None, 2)
+        np.testing.assert_array_equal(
+            get_state_energies(femto_run["samples"], rows=rows), expected[rows],
+        )
+        np.testing.assert_array_equal(get_state_energies(df, rows=rows), expected[rows])
+
+    def test_exchange_probabilities(self, femto_run):
+        df = load_femto_data(femto_run["samples"])
+        swaps = np.vstack(df["n_accepted_swaps"].values[-1])
+        attempts = np.vstack(df["n_proposed_swaps"].values[-1])
+        i = np.arange(N_REPLICAS - 1)
+        expected = swaps[i, i + 1] / attempts[i, i + 1]
+        np.testing.assert_allclose(get_exchange_probabilities(df), expected)
+        np.testing.assert_allclose(
+            get_exchange_probabilities(femto_run["samples"]), expected,
+        )
+        assert get_exchange_probability(femto_run["samples"], 1, 2) == pytest.approx(
+            expected[1]
+        )
+
+
+    def test_replica_mixing_from_samples(self, femto_run):
+        from chacra.trajectories.mixing import replica_mixing
+
+        df = load_femto_data(femto_run["samples"])
+        from_path = replica_mixing(femto_run["samples"])
+        from_array = replica_mixing(np.vstack(df["replica_to_state_idx"]))
+        assert from_path["n_cycles"] == N_CYCLES
+        np.testing.assert_array_equal(
+            from_path["transition_matrix"], from_array["transition_matrix"],
+        )
+
+
+# ------------------------------------------------------------------ #
+# Replica → state demultiplexing                                       #
+# ------------------------------------------------------------------ #
+
+
+class TestDemultiplex:
+    def test_replica_to_state_idx(self, femto_run):
+        df = load_femto_data(femto_run["samples"])
+        r2s = get_replica_to_state_idx(df, SAVE_INTERVAL, TRAJ_LEN)
+        np.testing.assert_array_equal(r2s, femto_run["replica_to_state_idx"])
+        r2s = get_replica_to_state_idx(femto_run["samples"], SAVE_INTERVAL, TRAJ_LEN)
+        np.testing.assert_array_equal(r2s, femto_run["replica_to_state_idx"])
+
+    def test_sort_replica_trajectories(self, femto_run):
+        df = load_femto_data(femto_run["samples"])
+        r2s = femto_run["replica_to_state_idx"]
+        frames = sort_replica_trajectories(df, SAVE_INTERVAL, TRAJ_LEN)
+        assert sorted(frames) == list(range(N_REPLICAS))
+        for replica in range(N_REPLICAS):
+            for state in range(N_REPLICAS):
+                np.testing.assert_array_equal(
+                    frames[replica][state], np.where(r2s[:, replica] == state)[0],
+                )
+
+    def test_state_frame_map(self, femto_run, tmp_path):
+        r2s = femto_run["replica_to_state_idx"]
+        path = save_state_frame_map(r2s, tmp_path)
+        frame_map = load_state_frame_map(path)
+        assert isinstance(frame_map, np.memmap)
+        np.testing.assert_array_equal(frame_map, get_state_frame_map(r2s))
+        np.testing.assert_array_equal(frame_map[0], r2s)
+        t = np.arange(TRAJ_LEN)[:, None]
+        # replica at state s holds state s
+        np.testing.assert_array_equal(
+            r2s[t, frame_map[1]], np.broadcast_to(np.arange(N_REPLICAS), r2s.shape),
+        )
+
+    def test_handler_reads_state_column_once(self, femto_run, monkeypatch):
+        from chacra.trajectories import process_hremd
+
+        reads = []
+        real = process_hremd.read_femto_columns
+
+        def counting(path, columns, rows=None):
+            reads.append(list(columns))
+            return real(path, columns, rows=rows)
+
+        monkeypatch.setattr(process_hremd, "read_femto_columns", counting)
+        handler = ReplicaHandler(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["samples"], SAVE_INTERVAL,
+        )
+        assert reads == [["replica_to_state_idx"]]
+        assert handler.n_states == N_REPLICAS
+        np.testing.assert_array_equal(
+            handler.replica_to_state_idx, femto_run["replica_to_state_idx"],
+        )
+        np.testing.assert_array_equal(
+            handler.state_frame_map,
+            get_state_frame_map(femto_run["replica_to_state_idx"]),
+        )
+
+    def test_matches_per_state_writer(self, femto_run):
+        map_dir = femto_run["tmp_path"] / "maps"
+        handler = ReplicaHandler(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["samples"], SAVE_INTERVAL, map_dir=map_dir,
+        )
+        # the map goes to map_dir, never beside the simulation output
+        assert handler.state_frame_map == str(map_dir / STATE_FRAME_MAP_FILE)
+        assert not (Path(femto_run["samples"]).parent / STATE_FRAME_MAP_FILE).exists()
+        demux_dir = femto_run["tmp_path"] / "demux"
+        demux_dir.mkdir()
+        handler.write_state_trajectories(str(demux_dir), n_jobs=2)
+
+        ref_dir = femto_run["tmp_path"] / "per_state"
+        ref_dir.mkdir()
+        for state in range(N_REPLICAS):
+            write_state_trajectory(TrajectoryJob(
+                structure=handler.structure,
+                traj_dir=handler.traj_dir,
+                hremd_data=sort_replica_trajectories(
+                    femto_run["samples"], SAVE_INTERVAL, TRAJ_LEN,
+                ),
+                save_interval=SAVE_INTERVAL,
+                output_dir=str(ref_dir),
+                state_index=state,
+                n_states=N_REPLICAS,
+            ))
+            got = _positions(handler.structure, str(demux_dir / f"state_{state}.xtc"))
+            expected = _positions(handler.structure, str(ref_dir / f"state_{state}.xtc"))
+            assert got.shape == (TRAJ_LEN, 12, 3)
+            np.testing.assert_allclose(got, expected, atol=1e-2)
+
+    def test_state_subset(self, femto_run):
+        out = femto_run["tmp_path"] / "subset"
+        out.mkdir()
+        paths = demultiplex_state_trajectories(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["replica_to_state_idx"], str(out), states=[2],
+        )
+        assert [p.rsplit("/", 1)[-1] for p in paths] == ["state_2.xtc"]
+        assert sorted(p.name for p in out.iterdir()) == ["state_2.xtc"]
+        assert len(_positions(femto_run["structure"], paths[0])) == TRAJ_LEN
+
+
+# ------------------------------------------------------------------ #
+# Streaming state trajectory writer                                    #
+# ------------------------------------------------------------------ #
+
+
+def _expected_state_positions(femto_run, state):
+    """Reference state trajectory: source frame per t, aligned one by one."""
+    from MDAnalysis.analysis import align
+
+    structure = femto_run["structure"]
+    ref = mda.Universe(structure)
+    out = mda.Universe(structure)
+    frames = []
+    for t, row in enumerate(femto_run["replica_to_state_idx"]):
+        replica = int(np.flatnonzero(row == state)[0])
+        u = mda.Universe(structure, f"{femto_run['traj_dir']}/r{replica}.dcd")
+        u.trajectory[t]
+        out.atoms.positions = u.atoms.positions
+        align.alignto(out.atoms, ref, select="(protein) and name CA")
+        frames.append(out.atoms.positions.copy())
+    return np.array(frames)
+
+
+class TestStreamingWriter:
+    @pytest.mark.parametrize("buffer_frames", [1, 4, 64])
+    def test_frames_in_time_order(self, femto_run, buffer_frames):
+        handler = ReplicaHandler(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["samples"], SAVE_INTERVAL,
+        )
+        out = femto_run["tmp_path"] / f"buf{buffer_frames}"
+        out.mkdir()
+        write_state_trajectory(
+            TrajectoryJob(
+                structure=handler.structure,
+                traj_dir=handler.traj_dir,
+                hremd_data=sort_replica_trajectories(
+                    femto_run["samples"], SAVE_INTERVAL, TRAJ_LEN,
+                ),
+                output_dir=str(out),
+                state_index=1,
+                n_states=N_REPLICAS,
+            ),
+            buffer_frames=buffer_frames,
+        )
+        got = _positions(handler.structure, str(out / "state_1.xtc"))
+        np.testing.assert_allclose(
+            got, _expected_state_positions(femto_run, 1), atol=1e-2,
+        )
+
+    def test_handler_single_state(self, femto_run):
+        handler = ReplicaHandler(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["samples"], SAVE_INTERVAL,
+        )
+        out = femto_run["tmp_path"] / "single"
+        out.mkdir()
+        handler.write_state_trajectory(str(out), state_index=3)
+        got = _positions(handler.structure, str(out / "state_3.xtc"))
+        np.testing.assert_allclose(
+            got, _expected_state_positions(femto_run, 3), atol=1e-2,
+        )
+
+    def test_groups_reported_as_written(self, femto_run):
+        handler = ReplicaHandler(
+            femto_run["structure"], femto_run["traj_dir"],
+            femto_run["samples"], SAVE_INTERVAL,
+        )
+        out = femto_run["tmp_path"] / "groups"
+        out.mkdir()
+        written = []
+
+        def callback(group):
+            # every state of the group is on disk when it is reported
+            assert all((out / f"state_{i}.xtc").exists() for i in group)
+            written.append(list(group))
+
+        handler.write_state_trajectories(
+            str(out), n_jobs=1, states=[0, 1, 3], n_groups=2, callback=callback,
+        )
+        assert written == [[0, 1], [3]]
+
+
+class TestAlignFrames:
+    def test_matches_alignto(self, femto_run):
+        from MDAnalysis.analysis import align
+        from scipy.spatial.transform import Rotation
+
+        rng = np.random.default_rng(3)
+        ref = mda.Universe(femto_run["structure"])
+        mobile = mda.Universe(femto_run["structure"])
+        ca = mobile.select_atoms("name CA").ix
+        base = ref.atoms.positions.astype(np.float64)
+        rotations = Rotation.random(20, random_state=4).as_matrix()
+        frames = np.stack([
+            (base + rng.normal(scale=0.3, size=base.shape)) @ r.T
+            + rng.normal(scale=10, size=3)
+            for r in rotations
+        ]).astype(np.float32)
+
+        expected = []
+        for frame in frames:
+            mobile.atoms.positions = frame
+            align.alignto(mobile.atoms, ref, select="name CA")
+            expected.append(mobile.atoms.positions.copy())
+
+        got = align_frames(frames.copy(), ca, ref.atoms.positions[ca])
+        np.testing.assert_allclose(got, np.array(expected), atol=1e-3)
+
+
+def test_state_rmsd_after_superposition(femto_run, tmp_path):
+    from scipy.spatial.transform import Rotation
+
+    u = mda.Universe(femto_run["structure"])
+    base = u.atoms.positions.copy()
+    ca = u.select_atoms("name CA").ix
+    rng = np.random.default_rng(5)
+    noise = rng.normal(scale=0.5, size=base.shape)
+    rotation = Rotation.random(random_state=6).as_matrix()
+    traj = tmp_path / "state_0.dcd"
+    with mda.Writer(str(traj), n_atoms=u.atoms.n_atoms) as w:
+        # a rigidly moved copy of the structure, then a perturbed one
+        for positions in (base @ rotation.T + 5.0, base + noise):
+            u.atoms.positions = positions
+            w.write(u.atoms)
+
+    rmsd = get_state_rmsd(femto_run["structure"], str(traj), chunk_frames=1)
+    assert rmsd[0] == pytest.approx(0.0, abs=1e-3)
+    fitted = align_frames(
+        (base + noise)[None].astype(np.float64), ca, base[ca].astype(np.float64)
+    )[0]
+    expected = np.sqrt(((fitted[ca] - base[ca]) ** 2).sum(axis=1).mean())
+    assert rmsd[1] == pytest.approx(expected, rel=1e-4)
@@ -0,0 +1,73 @@
+"""
+Tests for the stage runners of chacra.scripts.process_hremd_output.
+
+Runners are driven with a minimal run context inside tmp_path; external
+tools (getcontacts) are replaced by recording their command lines.
+"""
+
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from chacra.scripts import process_hremd_output as script
+
+# a water before two protein residues: structure residue indices 1 and 2
+_PDB = """\
+HETATM    1  O   HOH W   1      50.000  50.000  50.000  1.00  0.00           O
+ATOM      2  N   GLY A   1       0.000   0.000   0.000  1.00  0.00           N
+ATOM      3  CA  GLY A   1       1.400   0.000   0.000  1.00  0.00           C
+ATOM      4  N   GLY A   2       5.000   0.000   0.000  1.00  0.00           N
+ATOM      5  CA  GLY A   2       6.400   0.000   0.000  1.00  0.00           C
+END
+"""
+
+
+@pytest.fixture()
+def prefilter_ctx(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "selection.pdb").write_text(_PDB)
+    run_dir = tmp_path / "contact_output" / "run_1"
+    run_dir.mkdir(parents=True)
+    np.save(run_dir / "candidate_pairs.npy", np.array([[0, 1]]))
+    args = SimpleNamespace(
+        prefilter=True, n_jobs=2, contact_jobs=0, contact_cores=0, gpu_retries=0,
+    )
+    return script._RunContext(
+        run=1,
+        n_states=2,
+        temps=np.array([300.0, 320.0]),
+        args=args,
+        structure_file="selection.pdb",
+        selection_file="selection.pdb",
+        openmm_sys=None,
+        engine="getcontacts",
+    )
+
+
+def test_cpu_contact_pool_with_prefilter(prefilter_ctx):
+    ctx = prefilter_ctx
+    commands = []
+    ctx.telemetry.run = lambda key, cmd, **kw: commands.append(cmd)
+    assert ctx.use_prefilter
+
+    # calibration builds prefiltered commands while the pool is being set up
+    worker = threading.Thread(target=script._cpu_contact_pool, args=(ctx, 0), daemon=True)
+    worker.start()
+    worker.join(timeout=30)
+    assert not worker.is_alive(), "_cpu_contact_pool deadlocked"
+
+    assert ctx.device_pool is not None
+    assert commands
+    for cmd in commands:
+        assert cmd[cmd.index("--sele") + 1] == "residue 1 to 2"
+
+
+def test_chacra_key_uses_exact_temperatures():
+    temps = np.array([300.0, 310.2, 320.7])
+    key = script._chacra_key("matrix", temps)
+    assert script._chacra_key("matrix", temps.copy()) == key
+    # below the rounding ContactFrequencies applies
+    assert script._chacra_key("matrix", temps + 1e-3) != key
+    assert script._chacra_key("other", temps) != key
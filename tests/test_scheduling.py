@@ -0,0 +1,194 @@
+"""
+Tests for memory-aware job dispatch in chacra.scheduling.
+
+DCD files are written with MDAnalysis inside tmp_path; memory availability
+is monkeypatched so admission decisions are deterministic.
+"""
+
+import json
+import sys
+
+import MDAnalysis as mda
+import numpy as np
+import pytest
+
+from chacra import scheduling
+from chacra.scheduling import (
+    DevicePool,
+    calibrate_cores,
+    choose_core_split,
+    read_dcd_header,
+    run_memory_aware,
+)
+
+
+def _square(x):
+    return x * x
+
+
+def _write_dcd(path, n_atoms=7, n_frames=5, with_box=False):
+    u = mda.Universe.empty(n_atoms, trajectory=True)
+    rng = np.random.default_rng(0)
+    with mda.Writer(str(path), n_atoms=n_atoms) as w:
+        for _ in range(n_frames):
+            u.atoms.positions = rng.normal(size=(n_atoms, 3))
+            if with_box:
+                u.dimensions = [30, 30, 30, 90, 90, 90]
+            w.write(u.atoms)
+
+
+class TestReadDcdHeader:
+    @pytest.mark.parametrize("with_box", [False, True])
+    def test_matches_mdanalysis(self, tmp_path, with_box):
+        path = tmp_path / "r0.dcd"
+        _write_dcd(path, n_atoms=11, n_frames=9, with_box=with_box)
+        header = read_dcd_header(path)
+        u = mda.Universe.empty(11, trajectory=True)
+        u.load_new(str(path))
+        assert header["n_frames"] == len(u.trajectory) == 9
+        assert header["n_atoms"] == 11
+
+    def test_rejects_non_dcd(self, tmp_path):
+        path = tmp_path / "x.dcd"
+        path.write_bytes(b"\0" * 200)
+        with pytest.raises(ValueError):
+            read_dcd_header(path)
+
+
+class TestRunMemoryAware:
+    def test_results_in_job_order(self):
+        assert run_memory_aware(_square, [3, 1, 2], [1, 1, 1], max_workers=2) == [9, 1, 4]
+
+    def test_callback_per_job(self):
+        seen = {}
+        run_memory_aware(
+            _square, [3, 1, 2], [1, 1, 1], max_workers=2,
+            callback=lambda i, result: seen.setdefault(i, result),
+        )
+        assert seen == {0: 9, 1: 1, 2: 4}
+
+    @pytest.mark.parametrize("job_bytes, expected", [(60, 1), (30, 3), (1, 4)])
+    def test_admission_limited_by_memory(self, monkeypatch, job_bytes, expected):
+        from concurrent.futures import Future
+
+        # 100 bytes available and no job has allocated anything yet
+        monkeypatch.setattr(scheduling, "available_memory", lambda: 100)
+        monkeypatch.setattr(scheduling, "_children_rss", lambda: 0)
+
+        class _Executor:
+            def __init__(self, max_workers):
+                pass
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc):
+                pass
+
+            def submit(self, func, arg):
+                f = Future()
+                f.set_result(func(arg))
+                return f
+
+        concurrency = []
+
+        def _wait(futures, timeout, return_when):
+            # complete one job per poll
+            concurrency.append(len(futures))
+            return set(futures[:1]), set(futures[1:])
+
+        monkeypatch.setattr(scheduling, "ProcessPoolExecutor", _Executor)
+        monkeypatch.setattr(scheduling, "wait", _wait)
+        results = run_memory_aware(
+            _square, list(range(6)), [job_bytes] * 6, max_workers=4,
+            reserve_fraction=0.0,
+        )
+        assert results == [0, 1, 4, 9, 16, 25]
+        assert max(concurrency) == expected
+
+    def test_oversized_job_runs_alone(self, monkeypatch):
+        monkeypatch.setattr(scheduling, "available_memory", lambda: 10)
+        assert run_memory_aware(_square, [5], [10**12], max_workers=2) == [25]
+
+
+def _stand_in(script):
+    """A CPU-only stand-in for a GPU command, run with the test interpreter."""
+    return [sys.executable, "-c", script]
+
+
+class TestDevicePool:
+    def test_pins_device_and_records_timeline(self, tmp_path):
+        pool = DevicePool(["0", "1"])
+        out = tmp_path / "device.txt"
+        script = (
+            "import os, pathlib; "
+            f"pathlib.Path({str(out)!r}).write_text(os.environ['CUDA_VISIBLE_DEVICES'])"
+        )
+        assert pool.run("job", _stand_in(script))
+        (entry,) = pool.timeline
+        assert out.read_text() == entry["device"]
+        assert entry["returncode"] == 0 and entry["end"] >= entry["start"]
+
+    def test_work_queue_keeps_devices_busy(self):
+        # one long job and six short ones on two devices: the device that is
+        # not running the long job takes all the short ones
+        jobs = {"long": _stand_in("import time; time.sleep(1.5)")}
+        jobs.update(
+            {f"short{i}": _stand_in("import time; time.sleep(0.05)") for i in range(6)}
+        )
+        pool = DevicePool(["0", "1"])
+        assert all(pool.map(jobs).values())
+        (long_entry,) = [e for e in pool.timeline if e["key"] == "long"]
+        usage = pool.utilisation()
+        assert usage[long_entry["device"]]["jobs"] <= 2
+        assert sum(u["jobs"] for u in usage.values()) == 7
+
+    def test_retry_after_failure(self, tmp_path):
+        marker = tmp_path / "failed_once"
+        script = (
+            "import pathlib, sys; "
+            f"m = pathlib.Path({str(marker)!r}); "
+            "ok = m.exists(); m.touch(); "
+            "sys.stderr.write('boom'); sys.exit(0 if ok else 3)"
+        )
+        pool = DevicePool(["0"], retries=1, log_dir=tmp_path / "logs")
+        assert pool.run("flaky", _stand_in(script))
+        assert [e["returncode"] for e in pool.timeline] == [3, 0]
+        assert (tmp_path / "logs" / "flaky.attempt1.log").read_text() == "boom"
+
+        pool = DevicePool(["0"], retries=0)
+        marker.unlink()
+        assert not pool.run("flaky", _stand_in(script))
+        assert pool.utilisation()["0"]["failures"] == 1
+
+    def test_save_timeline(self, tmp_path):
+        pool = DevicePool(["0"])
+        pool.map({"a": _stand_in("pass"), "b": _stand_in("pass")})
+        pool.save_timeline(tmp_path / "timeline.json")
+        data = json.loads((tmp_path / "timeline.json").read_text())
+        assert data["utilisation"]["0"]["jobs"] == 2
+        assert len(data["attempts"]) == 2
+
+
+class TestCoreBudget:
+    def test_poor_scaling_prefers_many_small_jobs(self):
+        # doubling the cores buys at most 1.25x: sixteen 1-core jobs win
+        timings = {1: 10.0, 2: 8.0, 4: 7.0, 8: 6.5}
+        assert choose_core_split(16, 30, timings) == (16, 1)
+        # with few states the spare cores go to each job instead
+        assert choose_core_split(16, 2, timings) == (2, 8)
+
+    def test_linear_scaling_ties_to_fewer_cores(self):
+        timings = {1: 8.0, 2: 4.0, 4: 2.0}
+        assert choose_core_split(8, 100, timings) == (8, 1)
+
+    def test_ignores_candidates_over_budget(self):
+        assert choose_core_split(2, 10, {1: 4.0, 8: 0.1}) == (2, 1)
+        assert choose_core_split(4, 10, {}) == (4, 1)
+
+    def test_calibrate_times_every_candidate(self):
+        calls = []
+        timings = calibrate_cores(calls.append, [1, 2, 4])
+        assert calls == [1, 2, 4]
+        assert set(timings) == {1, 2, 4}
+        assert all(t >= 0 for t in timings.values())
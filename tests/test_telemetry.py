@@ -0,0 +1,160 @@
+"""
+Tests for pipeline telemetry in chacra.telemetry.
+
+A two-stage pipeline (a batch stage, then a per-state stage) runs inside
+tmp_path with a Telemetry attached; subprocesses are stand-ins run with the
+test interpreter.
+"""
+
+import json
+import subprocess
+import sys
+
+import pytest
+
+from chacra.pipeline import Node, Pipeline, Stage
+from chacra.telemetry import Telemetry, compare_metrics, format_summary
+
+N_STATES = 3
+# a command that spends measurable CPU time
+_BURN = (
+    "import time\n"
+    "t = time.process_time()\n"
+    "while time.process_time() - t < 0.05: pass\n"
+)
+
+
+def _pipeline(root, telemetry, fail=()):
+    def src(i):
+        return str(root / f"src_{i}.txt")
+
+    def out(i):
+        return str(root / f"out_{i}.txt")
+
+    def write_sources(keys, done):
+        for i in keys:
+            with open(src(i), "w") as f:
+                f.write("x" * 100 * (i + 1))
+            done(i)
+
+    def copy(i):
+        if i in fail:
+            return False
+        telemetry.run(f"copy_{i}", [sys.executable, "-c", _BURN], stage="copy")
+        with open(src(i)) as f, open(out(i), "w") as g:
+            g.write(f.read())
+        return True
+
+    sources = [
+        Node(name=f"src:{i}", inputs=[], outputs=[src(i)], key=i) for i in range(N_STATES)
+    ]
+    copies = [
+        Node(name=f"copy:{i}", inputs=[src(i)], outputs=[out(i)], deps=[f"src:{i}"], key=i)
+        for i in range(N_STATES)
+    ]
+    return Pipeline(
+        [
+            Stage("sources", sources, write_sources),
+            Stage("copy", copies, run_one=copy, workers=2),
+        ],
+        db_path=root / "state.json",
+        telemetry=telemetry,
+    )
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_stages_and_jobs_recorded(tmp_path, stream):
+    telemetry = Telemetry(sample_interval=0.01)
+    with telemetry:
+        _pipeline(tmp_path, telemetry, fail={2}).run(verbose=False, stream=stream)
+
+    stages = {row["stage"]: row for row in telemetry.stages()}
+    assert set(stages) == {"sources", "copy"}
+    assert stages["sources"]["jobs"] == N_STATES
+    assert stages["copy"]["jobs"] == N_STATES and stages["copy"]["failed_jobs"] == 1
+    assert stages["copy"]["peak_rss_bytes"] > 0
+    assert stages["copy"]["wall_seconds"] >= 0 and stages["copy"]["cpu_seconds"] >= 0
+
+    jobs = {j["node"]: j for j in telemetry.jobs}
+    assert jobs["copy:1"]["ok"] and not jobs["copy:2"]["ok"]
+    assert jobs["copy:1"]["input_file_bytes"] == jobs["copy:1"]["output_file_bytes"] == 200
+    assert jobs["copy:1"]["thread_cpu_seconds"] is not None
+    assert stages["sources"]["output_file_bytes"] == 600
+
+    assert stages["copy"]["subprocesses"] == 2
+    assert all(s["returncode"] == 0 for s in telemetry.subprocesses)
+
+    # each job carries the usage of the command it ran, not the process's
+    for i in (0, 1):
+        job = jobs[f"copy:{i}"]
+        sub = next(s for s in telemetry.subprocesses if s["key"] == f"copy_{i}")
+        assert job["subprocess_cpu_seconds"] == sub["subprocess_cpu_seconds"] >= 0.05
+        assert job["subprocess_max_rss_bytes"] == sub["subprocess_max_rss_bytes"] > 0
+        assert job["subprocess_read_bytes"] is not None
+    # the failed job ran no command; batch jobs are not measured per command
+    assert jobs["copy:2"]["subprocess_cpu_seconds"] is None
+    assert jobs["src:0"]["subprocess_cpu_seconds"] is None
+    assert stages["copy"]["subprocess_cpu_seconds"] == pytest.approx(
+        jobs["copy:0"]["subprocess_cpu_seconds"] + jobs["copy:1"]["subprocess_cpu_seconds"]
+    )
+
+
+def test_subprocess_failures_recorded():
+    telemetry = Telemetry()
+    with pytest.raises(subprocess.CalledProcessError):
+        telemetry.run("bad", [sys.executable, "-c", "raise SystemExit(4)"], check=True)
+    telemetry.add_timeline(
+        [{"key": "cont_state_0", "device": 1, "attempt": 1, "start": 0.5,
+          "end": 2.0, "returncode": 0}],
+        "ultracontacts", stage="contacts",
+    )
+    bad, gpu = telemetry.subprocesses
+    assert bad["returncode"] == 4 and bad["command"] == sys.executable
+    assert bad["subprocess_cpu_seconds"] is not None
+    assert "subprocess_cpu_seconds" not in gpu
+    assert gpu["seconds"] == 1.5 and gpu["device"] == "1"
+
+
+def test_run_matches_subprocess_run():
+    telemetry = Telemetry()
+    proc = telemetry.run(
+        "echo",
+        [sys.executable, "-c", "import sys; sys.stdout.write(sys.stdin.read())"],
+        input=b"abc", capture_output=True,
+    )
+    assert proc.returncode == 0 and proc.stdout == b"abc" and proc.stderr == b""
+    with pytest.raises(subprocess.TimeoutExpired):
+        telemetry.run("slow", [sys.executable, "-c", "import time; time.sleep(30)"],
+                      timeout=0.2)
+    echo, slow = telemetry.subprocesses
+    assert echo["returncode"] == 0
+    # killed on timeout, and still reaped with its usage
+    assert slow["returncode"] != 0 and slow["subprocess_max_rss_bytes"] > 0
+
+
+def test_regressions_against_previous_run(tmp_path):
+    previous = [{"stage": "copy", "wall_seconds_per_job": 10.0,
+                 "cpu_seconds_per_job": 10.0, "peak_rss_bytes": 1000}]
+    current = [{"stage": "copy", "wall_seconds_per_job": 20.0,
+                "cpu_seconds_per_job": 11.0, "peak_rss_bytes": 1100},
+               {"stage": "new", "wall_seconds_per_job": 99.0}]
+    regressions = compare_metrics(current, previous)
+    assert [(r["stage"], r["metric"]) for r in regressions] == [
+        ("copy", "wall_seconds_per_job")
+    ]
+    # growth within the absolute noise floor is not a regression
+    assert compare_metrics(
+        [dict(current[0], wall_seconds_per_job=14.0)], previous
+    ) == []
+
+    prev_path = tmp_path / "prev.json"
+    prev_path.write_text(json.dumps({"stages": previous}))
+    telemetry = Telemetry()
+    with telemetry:
+        _pipeline(tmp_path, telemetry).run(verbose=False)
+    report = telemetry.save(tmp_path / "metrics.json", previous_path=prev_path)
+    saved = json.loads((tmp_path / "metrics.json").read_text())
+    assert saved["previous"] == str(prev_path)
+    assert len(saved["jobs"]) == 2 * N_STATES
+    table = format_summary(report)
+    assert "sources" in table and "copy" in table